@@ -49,6 +49,11 @@ CREATE TABLE lessons (
 
 CREATE INDEX idx_lessons_subject ON lessons(subject_id);
 CREATE INDEX idx_lessons_difficulty ON lessons(difficulty);
+-- The worker's embedding backfill pages through these by id
+CREATE INDEX idx_lessons_unembedded ON lessons(id) WHERE embedding IS NULL;
+-- No similarity search index here: the worker builds idx_lessons_embedding_ann
+-- once the backfill has embedded vector_index_min_rows rows, and resizes it as
+-- content grows (src.db.vector_index). Smaller tables are scanned.
 
 CREATE TABLE quizzes (
     id              UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -58,10 +63,12 @@ CREATE TABLE quizzes (
     difficulty      VARCHAR(20) CHECK (difficulty IN ('easy', 'medium', 'hard')),
     source          VARCHAR(50) DEFAULT 'seed',
     source_id       VARCHAR(255),
-    created_at      TIMESTAMPTZ DEFAULT NOW()
+    created_at      TIMESTAMPTZ DEFAULT NOW(),
+    updated_at      TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
 CREATE INDEX idx_quizzes_subject ON quizzes(subject_id);
+CREATE INDEX idx_quizzes_updated ON quizzes(updated_at);
 
 CREATE TABLE quiz_questions (
     id              UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -72,26 +79,76 @@ CREATE TABLE quiz_questions (
     correct_answer  VARCHAR(255) NOT NULL,
     explanation     TEXT,
     embedding       vector(1536),
-    sort_order      INTEGER DEFAULT 0
+    sort_order      INTEGER DEFAULT 0,
+    -- Set by ingest when dedupe_action = flag: the existing question this one nearly duplicates
+    duplicate_of    UUID REFERENCES quiz_questions(id) ON DELETE SET NULL,
+    updated_at      TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
 CREATE INDEX idx_questions_quiz ON quiz_questions(quiz_id);
+CREATE INDEX idx_questions_updated ON quiz_questions(updated_at);
+CREATE INDEX idx_questions_unembedded ON quiz_questions(id) WHERE embedding IS NULL;
+-- idx_questions_embedding_ann is built by the worker, as for lessons
+
+-- updated_at is the watermark the worker's content catalog refreshes from,
+-- so it only moves when a column the catalog holds changes
+CREATE FUNCTION touch_updated_at() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_quizzes_touch BEFORE UPDATE OF subject_id, difficulty ON quizzes
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+CREATE TRIGGER trg_questions_touch BEFORE UPDATE OF quiz_id, correct_answer, sort_order ON quiz_questions
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+-- New content wakes the worker's embedding backfill, which LISTENs on content_changed
+CREATE FUNCTION notify_content_changed() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('content_changed', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_lessons_notify AFTER INSERT ON lessons
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_content_changed();
+CREATE TRIGGER trg_questions_notify AFTER INSERT ON quiz_questions
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_content_changed();
 
 -- ============================================
 -- LEARNING EVENTS (raw event store)
+-- Range-partitioned on created_at. The worker creates upcoming partitions,
+-- rolls expired ones up into learning_event_rollups and drops them
+-- (src/db/partitions.py). Rows outside every partition land in the default one.
 -- ============================================
 CREATE TABLE learning_events (
-    id              UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id              UUID NOT NULL DEFAULT uuid_generate_v4(),
     user_id         UUID REFERENCES users(id),
     event_type      VARCHAR(50) NOT NULL,
     payload         JSONB NOT NULL,
     session_id      UUID,
-    created_at      TIMESTAMPTZ DEFAULT NOW()
-);
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE learning_events_default PARTITION OF learning_events DEFAULT;
 
 CREATE INDEX idx_events_user_time ON learning_events(user_id, created_at DESC);
 CREATE INDEX idx_events_type ON learning_events(event_type);
 CREATE INDEX idx_events_session ON learning_events(session_id);
+CREATE INDEX idx_events_created ON learning_events(created_at);
+
+-- Daily per-user summaries of events whose partitions have been dropped
+CREATE TABLE learning_event_rollups (
+    user_id         UUID NOT NULL REFERENCES users(id),
+    event_date      DATE NOT NULL,
+    total_events    INTEGER NOT NULL,
+    sessions_count  INTEGER NOT NULL,
+    event_counts    JSONB NOT NULL DEFAULT '{}',
+    PRIMARY KEY (user_id, event_date)
+);
 
 -- ============================================
 -- QUIZ ANSWERS (denormalized for fast analytics)
@@ -105,12 +162,70 @@ CREATE TABLE quiz_answers (
     is_correct      BOOLEAN NOT NULL,
     time_spent_ms   INTEGER,
     hints_used      INTEGER DEFAULT 0,
-    event_id        UUID REFERENCES learning_events(id),
+    event_id        UUID,  -- learning_events(id); no FK since events are partitioned and expire
+    subject_id      INTEGER REFERENCES subjects(id),  -- stamped from the quiz at insert time
+    difficulty      VARCHAR(20),
     created_at      TIMESTAMPTZ DEFAULT NOW()
 );
 
 CREATE INDEX idx_answers_user ON quiz_answers(user_id, created_at DESC);
 CREATE INDEX idx_answers_quiz ON quiz_answers(quiz_id);
+CREATE INDEX idx_answers_created ON quiz_answers(created_at);
+
+-- ============================================
+-- ANSWER AGGREGATES (maintained by the worker as answers arrive)
+-- ============================================
+CREATE TABLE agg_topic_performance (
+    user_id         UUID NOT NULL REFERENCES users(id),
+    subject_id      INTEGER NOT NULL REFERENCES subjects(id),
+    total_questions INTEGER NOT NULL DEFAULT 0,
+    correct_count   INTEGER NOT NULL DEFAULT 0,
+    total_time_ms   BIGINT NOT NULL DEFAULT 0,
+    timed_answers   INTEGER NOT NULL DEFAULT 0,
+    total_hints     INTEGER NOT NULL DEFAULT 0,
+    last_activity   TIMESTAMPTZ,
+    PRIMARY KEY (user_id, subject_id)
+);
+
+CREATE TABLE agg_user_daily_stats (
+    user_id         UUID NOT NULL REFERENCES users(id),
+    subject_id      INTEGER NOT NULL REFERENCES subjects(id),
+    answer_date     DATE NOT NULL,
+    total_questions INTEGER NOT NULL DEFAULT 0,
+    correct_count   INTEGER NOT NULL DEFAULT 0,
+    total_time_ms   BIGINT NOT NULL DEFAULT 0,
+    timed_answers   INTEGER NOT NULL DEFAULT 0,
+    total_hints     INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, subject_id, answer_date)
+);
+
+CREATE INDEX idx_agg_daily_date ON agg_user_daily_stats(answer_date);
+CREATE INDEX idx_agg_topic_activity ON agg_topic_performance(last_activity);
+
+-- ============================================
+-- EMBEDDING CACHE (embeddings by model and normalized text hash)
+-- ============================================
+CREATE TABLE embedding_cache (
+    model           VARCHAR(100) NOT NULL,
+    text_hash       BYTEA NOT NULL,
+    embedding       vector(1536) NOT NULL,
+    created_at      TIMESTAMPTZ DEFAULT NOW(),
+    last_used_at    TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (model, text_hash)
+);
+
+CREATE INDEX idx_embedding_cache_used ON embedding_cache(last_used_at);
+
+-- Rows the embedding backfill failed on, skipped until retry_at (backing off per attempt)
+CREATE TABLE embedding_failures (
+    table_name      VARCHAR(50) NOT NULL,
+    row_id          UUID NOT NULL,
+    attempts        INTEGER NOT NULL DEFAULT 1,
+    last_error      TEXT,
+    failed_at       TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    retry_at        TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (table_name, row_id)
+);
 
 -- ============================================
 -- AI TUTOR CONVERSATIONS
@@ -3,8 +3,18 @@ import { config } from '../config';
 
 const redis = new Redis(config.redisUrl);
 
+// Must match the ingest service's and the worker's TRANSPORT: with "streams" the
+// workers read a consumer group and never see Pub/Sub messages.
 export async function publishEvent(channel: string, event: object): Promise<void> {
-  await redis.publish(channel, JSON.stringify(event));
+  const data = JSON.stringify(event);
+  if (config.transport === 'streams') {
+    await redis.xadd(channel, 'MAXLEN', '~', String(config.streamMaxlen), '*', 'data', data);
+    return;
+  }
+  if (config.transport !== 'pubsub') {
+    throw new Error(`Unknown transport: ${config.transport}`);
+  }
+  await redis.publish(channel, data);
 }
 
 export async function closeRedis(): Promise<void> {
@@ -0,0 +1,127 @@
+"""Benchmark: near-duplicate question checks against a large MinHash/LSH index.
+
+Builds the index over --existing synthetic questions (template sentences
+over a large vocabulary, shaped like quiz questions), then checks a stream
+of incoming questions: a third repeats with different case and
+punctuation, a third with a typo, a third new. Reports build
+rate, checks/sec, p50/p99 check latency, how many LSH candidates each check
+compared, and recall/false positives against each incoming question's
+known origin. --verify also times a linear scan over the same signatures
+for comparison.
+
+    cd services/ingest && python -m benchmarks.bench_minhash --existing 100000
+"""
+
+import argparse
+import random
+import time
+from typing import Optional
+
+import numpy as np
+
+from src.config import settings
+from src.similarity.minhash import LSHIndex, MinHasher
+
+TEMPLATES = (
+    "What is the {0} of the {1} {2}?",
+    "Which {0} is known as the {1} of {2}?",
+    "How many {0} does a {1} {2} have?",
+    "In which year did the {0} {1} first {2}?",
+    "Who {0} the {1} {2} in the story?",
+    "Which of these {0} is a {1} {2}?",
+)
+
+
+def vocabulary(size: int, rng: random.Random) -> list[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 10))) for _ in range(size)]
+
+
+def question(words: list[str], rng: random.Random) -> str:
+    template = rng.choice(TEMPLATES)
+    extra = " ".join(rng.choice(words) for _ in range(rng.randint(2, 6)))
+    return template.format(*(rng.choice(words) for _ in range(3))) + f" ({extra})"
+
+
+def typo(text: str, rng: random.Random) -> str:
+    """The text with two adjacent letters swapped."""
+    i = rng.randrange(len(text) - 1)
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Near-duplicate check throughput over a MinHash/LSH index")
+    parser.add_argument("--existing", type=int, default=100_000)
+    parser.add_argument("--checks", type=int, default=5000)
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    parser.add_argument("--threshold", type=float, default=settings.dedupe_threshold)
+    parser.add_argument("--num-perm", type=int, default=settings.dedupe_num_perm)
+    parser.add_argument("--bands", type=int, default=settings.dedupe_bands)
+    parser.add_argument("--verify", action="store_true", help="Also time a linear scan over the signatures")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    words = vocabulary(args.vocabulary, rng)
+    existing = [question(words, rng) for _ in range(args.existing)]
+    hasher = MinHasher(args.num_perm, settings.dedupe_shingle_size)
+    lsh = LSHIndex(args.num_perm, args.bands)
+
+    start = time.perf_counter()
+    for i, text in enumerate(existing):
+        lsh.add(str(i), hasher.signature(text))
+    build_s = time.perf_counter() - start
+
+    incoming = []  # (text, index of the question it copies or None)
+    for n in range(args.checks):
+        kind = n % 3
+        if kind == 2:
+            incoming.append((question(words, rng), None))
+            continue
+        origin = rng.randrange(args.existing)
+        text = existing[origin].upper().replace("?", " ?") if kind == 0 else typo(existing[origin], rng)
+        incoming.append((text, origin))
+
+    latencies, candidates, found = [], 0, []
+    start = time.perf_counter()
+    for text, _ in incoming:
+        began = time.perf_counter()
+        signature = hasher.signature(text)
+        candidates += len(lsh.candidates(signature))
+        matches = lsh.query(signature, args.threshold)
+        latencies.append(time.perf_counter() - began)
+        found.append(matches[0][0] if matches else None)
+    check_s = time.perf_counter() - start
+    latencies.sort()
+
+    exact_hits = sum(found[n] == str(origin) for n, (_, origin) in enumerate(incoming) if n % 3 == 0)
+    near_hits = sum(found[n] == str(origin) for n, (_, origin) in enumerate(incoming) if n % 3 == 1)
+    false_hits = sum(found[n] is not None for n in range(len(incoming)) if n % 3 == 2)
+    thirds = [len(range(k, args.checks, 3)) for k in range(3)]
+
+    print(f"{args.existing:,} indexed questions, {args.checks:,} checks, "
+          f"{args.num_perm} permutations in {args.bands} bands, threshold {args.threshold}")
+    print(f"build:  {build_s:.1f}s ({args.existing / build_s:,.0f} questions/s)")
+    print(f"check:  {args.checks / check_s:,.0f} checks/s, p50 {percentile(latencies, 0.5) * 1e3:.3f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1e3:.3f} ms, {candidates / args.checks:.1f} candidates/check")
+    print(f"recall: repeats {exact_hits / max(thirds[0], 1):.1%}, typos {near_hits / max(thirds[1], 1):.1%}; "
+          f"new questions flagged {false_hits / max(thirds[2], 1):.1%}")
+
+    if args.verify:
+        matrix = np.vstack(list(lsh.signatures.values()))
+        sample = incoming[:200]
+        start = time.perf_counter()
+        for text, _ in sample:
+            scores = (matrix == hasher.signature(text)).mean(axis=1)
+            np.flatnonzero(scores >= args.threshold)
+        linear = (time.perf_counter() - start) / len(sample)
+        print(f"linear scan over the signatures: {linear * 1e3:.2f} ms/check "
+              f"({linear / (check_s / args.checks):.0f}x the LSH check)")
+
+
+if __name__ == "__main__":
+    main()
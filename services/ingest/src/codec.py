@@ -0,0 +1,121 @@
+"""Wire codec for learning events.
+
+The same module ships in the ingest and worker services so both ends agree on
+the wire format. JSON is always accepted on decode (the API service publishes
+JSON), so switching the publisher to msgpack can be rolled out gradually.
+"""
+
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional wire format
+    msgpack = None
+
+
+# Key under which decoded events keep their original JSON text (see decode_event)
+RAW_KEY = "_raw"
+
+
+class Codec(ABC):
+    """Encodes event dicts to bytes for the wire and back."""
+
+    name: str
+
+    @abstractmethod
+    def encode(self, message: dict) -> bytes:
+        pass
+
+    @abstractmethod
+    def decode(self, data: bytes) -> dict:
+        pass
+
+
+class JsonCodec(Codec):
+    """Stdlib JSON. UUIDs and datetimes are stringified."""
+
+    name = "json"
+
+    def encode(self, message: dict) -> bytes:
+        return json.dumps(message, default=str).encode()
+
+    def decode(self, data: bytes) -> dict:
+        return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    """orjson: same wire format as JsonCodec, several times faster."""
+
+    name = "orjson"
+
+    def encode(self, message: dict) -> bytes:
+        return orjson.dumps(message, default=str)
+
+    def decode(self, data: bytes) -> dict:
+        return orjson.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """Binary msgpack. JSON input is still decoded, for publishers that send JSON."""
+
+    name = "msgpack"
+
+    def __init__(self):
+        self._json = OrjsonCodec() if orjson else JsonCodec()
+
+    def encode(self, message: dict) -> bytes:
+        return msgpack.packb(message, default=str)
+
+    def decode(self, data: bytes) -> dict:
+        if is_json(data):
+            return self._json.decode(data)
+        return msgpack.unpackb(data)
+
+
+def is_json(data) -> bool:
+    """Whether a message is JSON text rather than a binary encoding."""
+    return data[:1] in (b"{", "{")
+
+
+def get_codec(name: Optional[str] = None) -> Codec:
+    """Codec for `name` (default settings.codec), falling back when a backend is missing."""
+    name = name or settings.codec
+    if name == "msgpack":
+        if msgpack is None:
+            raise ImportError("codec=msgpack requires the msgpack package")
+        return MsgpackCodec()
+    if name == "orjson":
+        if orjson is None:
+            logger.warning("orjson not installed, falling back to stdlib json")
+            return JsonCodec()
+        return OrjsonCodec()
+    if name != "json":
+        raise ValueError(f"Unknown codec: {name}")
+    return JsonCodec()
+
+
+def decode_event(codec: Codec, data) -> dict:
+    """Decode a message, keeping the JSON text so its payload can be passed to Postgres as-is."""
+    event = codec.decode(data)
+    if isinstance(event, dict) and is_json(data):
+        event[RAW_KEY] = data.decode() if isinstance(data, bytes) else data
+    return event
+
+
+def to_json_text(obj) -> str:
+    """Serialize to JSON text for a JSONB parameter, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str).decode()
+    return json.dumps(obj, default=str)
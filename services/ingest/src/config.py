@@ -7,6 +7,28 @@ class Settings(BaseSettings):
     opentdb_base_url: str = "https://opentdb.com/api.php"
     log_level: str = "INFO"
 
+    # Transport: "pubsub" (fire-and-forget) or "streams" (durable, consumer groups)
+    transport: str = "pubsub"
+    stream_maxlen: int = 100000  # approximate cap on stream length
+
+    # Wire codec: "json", "orjson" or "msgpack" (workers must be on msgpack first)
+    codec: str = "orjson"
+
+    # Vector similarity (src.similarity): snapshots are memory-mapped, so all uvicorn workers share the pages
+    vector_snapshot_dir: str = "data/vectors"
+    vector_snapshot_keep: int = 2  # snapshots kept on disk, the current one included
+    vector_snapshot_batch: int = 2000  # rows fetched per round trip when exporting
+    similarity_chunk_rows: int = 65536  # rows scored per matrix product
+    similarity_rescore: int = 4  # quantized search re-scores this many candidates per result
+
+    # Near-duplicate questions (src.similarity.minhash): "skip" them, "flag" them
+    # (quiz_questions.duplicate_of) or "off"
+    dedupe_action: str = "skip"
+    dedupe_threshold: float = 0.8  # estimated Jaccard similarity of the questions' shingle sets
+    dedupe_shingle_size: int = 5  # characters
+    dedupe_num_perm: int = 128  # MinHash signature length
+    dedupe_bands: int = 16  # LSH bands; must divide dedupe_num_perm
+
     class Config:
         env_file = ".env"
 
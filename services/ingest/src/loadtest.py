@@ -0,0 +1,301 @@
+"""Load test — drives POST /api/events and reports throughput, latency and errors.
+
+Sends recorded (NDJSON, one LearningEvent per line, replayed in a loop) or
+synthetic events either in-process through the ASGI app or to a running
+service, at a fixed request rate (open loop) or from a fixed number of
+concurrent clients (closed loop). In-process runs publish to a FakeRedis
+unless --real-redis is given, so they need no services at all.
+
+    python -m src.loadtest --requests 20000 --concurrency 32
+    python -m src.loadtest --rps 2000 --duration 30 --profile publish.prof
+    python -m src.loadtest --url http://localhost:8001 --events recorded.ndjson --rps 500
+
+With --rps, latency is measured from when each request was due, so a
+service that falls behind shows it in the percentiles. --profile (in-process
+only) writes a cProfile of the run and prints the request-path entries:
+pydantic validation, model_dump and the wire encoding.
+"""
+
+import argparse
+import asyncio
+import cProfile
+import itertools
+import json
+import logging
+import pstats
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+from uuid import UUID
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PATH = "/api/events"
+BODY_POOL = 10_000
+EVENT_MIX = {"quiz_answer": 0.6, "lesson_view": 0.3, "hint_request": 0.1}
+# Request-path functions picked out of --profile output
+PROFILE_FILTER = r"validat|model_dump|encode|dumps|publish|xadd|jsonable"
+
+
+class FakeRedis:
+    """In-process stand-in for the redis.asyncio client used by the publishers.
+
+    Accepts publish() and xadd() and counts what it receives. `delay_ms`
+    adds a sleep per call to mimic a round trip to Redis.
+    """
+
+    def __init__(self, delay_ms: float = 0):
+        self.delay = delay_ms / 1000
+        self.messages = 0
+        self.bytes = 0
+        self._ids = itertools.count(1)
+
+    async def _round_trip(self, data) -> None:
+        self.messages += 1
+        self.bytes += len(data)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+
+    async def publish(self, channel: str, data) -> int:
+        await self._round_trip(data)
+        return 1
+
+    async def xadd(self, name: str, fields: dict, **kwargs) -> bytes:
+        await self._round_trip(fields["data"])
+        return f"{int(time.time() * 1000)}-{next(self._ids)}".encode()
+
+    async def close(self) -> None:
+        pass
+
+
+def synthetic_events(seed: int = 42, users: int = 1000, questions: int = 2000) -> Iterator[dict]:
+    """Endless stream of LearningEvent bodies in the shape the web app posts."""
+    rng = random.Random(seed)
+
+    def uuid() -> str:
+        return str(UUID(int=rng.getrandbits(128), version=4))
+
+    user_ids = [uuid() for _ in range(users)]
+    quizzes = [uuid() for _ in range(max(1, questions // 10))]
+    question_ids = [(uuid(), quizzes[i // 10]) for i in range(questions)]
+    types, weights = zip(*EVENT_MIX.items())
+    now = datetime.now(timezone.utc)
+    while True:
+        now += timedelta(milliseconds=rng.expovariate(1 / 20))
+        event_type = rng.choices(types, weights)[0]
+        question_id, quiz_id = rng.choice(question_ids)
+        if event_type == "quiz_answer":
+            payload = {
+                "quiz_id": quiz_id,
+                "question_id": question_id,
+                "selected_answer": rng.choice("ABCD"),
+                "is_correct": rng.random() < 0.7,
+                "time_spent_ms": int(rng.lognormvariate(8.5, 0.6)),
+                "hints_used": rng.choices((0, 1, 2), (0.75, 0.2, 0.05))[0],
+            }
+        elif event_type == "lesson_view":
+            payload = {"lesson_id": uuid(), "duration_ms": int(rng.lognormvariate(10, 0.8))}
+        else:
+            payload = {"quiz_id": quiz_id, "question_id": question_id}
+        yield {
+            "id": uuid(),
+            "event_type": event_type,
+            "payload": payload,
+            "user_id": rng.choice(user_ids),
+            "session_id": uuid(),
+            "created_at": now.isoformat(),
+        }
+
+
+def recorded_events(path: Path) -> Iterator[dict]:
+    """Events from an NDJSON file, replayed from the top whenever the file runs out."""
+    events = [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+    if not events:
+        raise ValueError(f"No events in {path}")
+    return itertools.cycle(events)
+
+
+@dataclass
+class LoadReport:
+    sent: int = 0
+    elapsed: float = 0.0
+    latencies: list[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+
+    def record(self, latency: float, status: Optional[int] = None, error: Optional[str] = None) -> None:
+        self.sent += 1
+        self.latencies.append(latency)
+        if status is not None:
+            self.statuses[status] += 1
+        if error is not None:
+            self.errors[error] += 1
+
+    @property
+    def failed(self) -> int:
+        return sum(self.errors.values()) + sum(n for status, n in self.statuses.items() if status >= 400)
+
+    @property
+    def throughput(self) -> float:
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Latency in seconds at quantile q (0-1)."""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> str:
+        lines = [
+            f"requests   {self.sent:,} in {self.elapsed:.2f}s ({self.throughput:,.0f} req/s)",
+            f"errors     {self.failed:,} ({self.failed / self.sent:.2%})" if self.sent else "errors     0",
+            "latency ms " + "  ".join(
+                f"p{int(q * 100)}={self.percentile(q) * 1000:.2f}" for q in (0.5, 0.9, 0.99)
+            ) + f"  max={max(self.latencies, default=0) * 1000:.2f}",
+            "statuses   " + ", ".join(f"{status}: {n:,}" for status, n in sorted(self.statuses.items())),
+        ]
+        if self.errors:
+            lines.append("exceptions " + ", ".join(f"{name}: {n:,}" for name, n in self.errors.most_common()))
+        return "\n".join(lines)
+
+
+async def _send(client: httpx.AsyncClient, body: bytes, due: float, report: LoadReport) -> None:
+    try:
+        response = await client.post(EVENTS_PATH, content=body, headers={"content-type": "application/json"})
+    except httpx.HTTPError as exc:
+        report.record(time.perf_counter() - due, error=type(exc).__name__)
+    else:
+        report.record(time.perf_counter() - due, status=response.status_code)
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    events: Iterator[dict],
+    requests: Optional[int] = None,
+    duration: Optional[float] = None,
+    rps: float = 0,
+    concurrency: int = 16,
+) -> LoadReport:
+    """Post events until `requests` have been sent or `duration` seconds have passed.
+
+    With rps, requests start on a fixed schedule regardless of how fast earlier
+    ones finish (at most `concurrency` in flight). Otherwise `concurrency`
+    clients each send their next request as soon as the previous one returns.
+    """
+    if requests is None and duration is None:
+        raise ValueError("Give a request count or a duration")
+    report = LoadReport()
+    # Bodies are encoded up front (and reused in a long run) so the client's own
+    # JSON work stays out of the timings and the profile
+    pool = [json.dumps(event).encode() for event in itertools.islice(events, min(requests or BODY_POOL, BODY_POOL))]
+    bodies = itertools.cycle(pool)
+    if requests is not None:
+        bodies = itertools.islice(bodies, requests)
+    start = time.perf_counter()
+    deadline = start + duration if duration else float("inf")
+
+    if rps:
+        slots = asyncio.Semaphore(concurrency)
+        tasks = set()
+
+        async def send(body: bytes, due: float) -> None:
+            try:
+                await _send(client, body, due, report)
+            finally:
+                slots.release()
+
+        for i, body in enumerate(bodies):
+            due = start + i / rps
+            if due >= deadline:
+                break
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await slots.acquire()
+            task = asyncio.create_task(send(body, due))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+    else:
+        async def client_loop() -> None:
+            for body in bodies:
+                if time.perf_counter() >= deadline:
+                    return
+                await _send(client, body, time.perf_counter(), report)
+
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def in_process_client(fake_redis: Optional[FakeRedis]) -> httpx.AsyncClient:
+    """Client calling the ingest app directly. Its publisher is pointed at fake_redis when given."""
+    from src.main import app, publisher
+
+    if fake_redis is not None:
+        publisher._redis = fake_redis
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://ingest")
+
+
+async def main_async(args) -> LoadReport:
+    fake_redis = None if args.url or args.real_redis else FakeRedis(args.redis_delay_ms)
+    if args.url:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        client = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout)
+    else:
+        client = in_process_client(fake_redis)
+    # Per-request logs (the app's and httpx's) would dominate the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+    events = recorded_events(Path(args.events)) if args.events else synthetic_events(args.seed)
+
+    profiler = cProfile.Profile() if args.profile else None
+    async with client:
+        if profiler:
+            profiler.enable()
+        try:
+            report = await run_load(client, events, args.requests, args.duration, args.rps, args.concurrency)
+        finally:
+            if profiler:
+                profiler.disable()
+
+    print(report.summary())
+    if fake_redis is not None:
+        print(f"published  {fake_redis.messages:,} messages, {fake_redis.bytes / max(fake_redis.messages, 1):.0f} bytes each")
+    if profiler:
+        profiler.dump_stats(args.profile)
+        print(f"\nProfile written to {args.profile}; request-path functions by cumulative time:")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(PROFILE_FILTER, 25)
+    return report
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Load test POST /api/events")
+    parser.add_argument("--url", help="Base URL of a running ingest service (default: in-process)")
+    parser.add_argument("--events", help="NDJSON file of recorded events (default: synthetic)")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--rps", type=float, default=0, help="Target request rate (default: closed loop)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients, or max in flight with --rps")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Request timeout with --url")
+    parser.add_argument("--real-redis", action="store_true", help="In-process, but publish to the configured Redis")
+    parser.add_argument("--redis-delay-ms", type=float, default=0, help="Simulated Redis round trip for FakeRedis")
+    parser.add_argument("--profile", metavar="PATH", help="Write a cProfile of an in-process run to PATH")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    if args.requests is None and args.duration is None:
+        args.requests = 10_000
+    if args.profile and args.url:
+        parser.error("--profile needs an in-process run (no --url)")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,25 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
+from dataclasses import asdict
 
 from fastapi import FastAPI, HTTPException
 
 from src.config import settings
-from src.models import FetchResult, LearningEvent, SeedResult
+from src.models import (
+    FetchResult,
+    LearningEvent,
+    SeedResult,
+    SimilarityQuery,
+    SimilarityResult,
+    SnapshotResult,
+)
+from src.publishers.base import Publisher
 from src.publishers.redis_pub import RedisPublisher
+from src.publishers.redis_stream import RedisStreamPublisher
+from src.similarity.engine import SimilarityEngine, SnapshotUnavailable
+from src.similarity.minhash import question_index
+from src.similarity.snapshot import export_snapshot
 from src.sources.opentdb import fetch_and_store_quizzes
 from src.sources.seed import load_seed_data
 
@@ -15,12 +29,32 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-publisher = RedisPublisher()
+
+def build_publisher() -> Publisher:
+    """Create the publisher for the configured transport."""
+    if settings.transport == "streams":
+        return RedisStreamPublisher()
+    if settings.transport != "pubsub":
+        raise ValueError(f"Unknown transport: {settings.transport}")
+    return RedisPublisher()
+
+
+publisher = build_publisher()
+# Each uvicorn worker maps the same snapshot files, so they share one copy in the page cache
+similarity = SimilarityEngine()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Ingest service starting")
+    try:
+        await asyncio.to_thread(question_index.load)
+    except Exception:
+        # Loaded on the first seed or fetch instead
+        logger.exception("Near-duplicate index load failed")
+    snapshot = similarity.refresh()
+    if snapshot is not None:
+        logger.info(f"Vector snapshot {snapshot.name}: {snapshot.counts()}")
     yield
     await publisher.close()
     logger.info("Ingest service stopped")
@@ -70,3 +104,42 @@ async def publish_event(event: LearningEvent):
     except Exception as e:
         logger.exception("Event publish failed")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/vector-snapshot", response_model=SnapshotResult)
+def vector_snapshot():
+    """Export all lesson and quiz question embeddings to a new vector snapshot."""
+    try:
+        snapshot = export_snapshot()
+    except Exception as e:
+        logger.exception("Vector snapshot failed")
+        raise HTTPException(status_code=500, detail=str(e))
+    similarity.refresh()
+    return SnapshotResult(snapshot=snapshot.name, dim=snapshot.dim, rows=snapshot.counts())
+
+
+@app.post("/api/similar", response_model=SimilarityResult)
+def similar(query: SimilarityQuery):
+    """Top-k cosine neighbours from the vector snapshot, for query vectors and/or stored rows by id."""
+    if not query.vectors and not query.ids:
+        raise HTTPException(status_code=400, detail="Give vectors and/or ids")
+    try:
+        snapshot = similarity.refresh()
+        results = []
+        if query.vectors:
+            results += similarity.search(query.vectors, query.k, query.table, query.quantized)
+        if query.ids:
+            ids = [str(row_id) for row_id in query.ids]
+            results += similarity.search(
+                similarity.vectors_for(ids), query.k, query.table, query.quantized, exclude=ids
+            )
+    except SnapshotUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Not in the vector snapshot: {e.args[0]}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return SimilarityResult(
+        snapshot=snapshot.name,
+        results=[[asdict(match) for match in matches] for matches in results],
+    )
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 from uuid import UUID, uuid4
 
 from pydantic import BaseModel, Field
@@ -45,9 +45,40 @@ class SeedResult(BaseModel):
     lessons_loaded: int = 0
     quizzes_loaded: int = 0
     questions_loaded: int = 0
+    duplicates_skipped: int = 0
+    duplicates_flagged: int = 0
 
 
 class FetchResult(BaseModel):
     quizzes_fetched: int = 0
     questions_fetched: int = 0
+    duplicates_skipped: int = 0
+    duplicates_flagged: int = 0
     errors: list[str] = Field(default_factory=list)
+
+
+class SimilarityQuery(BaseModel):
+    """Query vectors and/or ids of stored rows to find neighbours for; one result list per query."""
+
+    vectors: list[list[float]] = Field(default_factory=list)
+    ids: list[UUID] = Field(default_factory=list)
+    k: int = Field(10, ge=1, le=100)
+    table: Optional[Literal["lessons", "quiz_questions"]] = None
+    quantized: bool = False
+
+
+class SimilarItem(BaseModel):
+    id: UUID
+    table: str
+    score: float
+
+
+class SimilarityResult(BaseModel):
+    snapshot: str
+    results: list[list[SimilarItem]]
+
+
+class SnapshotResult(BaseModel):
+    snapshot: str
+    dim: int
+    rows: dict[str, int]
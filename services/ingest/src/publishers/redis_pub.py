@@ -1,8 +1,8 @@
-import json
 import logging
 
 import redis.asyncio as aioredis
 
+from src.codec import get_codec
 from src.config import settings
 from src.publishers.base import Publisher
 
@@ -14,11 +14,12 @@ class RedisPublisher(Publisher):
 
     def __init__(self):
         self._redis = aioredis.from_url(settings.redis_url)
+        self._codec = get_codec()
 
     async def publish(self, channel: str, message: dict) -> None:
-        payload = json.dumps(message, default=str)
+        payload = self._codec.encode(message)
         await self._redis.publish(channel, payload)
-        logger.debug(f"Published to {channel}: {payload[:100]}...")
+        logger.debug(f"Published to {channel}: {payload[:100]!r}...")
 
     async def close(self) -> None:
         await self._redis.close()
@@ -0,0 +1,30 @@
+import logging
+
+import redis.asyncio as aioredis
+
+from src.codec import get_codec
+from src.config import settings
+from src.publishers.base import Publisher
+
+logger = logging.getLogger(__name__)
+
+
+class RedisStreamPublisher(Publisher):
+    """Publishes events to Redis Streams, capped at roughly stream_maxlen entries."""
+
+    def __init__(self):
+        self._redis = aioredis.from_url(settings.redis_url)
+        self._codec = get_codec()
+
+    async def publish(self, channel: str, message: dict) -> None:
+        payload = self._codec.encode(message)
+        entry_id = await self._redis.xadd(
+            channel,
+            {"data": payload},
+            maxlen=settings.stream_maxlen,
+            approximate=True,
+        )
+        logger.debug(f"Appended {entry_id} to {channel}: {payload[:100]!r}...")
+
+    async def close(self) -> None:
+        await self._redis.close()
@@ -0,0 +1,152 @@
+"""Top-k cosine similarity over the current vector snapshot.
+
+Queries are answered with NumPy against the memory-mapped snapshot (see
+src.similarity.snapshot), never Postgres. A batch of queries is scored as one
+matrix product per chunk of similarity_chunk_rows rows, keeping only each
+query's running top k, so memory stays bounded however large the snapshot.
+
+With quantized=True the int8 copy of the matrix is scanned instead (a
+quarter of the pages to touch) and the best similarity_rescore * k
+candidates per query are re-scored exactly from the float32 rows.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+from src.config import settings
+from src.similarity.snapshot import CURRENT, Snapshot, normalize
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotUnavailable(Exception):
+    """No vector snapshot has been published yet."""
+
+
+@dataclass(frozen=True)
+class Match:
+    id: str
+    table: str
+    score: float
+
+
+def _merge_top(
+    best_rows: np.ndarray, best_scores: np.ndarray, rows: np.ndarray, scores: np.ndarray, k: int
+) -> tuple[np.ndarray, np.ndarray]:
+    rows = np.concatenate([best_rows, rows], axis=1)
+    scores = np.concatenate([best_scores, scores], axis=1)
+    if scores.shape[1] <= k:
+        return rows, scores
+    keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(rows, keep, axis=1), np.take_along_axis(scores, keep, axis=1)
+
+
+def top_k(
+    matrix: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    start: int = 0,
+    stop: Optional[int] = None,
+    scales: Optional[np.ndarray] = None,
+    chunk_rows: Optional[int] = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Row numbers and scores of each query's k best rows of matrix[start:stop], best first.
+
+    `scales` marks an int8 matrix: row i scores (queries @ matrix[i]) * scales[i].
+    """
+    stop = len(matrix) if stop is None else stop
+    chunk_rows = chunk_rows or settings.similarity_chunk_rows
+    best_rows = np.empty((len(queries), 0), np.int64)
+    best_scores = np.empty((len(queries), 0), np.float32)
+    for lo in range(start, stop, chunk_rows):
+        hi = min(lo + chunk_rows, stop)
+        block = matrix[lo:hi]
+        if scales is None:
+            scores = queries @ block.T
+        else:
+            scores = (queries @ block.T.astype(np.float32)) * scales[lo:hi]
+        rows = np.broadcast_to(np.arange(lo, hi), scores.shape)
+        best_rows, best_scores = _merge_top(best_rows, best_scores, rows, scores, k)
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+class SimilarityEngine:
+    """Serves searches from whichever snapshot `current` points at, remapping when it changes."""
+
+    def __init__(self, root: Union[str, Path, None] = None):
+        self.root = Path(root or settings.vector_snapshot_dir)
+        self.snapshot: Optional[Snapshot] = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> Optional[Snapshot]:
+        """Map the current snapshot if it is not the one already mapped. Cheap when nothing changed."""
+        try:
+            path = (self.root / CURRENT).resolve(strict=True)
+        except (FileNotFoundError, RuntimeError):
+            return self.snapshot
+        if self.snapshot is None or self.snapshot.path != path:
+            with self._lock:
+                if self.snapshot is None or self.snapshot.path != path:
+                    self.snapshot = Snapshot(path)
+                    logger.info(f"Mapped vector snapshot {self.snapshot.name} ({len(self.snapshot)} rows)")
+        return self.snapshot
+
+    def vectors_for(self, ids: Sequence[str]) -> np.ndarray:
+        """The stored vectors of rows by id. Raises KeyError for ids not in the snapshot."""
+        snapshot = self._current()
+        return np.asarray(snapshot.vectors[[snapshot.rows[str(row_id)] for row_id in ids]])
+
+    def search(
+        self,
+        queries: Union[np.ndarray, Sequence[Sequence[float]]],
+        k: int = 10,
+        table: Optional[str] = None,
+        quantized: bool = False,
+        exclude: Optional[Sequence[Optional[str]]] = None,
+    ) -> list[list[Match]]:
+        """The k most similar rows for each query vector, best first.
+
+        table restricts results to one table; exclude[i] is an id left out of
+        query i's results (the row a "related to this" query started from).
+        """
+        snapshot = self._current()
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if queries.shape[1] != snapshot.dim:
+            raise ValueError(f"Query vectors have {queries.shape[1]} dimensions, the snapshot has {snapshot.dim}")
+        if table is not None and table not in snapshot.tables:
+            raise ValueError(f"Unknown table: {table}")
+        queries = normalize(queries)
+        start, stop = snapshot.tables[table] if table else (0, len(snapshot))
+        want = k + (1 if exclude else 0)
+
+        if quantized:
+            candidates, _ = top_k(snapshot.quantized, queries, want * settings.similarity_rescore, start, stop,
+                                  scales=snapshot.scales)
+            exact = np.einsum("qcd,qd->qc", snapshot.vectors[candidates], queries)
+            order = np.argsort(-exact, axis=1, kind="stable")[:, :want]
+            rows, scores = np.take_along_axis(candidates, order, axis=1), np.take_along_axis(exact, order, axis=1)
+        else:
+            rows, scores = top_k(snapshot.vectors, queries, want, start, stop)
+
+        results = []
+        for i in range(len(queries)):
+            skip = exclude[i] if exclude else None
+            matches = [
+                Match(snapshot.ids[row], snapshot.table_of(row), float(score))
+                for row, score in zip(rows[i], scores[i])
+                if snapshot.ids[row] != skip
+            ]
+            results.append(matches[:k])
+        return results
+
+    def _current(self) -> Snapshot:
+        snapshot = self.refresh()
+        if snapshot is None:
+            raise SnapshotUnavailable(f"No vector snapshot in {self.root}")
+        return snapshot
@@ -0,0 +1,221 @@
+"""Near-duplicate quiz questions: MinHash signatures in LSH buckets.
+
+Each question's text is normalised (lower case, punctuation dropped,
+whitespace collapsed) and cut into overlapping character shingles. A MinHash
+signature of dedupe_num_perm values estimates the Jaccard similarity of two
+shingle sets as the fraction of positions where the signatures agree.
+
+The signature is split into dedupe_bands bands, each hashed into a bucket.
+Only questions sharing a bucket in some band are candidates, so a lookup
+costs a few dict probes plus one comparison per candidate rather than a scan
+of every question. With 16 bands of 8 rows, a pair at similarity 0.8 shares a
+bucket with probability about 0.95, and a pair at 0.9 about 0.9998.
+Candidates are kept if their estimated similarity reaches dedupe_threshold.
+
+The ingest service loads the index from quiz_questions at startup (load()).
+Before each batch of inserts, sync() picks up questions other workers or
+services inserted since, from the updated_at watermark. Inserted questions
+are added as they go, and discarded again if their transaction rolls back.
+"""
+
+import logging
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+import numpy as np
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[\W_]+")
+# Rows changed up to this long before the watermark are re-read, in case their
+# transaction committed after the previous sync read past them
+_WATERMARK_OVERLAP = timedelta(minutes=5)
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def shingles(text: str, size: int) -> set[str]:
+    """Overlapping character `size`-grams of the normalised text."""
+    text = normalize_text(text)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures from multiply-shift hashes ((a * h + b) mod 2**64) >> 32 of CRC32 shingle hashes."""
+
+    def __init__(self, num_perm: int, shingle_size: int, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(0, 1 << 64, num_perm, dtype=np.uint64, endpoint=False) | np.uint64(1)
+        self._b = rng.integers(0, 1 << 64, num_perm, dtype=np.uint64, endpoint=False)
+
+    def signature(self, text: str) -> np.ndarray:
+        grams = shingles(text, self.shingle_size) or {""}
+        hashes = np.fromiter((zlib.crc32(gram.encode()) for gram in grams), np.uint64, len(grams))
+        # uint64 arithmetic wraps, which is the mod 2**64
+        return ((np.outer(hashes, self._a) + self._b) >> np.uint64(32)).min(axis=0).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+class LSHIndex:
+    """Signatures by key, bucketed by band."""
+
+    def __init__(self, num_perm: int, bands: int):
+        if num_perm % bands:
+            raise ValueError(f"{bands} bands do not divide {num_perm} signature values")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.signatures: dict[str, np.ndarray] = {}
+        self._buckets: list[dict[int, list[str]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.signatures
+
+    def _band_keys(self, signature: np.ndarray) -> list[int]:
+        data = signature.tobytes()
+        width = self.rows * signature.itemsize
+        return [hash(data[i * width:(i + 1) * width]) for i in range(self.bands)]
+
+    def add(self, key: str, signature: np.ndarray) -> None:
+        if key in self.signatures:
+            return
+        self.signatures[key] = signature
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(band_key, []).append(key)
+
+    def remove(self, key: str) -> None:
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            bucket = buckets.get(band_key, [])
+            if key in bucket:
+                bucket.remove(key)
+            if not bucket:
+                buckets.pop(band_key, None)
+
+    def candidates(self, signature: np.ndarray) -> set[str]:
+        found = set()
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            found.update(buckets.get(band_key, ()))
+        return found
+
+    def query(self, signature: np.ndarray, threshold: float) -> list[tuple[str, float]]:
+        """Keys whose estimated similarity reaches `threshold`, most similar first."""
+        matches = []
+        for key in self.candidates(signature):
+            score = similarity(signature, self.signatures[key])
+            if score >= threshold:
+                matches.append((key, score))
+        return sorted(matches, key=lambda match: -match[1])
+
+
+@dataclass(frozen=True)
+class Duplicate:
+    question_id: str
+    similarity: float
+
+
+class QuestionIndex:
+    """Near-duplicate index over quiz_questions.question_text."""
+
+    def __init__(self):
+        self.hasher = MinHasher(settings.dedupe_num_perm, settings.dedupe_shingle_size)
+        self._lsh = LSHIndex(settings.dedupe_num_perm, settings.dedupe_bands)
+        self._watermark: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._lsh)
+
+    def load(self) -> None:
+        """Replace the index with every question in quiz_questions."""
+        import psycopg2
+
+        conn = psycopg2.connect(settings.database_url)
+        try:
+            self.sync(conn, full=True)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def sync(self, conn, full: bool = False) -> None:
+        """Bring the index up to date on `conn`: a full load the first time, then questions changed since."""
+        if full or not self.loaded:
+            start = time.perf_counter()
+            with conn.cursor() as cur, conn.cursor(name="dedupe_questions") as questions:
+                cur.execute("SELECT MAX(updated_at) FROM quiz_questions")
+                watermark = cur.fetchone()[0]
+                questions.itersize = 20000
+                questions.execute("SELECT id::text, question_text FROM quiz_questions")
+                self.replace(questions, watermark)
+            logger.info(f"Near-duplicate index loaded: {len(self)} questions in {time.perf_counter() - start:.2f}s")
+            return
+        if self._watermark is None:  # loaded from an empty table
+            since, params = "", ()
+        else:
+            since, params = " WHERE updated_at > %s", (self._watermark - _WATERMARK_OVERLAP,)
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT id::text, question_text, updated_at FROM quiz_questions{since}", params)
+            rows = cur.fetchall()
+        with self._lock:
+            for question_id, text, updated_at in rows:
+                if question_id not in self._lsh:
+                    self._lsh.add(question_id, self.hasher.signature(text))
+                self._watermark = max(self._watermark or updated_at, updated_at)
+
+    def replace(self, questions: Iterable[tuple[str, str]], watermark: Optional[datetime] = None) -> None:
+        """Swap in an index built from (id, question_text) rows."""
+        lsh = LSHIndex(settings.dedupe_num_perm, settings.dedupe_bands)
+        for question_id, text in questions:
+            lsh.add(str(question_id), self.hasher.signature(text))
+        with self._lock:
+            self._lsh = lsh
+            self._watermark = watermark
+            self.loaded = True
+
+    def find(self, text: str) -> Optional[Duplicate]:
+        """The indexed question most similar to `text`, if any reaches dedupe_threshold."""
+        matches = self._lsh.query(self.hasher.signature(text), settings.dedupe_threshold)
+        return Duplicate(*matches[0]) if matches else None
+
+    def check(self, text: str) -> Optional[Duplicate]:
+        """find(), or None when dedupe_action is off."""
+        if settings.dedupe_action == "off":
+            return None
+        if settings.dedupe_action not in ("skip", "flag"):
+            raise ValueError(f"Unknown dedupe_action: {settings.dedupe_action}")
+        return self.find(text)
+
+    def add(self, question_id, text: str) -> None:
+        with self._lock:
+            self._lsh.add(str(question_id), self.hasher.signature(text))
+
+    def discard(self, question_ids: Iterable) -> None:
+        """Forget questions whose insert was rolled back."""
+        with self._lock:
+            for question_id in question_ids:
+                self._lsh.remove(str(question_id))
+
+
+question_index = QuestionIndex()
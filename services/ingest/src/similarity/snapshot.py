@@ -0,0 +1,223 @@
+"""Vector snapshot: every lessons and quiz_questions embedding in flat files.
+
+A snapshot is a directory holding:
+
+- vectors.f32: an (n, dim) float32 matrix, rows L2-normalised so a dot
+  product is the cosine similarity;
+- vectors.i8 and scales.f32: the same rows quantised to int8 with one
+  float32 scale per row (row ~= i8 * scale), a quarter of the size;
+- meta.json: the id sidecar (row i is ids[i]), the dimension and which row
+  range belongs to which table.
+
+The matrices are opened with np.memmap, read-only, so they are paged in on
+demand and every process that maps the same snapshot (all uvicorn workers of
+the ingest service) shares one copy in the page cache instead of each
+loading its own.
+
+Snapshots are written to a new directory and published by atomically
+repointing the `current` symlink, so readers never see a half-written one.
+Old snapshots are pruned down to vector_snapshot_keep; a process still
+mapping a pruned one keeps reading it until it refreshes.
+
+    python -m src.similarity.snapshot
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+TABLES = ("lessons", "quiz_questions")
+CURRENT = "current"
+VECTORS_FILE = "vectors.f32"
+QUANTIZED_FILE = "vectors.i8"
+SCALES_FILE = "scales.f32"
+META_FILE = "meta.json"
+
+# pgvector's binary representation (vector_send): int16 dim, int16 unused, big-endian float4 values
+_HEADER_BYTES = 4
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Rows scaled to unit length (all-zero rows are left as they are)."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def quantize(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantisation: returns (int8 rows, float32 scales)."""
+    scales = (np.abs(vectors).max(axis=1) / 127).astype(np.float32) if len(vectors) else np.zeros(0, np.float32)
+    safe = np.where(scales > 0, scales, 1)[:, None]
+    return np.round(vectors / safe).astype(np.int8), scales
+
+
+def decode_vectors(values: Sequence[bytes], dim: Optional[int] = None) -> np.ndarray:
+    """A float32 matrix from vector_send() values."""
+    if not values:
+        return np.zeros((0, dim or 0), np.float32)
+    dim = dim or (len(values[0]) - _HEADER_BYTES) // 4
+    buffer = b"".join(bytes(value)[_HEADER_BYTES:] for value in values)
+    if len(buffer) != len(values) * dim * 4:
+        raise ValueError(f"Embeddings are not all {dim}-dimensional")
+    return np.frombuffer(buffer, dtype=">f4").reshape(len(values), dim).astype(np.float32)
+
+
+class Snapshot:
+    """A published snapshot, memory-mapped read-only."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        meta = json.loads((path / META_FILE).read_text())
+        self.dim: int = meta["dim"]
+        self.created_at: str = meta["created_at"]
+        self.ids: list[str] = meta["ids"]
+        self.tables: dict[str, tuple[int, int]] = {table: tuple(rows) for table, rows in meta["tables"].items()}
+        self.rows = {row_id: i for i, row_id in enumerate(self.ids)}
+        self.vectors = self._map(VECTORS_FILE, np.float32, (len(self.ids), self.dim))
+        self.quantized = self._map(QUANTIZED_FILE, np.int8, (len(self.ids), self.dim))
+        self.scales = self._map(SCALES_FILE, np.float32, (len(self.ids),))
+
+    def _map(self, name: str, dtype, shape: tuple) -> np.ndarray:
+        if 0 in shape:  # an empty file can't be mapped
+            return np.zeros(shape, dtype)
+        return np.memmap(self.path / name, dtype=dtype, mode="r", shape=shape)
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def table_of(self, row: int) -> str:
+        for table, (start, stop) in self.tables.items():
+            if start <= row < stop:
+                return table
+        raise IndexError(row)
+
+    def counts(self) -> dict[str, int]:
+        return {table: stop - start for table, (start, stop) in self.tables.items()}
+
+
+class SnapshotWriter:
+    """Writes a snapshot one batch at a time, then publishes it as `current`.
+
+    Tables must be added one after the other (each table's rows contiguous).
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.path = self.root / f"snapshot-{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}"
+        self.path.mkdir()
+        self.dim: Optional[int] = None
+        self.ids: list[str] = []
+        self.tables: dict[str, list[int]] = {}
+        self._files = [open(self.path / name, "wb") for name in (VECTORS_FILE, QUANTIZED_FILE, SCALES_FILE)]
+
+    def add(self, table: str, ids: Sequence, vectors: np.ndarray) -> None:
+        if len(ids) != len(vectors):
+            raise ValueError(f"{len(ids)} ids for {len(vectors)} vectors")
+        if not len(ids):
+            self.tables.setdefault(table, [len(self.ids), len(self.ids)])
+            return
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"{table} embeddings have {vectors.shape[1]} dimensions, expected {self.dim}")
+        rows = self.tables.setdefault(table, [len(self.ids), len(self.ids)])
+        if rows[1] != len(self.ids):
+            raise ValueError(f"Rows for {table} must be added together")
+
+        unit = normalize(np.asarray(vectors, dtype=np.float32))
+        quantized, scales = quantize(unit)
+        for f, data in zip(self._files, (unit, quantized, scales)):
+            f.write(np.ascontiguousarray(data).tobytes())
+        self.ids.extend(str(row_id) for row_id in ids)
+        rows[1] = len(self.ids)
+
+    def publish(self, keep: Optional[int] = None) -> Snapshot:
+        for f in self._files:
+            f.close()
+        meta = {
+            "dim": self.dim or 0,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "tables": self.tables,
+            "ids": self.ids,
+        }
+        (self.path / META_FILE).write_text(json.dumps(meta))
+        link = self.root / f"{CURRENT}.tmp"
+        if link.is_symlink():
+            link.unlink()
+        link.symlink_to(self.path.name)
+        os.replace(link, self.root / CURRENT)
+        prune(self.root, keep or settings.vector_snapshot_keep)
+        return Snapshot(self.path)
+
+    def discard(self) -> None:
+        for f in self._files:
+            f.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def prune(root: Path, keep: int) -> None:
+    """Remove all but the newest `keep` snapshots (never the current one)."""
+    current = (root / CURRENT).resolve()
+    snapshots = sorted(path for path in root.glob("snapshot-*") if path.is_dir())
+    for path in snapshots[:-keep] if keep > 0 else snapshots:
+        if path.resolve() != current:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def export_snapshot(root: Union[str, Path, None] = None) -> Snapshot:
+    """Export all embedded lessons and quiz_questions rows from Postgres and publish the snapshot."""
+    import psycopg2
+
+    writer = SnapshotWriter(root or settings.vector_snapshot_dir)
+    conn = psycopg2.connect(settings.database_url)
+    try:
+        for table in TABLES:
+            # Named (server-side) cursor: the rows stream in batches instead of all at once
+            with conn.cursor(name=f"snapshot_{table}") as cur:
+                cur.itersize = settings.vector_snapshot_batch
+                cur.execute(
+                    f"SELECT id::text, vector_send(embedding) FROM {table} "
+                    "WHERE embedding IS NOT NULL ORDER BY id"
+                )
+                while rows := cur.fetchmany(settings.vector_snapshot_batch):
+                    writer.add(table, [row[0] for row in rows], decode_vectors([row[1] for row in rows], writer.dim))
+            writer.add(table, [], np.zeros((0, writer.dim or 0), np.float32))  # a table with no rows yet
+        conn.rollback()
+    except Exception:
+        writer.discard()
+        raise
+    finally:
+        conn.close()
+
+    snapshot = writer.publish()
+    logger.info(f"Published vector snapshot {snapshot.name}: {snapshot.counts()} rows of {snapshot.dim} dimensions")
+    return snapshot
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Export embeddings to a memory-mapped vector snapshot")
+    parser.add_argument("--dir", default=settings.vector_snapshot_dir, help="Snapshot root directory")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=settings.log_level, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    snapshot = export_snapshot(args.dir)
+    print(f"{snapshot.path}: {snapshot.counts()} ({snapshot.dim} dimensions)")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ from tenacity import retry, stop_after_attempt, wait_exponential
 
 from src.config import settings
 from src.models import FetchResult, QuizData, QuizQuestionData
+from src.similarity.minhash import question_index
 
 logger = logging.getLogger(__name__)
 
@@ -95,8 +96,10 @@ async def fetch_and_store_quizzes(amount_per_category: int = 5) -> FetchResult:
 
     result = FetchResult()
     conn = psycopg2.connect(settings.database_url)
+    added = []  # question ids added to the near-duplicate index, forgotten again on rollback
 
     try:
+        question_index.sync(conn)
         with conn.cursor() as cur:
             cur.execute("SELECT id, name FROM subjects")
             subject_map = {row[1].lower(): row[0] for row in cur.fetchall()}
@@ -124,23 +127,34 @@ async def fetch_and_store_quizzes(amount_per_category: int = 5) -> FetchResult:
                         logger.info(f"Quiz {quiz.source_id} already exists, skipping")
                         continue
 
-                    cur.execute(
-                        """
-                        INSERT INTO quizzes (subject_id, title, difficulty, source, source_id)
-                        VALUES (%s, %s, %s, %s, %s)
-                        RETURNING id
-                        """,
-                        (subject_id, quiz.title, quiz.difficulty, quiz.source, quiz.source_id),
-                    )
-                    quiz_id = cur.fetchone()[0]
-                    result.quizzes_fetched += 1
-
+                    quiz_id = None
                     for i, q in enumerate(quiz.questions):
+                        duplicate = question_index.check(q.question_text)
+                        if duplicate and settings.dedupe_action == "skip":
+                            logger.debug(f"Skipping near-duplicate of question {duplicate.question_id}: {q.question_text}")
+                            result.duplicates_skipped += 1
+                            continue
+
+                        # Inserted with its first new question, so a quiz of duplicates adds nothing
+                        if quiz_id is None:
+                            cur.execute(
+                                """
+                                INSERT INTO quizzes (subject_id, title, difficulty, source, source_id)
+                                VALUES (%s, %s, %s, %s, %s)
+                                RETURNING id
+                                """,
+                                (subject_id, quiz.title, quiz.difficulty, quiz.source, quiz.source_id),
+                            )
+                            quiz_id = cur.fetchone()[0]
+                            result.quizzes_fetched += 1
+
                         cur.execute(
                             """
                             INSERT INTO quiz_questions
-                                (quiz_id, question_text, question_type, options, correct_answer, explanation, sort_order)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s)
+                                (quiz_id, question_text, question_type, options, correct_answer, explanation,
+                                 sort_order, duplicate_of)
+                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                            RETURNING id
                             """,
                             (
                                 quiz_id,
@@ -150,10 +164,19 @@ async def fetch_and_store_quizzes(amount_per_category: int = 5) -> FetchResult:
                                 q.correct_answer,
                                 q.explanation,
                                 i,
+                                duplicate.question_id if duplicate else None,
                             ),
                         )
+                        question_id = cur.fetchone()[0]
+                        question_index.add(question_id, q.question_text)
+                        added.append(question_id)
                         result.questions_fetched += 1
+                        if duplicate:
+                            result.duplicates_flagged += 1
 
+                    if quiz_id is None:
+                        logger.info(f"Quiz {quiz.source_id} has only near-duplicate questions, skipping")
+                        continue
                     logger.info(f"Fetched quiz: {quiz.title} ({len(quiz.questions)} questions)")
 
                 except Exception as e:
@@ -165,6 +188,7 @@ async def fetch_and_store_quizzes(amount_per_category: int = 5) -> FetchResult:
 
     except Exception:
         conn.rollback()
+        question_index.discard(added)
         logger.exception("Failed to fetch and store quizzes")
         raise
     finally:
@@ -7,6 +7,7 @@ from psycopg2.extras import execute_values
 
 from src.config import settings
 from src.models import SeedResult
+from src.similarity.minhash import question_index
 
 logger = logging.getLogger(__name__)
 
@@ -21,8 +22,10 @@ def load_seed_data() -> SeedResult:
     """Load lessons and quizzes from seed JSON files into Postgres."""
     result = SeedResult()
     conn = get_db_connection()
+    added = []  # question ids added to the near-duplicate index, forgotten again on rollback
 
     try:
+        question_index.sync(conn)
         with conn.cursor() as cur:
             # Get subject name -> id mapping
             cur.execute("SELECT id, name FROM subjects")
@@ -66,23 +69,33 @@ def load_seed_data() -> SeedResult:
                         logger.warning(f"Unknown subject: {quiz['subject']}")
                         continue
 
-                    cur.execute(
-                        """
-                        INSERT INTO quizzes (subject_id, title, difficulty, source)
-                        VALUES (%s, %s, %s, 'seed')
-                        RETURNING id
-                        """,
-                        (subject_id, quiz["title"], quiz.get("difficulty", "medium")),
-                    )
-                    quiz_id = cur.fetchone()[0]
-                    result.quizzes_loaded += 1
-
+                    quiz_id = None
                     for i, q in enumerate(quiz.get("questions", [])):
+                        duplicate = question_index.check(q["question_text"])
+                        if duplicate and settings.dedupe_action == "skip":
+                            result.duplicates_skipped += 1
+                            continue
+
+                        # Inserted with its first new question, so reseeding adds no empty quizzes
+                        if quiz_id is None:
+                            cur.execute(
+                                """
+                                INSERT INTO quizzes (subject_id, title, difficulty, source)
+                                VALUES (%s, %s, %s, 'seed')
+                                RETURNING id
+                                """,
+                                (subject_id, quiz["title"], quiz.get("difficulty", "medium")),
+                            )
+                            quiz_id = cur.fetchone()[0]
+                            result.quizzes_loaded += 1
+
                         cur.execute(
                             """
                             INSERT INTO quiz_questions
-                                (quiz_id, question_text, question_type, options, correct_answer, explanation, sort_order)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s)
+                                (quiz_id, question_text, question_type, options, correct_answer, explanation,
+                                 sort_order, duplicate_of)
+                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                            RETURNING id
                             """,
                             (
                                 quiz_id,
@@ -92,18 +105,26 @@ def load_seed_data() -> SeedResult:
                                 q["correct_answer"],
                                 q.get("explanation"),
                                 i,
+                                duplicate.question_id if duplicate else None,
                             ),
                         )
+                        question_id = cur.fetchone()[0]
+                        question_index.add(question_id, q["question_text"])
+                        added.append(question_id)
                         result.questions_loaded += 1
+                        if duplicate:
+                            result.duplicates_flagged += 1
 
             conn.commit()
             logger.info(
                 f"Seed complete: {result.lessons_loaded} lessons, "
-                f"{result.quizzes_loaded} quizzes, {result.questions_loaded} questions"
+                f"{result.quizzes_loaded} quizzes, {result.questions_loaded} questions "
+                f"({result.duplicates_skipped} near-duplicates skipped)"
             )
 
     except Exception:
         conn.rollback()
+        question_index.discard(added)
         logger.exception("Failed to load seed data")
         raise
     finally:
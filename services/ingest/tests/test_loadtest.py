@@ -0,0 +1,60 @@
+import itertools
+
+import httpx
+import pytest
+
+from src import main
+from src.loadtest import FakeRedis, LoadReport, run_load, synthetic_events
+from src.models import LearningEvent
+
+
+class FailingRedis(FakeRedis):
+    async def publish(self, channel: str, data) -> int:
+        raise ConnectionError("redis down")
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    def install(redis):
+        monkeypatch.setattr(main.publisher, "_redis", redis)
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://ingest")
+
+    return install
+
+
+@pytest.mark.parametrize("rps", [0, 2000])
+async def test_run_load_publishes_every_event(fake_redis, rps):
+    redis = FakeRedis()
+    async with fake_redis(redis) as client:
+        report = await run_load(client, synthetic_events(), requests=50, rps=rps, concurrency=4)
+
+    assert report.sent == 50
+    assert report.statuses == {200: 50}
+    assert report.failed == 0
+    assert redis.messages == 50
+    assert 0 < report.percentile(0.5) <= report.percentile(0.99)
+
+
+async def test_run_load_counts_server_errors(fake_redis):
+    async with fake_redis(FailingRedis()) as client:
+        report = await run_load(client, synthetic_events(), requests=10, concurrency=2)
+
+    assert report.statuses == {500: 10}
+    assert report.failed == 10
+    assert "errors     10 (100.00%)" in report.summary()
+
+
+def test_synthetic_events_are_valid_learning_events():
+    events = list(itertools.islice(synthetic_events(seed=1), 200))
+    assert {e["event_type"] for e in events} == {"quiz_answer", "lesson_view", "hint_request"}
+    for event in events:
+        LearningEvent.model_validate(event)
+    assert [e["id"] for e in events] == [e["id"] for e in itertools.islice(synthetic_events(seed=1), 200)]
+
+
+def test_report_percentiles():
+    report = LoadReport()
+    for ms in range(1, 101):
+        report.record(ms / 1000, status=200)
+    assert report.percentile(0.5) == pytest.approx(0.051)
+    assert report.percentile(0.99) == pytest.approx(0.100)
@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+import pytest
+
+from src.config import settings
+from src.similarity.minhash import LSHIndex, MinHasher, QuestionIndex, normalize_text, shingles, similarity
+from src.sources.opentdb import fetch_and_store_quizzes
+
+CAPITAL = "What is the capital city of France?"
+
+
+def test_normalize_and_shingle():
+    assert normalize_text("  What's the CAPITAL_of France?? ") == "what s the capital of france"
+    assert shingles("Hi!", 5) == {"hi"}
+    assert shingles("", 5) == set()
+    assert shingles("abcdef", 5) == {"abcde", "bcdef"}
+
+
+def test_signatures_estimate_jaccard_similarity():
+    hasher = MinHasher(256, 5)
+    a = hasher.signature(CAPITAL)
+    assert similarity(a, hasher.signature("what is the capital city of france")) == 1.0
+    assert similarity(a, hasher.signature("What is the capital city of Spain?")) > 0.5
+    assert similarity(a, hasher.signature("How many legs does a spider have?")) < 0.1
+
+
+def test_lsh_finds_near_duplicates_and_forgets_removed_keys():
+    hasher, lsh = MinHasher(128, 5), LSHIndex(128, 16)
+    lsh.add("capital", hasher.signature(CAPITAL))
+    lsh.add("spider", hasher.signature("How many legs does a spider have?"))
+
+    matches = lsh.query(hasher.signature("What is the capital city of France ?"), 0.8)
+    assert [key for key, _ in matches] == ["capital"]
+    assert lsh.query(hasher.signature("Which planet is known as the red planet?"), 0.8) == []
+
+    lsh.remove("capital")
+    assert "capital" not in lsh
+    assert lsh.query(hasher.signature(CAPITAL), 0.8) == []
+    with pytest.raises(ValueError):
+        LSHIndex(128, 12)
+
+
+def _connection(full_rows, watermark, changed_rows=()):
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.fetchone.return_value = (watermark,)
+    cur.fetchall.return_value = list(changed_rows)
+    cur.__iter__.return_value = iter(full_rows)
+    return conn, cur
+
+
+def test_question_index_loads_then_syncs_from_the_watermark():
+    index = QuestionIndex()
+    watermark = datetime(2026, 1, 1)
+    conn, cur = _connection([("q1", CAPITAL)], watermark)
+    index.sync(conn)
+    assert index.loaded and len(index) == 1
+    assert index.find("what is the capital city of france").question_id == "q1"
+
+    later = watermark + timedelta(minutes=1)
+    conn, cur = _connection([], None, [("q1", CAPITAL, watermark), ("q2", "How many legs does a spider have?", later)])
+    index.sync(conn)
+    sql, params = cur.execute.call_args.args
+    assert "WHERE updated_at > %s" in sql and params[0] < watermark
+    assert len(index) == 2 and index._watermark == later
+
+    index.discard(["q2"])
+    assert index.find("How many legs does a spider have?") is None
+
+
+def _raw(question):
+    return {"question": question, "correct_answer": "A", "incorrect_answers": ["B", "C", "D"], "difficulty": "easy"}
+
+
+@pytest.mark.parametrize("action", ["skip", "flag"])
+async def test_fetch_and_store_skips_or_flags_near_duplicates(action, monkeypatch):
+    monkeypatch.setattr(settings, "dedupe_action", action)
+    index = QuestionIndex()
+    index.replace([("existing", CAPITAL)])
+    monkeypatch.setattr(index, "sync", lambda conn: None)
+    monkeypatch.setattr("src.sources.opentdb.question_index", index)
+    monkeypatch.setattr("src.sources.opentdb.CATEGORY_MAP", {17: "Science"})
+
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.fetchall.return_value = [(1, "Science")]
+    cur.fetchone.side_effect = [None] + [(uuid4(),) for _ in range(4)]
+    raw = [_raw("What is the capital city of France ?"), _raw("How many legs does a spider have?")]
+
+    with patch("psycopg2.connect", return_value=conn), \
+            patch("src.sources.opentdb.fetch_from_opentdb", AsyncMock(return_value=raw)):
+        result = await fetch_and_store_quizzes(2)
+
+    question_inserts = [c.args[1] for c in cur.execute.call_args_list if "INSERT INTO quiz_questions" in c.args[0]]
+    if action == "skip":
+        assert result.duplicates_skipped == 1 and result.questions_fetched == 1
+        assert [params[1] for params in question_inserts] == ["How many legs does a spider have?"]
+    else:
+        assert result.duplicates_flagged == 1 and result.questions_fetched == 2
+        assert [params[-1] for params in question_inserts] == ["existing", None]
+    # The new question is indexed, so it is caught next time
+    assert index.find("How many legs does a spider have?") is not None
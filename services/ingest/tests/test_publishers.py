@@ -0,0 +1,60 @@
+import json
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+import msgpack
+import pytest
+
+from src.codec import MsgpackCodec, get_codec
+from src.publishers.redis_pub import RedisPublisher
+from src.publishers.redis_stream import RedisStreamPublisher
+
+
+@patch("src.publishers.redis_stream.aioredis")
+async def test_stream_publish_caps_length(mock_aioredis):
+    mock_redis = AsyncMock()
+    mock_aioredis.from_url.return_value = mock_redis
+
+    publisher = RedisStreamPublisher()
+    await publisher.publish("learning-events", {"event_type": "quiz_answer", "payload": {}})
+
+    mock_redis.xadd.assert_awaited_once()
+    args, kwargs = mock_redis.xadd.call_args
+    assert args[0] == "learning-events"
+    assert json.loads(args[1]["data"])["event_type"] == "quiz_answer"
+    assert kwargs["approximate"] is True
+    assert kwargs["maxlen"] > 0
+
+
+@pytest.mark.parametrize("name", ["json", "orjson", "msgpack"])
+def test_codec_round_trip(name):
+    codec = get_codec(name)
+    event_id = uuid4()
+    message = {"id": event_id, "created_at": datetime(2024, 1, 2, 3, 4, 5), "payload": {"n": 1}}
+
+    decoded = codec.decode(codec.encode(message))
+
+    assert decoded["id"] == str(event_id)
+    assert decoded["created_at"].startswith("2024-01-02")
+    assert decoded["payload"] == {"n": 1}
+
+
+def test_msgpack_codec_accepts_json():
+    assert MsgpackCodec().decode(b'{"event_type": "x"}') == {"event_type": "x"}
+
+
+@patch("src.publishers.redis_pub.settings")
+@patch("src.publishers.redis_pub.aioredis")
+async def test_pubsub_publish_uses_configured_codec(mock_aioredis, mock_settings):
+    mock_redis = AsyncMock()
+    mock_aioredis.from_url.return_value = mock_redis
+
+    with patch("src.codec.settings") as codec_settings:
+        codec_settings.codec = "msgpack"
+        publisher = RedisPublisher()
+    await publisher.publish("learning-events", {"event_type": "lesson_view"})
+
+    channel, data = mock_redis.publish.call_args[0]
+    assert channel == "learning-events"
+    assert msgpack.unpackb(data) == {"event_type": "lesson_view"}
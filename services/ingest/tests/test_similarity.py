@@ -0,0 +1,151 @@
+import struct
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from src.similarity.engine import SimilarityEngine, SnapshotUnavailable, top_k
+from src.similarity.snapshot import CURRENT, Snapshot, SnapshotWriter, decode_vectors, export_snapshot
+
+
+def _vectors(rows, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(rows, dim)).astype(np.float32)
+
+
+def _write(root, lessons, questions, keep=2):
+    writer = SnapshotWriter(root)
+    lesson_ids = [str(uuid4()) for _ in lessons]
+    question_ids = [str(uuid4()) for _ in questions]
+    writer.add("lessons", lesson_ids, lessons)
+    writer.add("quiz_questions", question_ids, questions)
+    return writer.publish(keep), lesson_ids, question_ids
+
+
+def _exact(vectors, query, k):
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return list(np.argsort(-(unit @ (query / np.linalg.norm(query))))[:k])
+
+
+def test_snapshot_round_trips_through_memory_maps(tmp_path):
+    lessons, questions = _vectors(3), _vectors(5, seed=1)
+    _, lesson_ids, question_ids = _write(tmp_path, lessons, questions)
+
+    snapshot = Snapshot((tmp_path / CURRENT).resolve())
+    assert isinstance(snapshot.vectors, np.memmap)
+    assert snapshot.counts() == {"lessons": 3, "quiz_questions": 5}
+    assert snapshot.ids == lesson_ids + question_ids
+    assert snapshot.table_of(2) == "lessons" and snapshot.table_of(3) == "quiz_questions"
+    np.testing.assert_allclose(np.linalg.norm(snapshot.vectors, axis=1), 1, rtol=1e-6)
+    dequantized = snapshot.quantized.astype(np.float32) * snapshot.scales[:, None]
+    np.testing.assert_allclose(dequantized, snapshot.vectors, atol=0.01)
+
+
+def test_publish_repoints_current_and_prunes_old_snapshots(tmp_path):
+    first, _, _ = _write(tmp_path, _vectors(2), _vectors(2), keep=2)
+    second, _, _ = _write(tmp_path, _vectors(2), _vectors(2), keep=2)
+    third, _, _ = _write(tmp_path, _vectors(2), _vectors(2), keep=2)
+
+    assert (tmp_path / CURRENT).resolve() == third.path.resolve()
+    assert not first.path.exists()
+    assert second.path.exists()
+
+
+def test_top_k_matches_exact_search_across_chunks():
+    matrix = _vectors(1000, dim=16)
+    unit = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    queries = _vectors(4, dim=16, seed=3)
+
+    rows, scores = top_k(unit, queries / np.linalg.norm(queries, axis=1, keepdims=True), 5, chunk_rows=64)
+
+    for query, found, found_scores in zip(queries, rows, scores):
+        assert list(found) == _exact(matrix, query, 5)
+        assert list(found_scores) == sorted(found_scores, reverse=True)
+
+
+def test_engine_searches_batches_by_table_and_quantized(tmp_path):
+    lessons, questions = _vectors(200, dim=32), _vectors(300, dim=32, seed=1)
+    _, lesson_ids, question_ids = _write(tmp_path, lessons, questions)
+    engine = SimilarityEngine(tmp_path)
+    queries = _vectors(3, dim=32, seed=2)
+
+    exact = engine.search(queries, k=5)
+    assert [len(matches) for matches in exact] == [5, 5, 5]
+    everything = np.vstack([lessons, questions])
+    all_ids = lesson_ids + question_ids
+    for query, matches in zip(queries, exact):
+        assert [m.id for m in matches] == [all_ids[row] for row in _exact(everything, query, 5)]
+
+    only_questions = engine.search(queries, k=5, table="quiz_questions")
+    assert all(m.table == "quiz_questions" for matches in only_questions for m in matches)
+
+    quantized = engine.search(queries, k=5, quantized=True)
+    recall = np.mean([len({m.id for m in a} & {m.id for m in e}) / 5 for a, e in zip(quantized, exact)])
+    assert recall >= 0.8
+    # Quantized candidates are re-scored exactly
+    assert quantized[0][0].score == pytest.approx(exact[0][0].score, abs=1e-5)
+
+
+def test_engine_excludes_the_query_row_and_follows_new_snapshots(tmp_path):
+    engine = SimilarityEngine(tmp_path)
+    with pytest.raises(SnapshotUnavailable):
+        engine.search(_vectors(1), k=1)
+
+    first, lesson_ids, _ = _write(tmp_path, _vectors(10), _vectors(10, seed=1))
+    related = engine.search(engine.vectors_for(lesson_ids[:1]), k=3, exclude=lesson_ids[:1])
+    assert len(related[0]) == 3 and lesson_ids[0] not in {m.id for m in related[0]}
+
+    second, _, _ = _write(tmp_path, _vectors(4), _vectors(4))
+    assert engine.refresh().path == second.path.resolve()
+    with pytest.raises(KeyError):
+        engine.vectors_for(lesson_ids[:1])
+    with pytest.raises(ValueError):
+        engine.search(_vectors(1, dim=3), k=1)
+
+
+def test_export_snapshot_streams_vector_send_rows(tmp_path):
+    def vector_send(values):
+        return struct.pack(f"!hh{len(values)}f", len(values), 0, *values)
+
+    rows = {
+        "lessons": [("l1", vector_send([1.0, 0.0])), ("l2", vector_send([0.0, 2.0]))],
+        "quiz_questions": [],
+    }
+    conn = MagicMock()
+
+    def cursor(name):
+        cur = MagicMock()
+        table = name.removeprefix("snapshot_")
+        cur.__enter__.return_value.fetchmany.side_effect = [rows[table], []] if rows[table] else [[]]
+        return cur
+
+    conn.cursor.side_effect = cursor
+    with patch("psycopg2.connect", return_value=conn):
+        snapshot = export_snapshot(tmp_path)
+
+    assert snapshot.ids == ["l1", "l2"]
+    assert snapshot.counts() == {"lessons": 2, "quiz_questions": 0}
+    np.testing.assert_allclose(snapshot.vectors, [[1, 0], [0, 1]])
+    np.testing.assert_array_equal(decode_vectors([vector_send([0.5, 1.5])]), [[0.5, 1.5]])
+
+
+def test_similar_endpoint(tmp_path):
+    _, lesson_ids, _ = _write(tmp_path, _vectors(5), _vectors(5, seed=1))
+    with patch("src.main.publisher") as mock_pub, patch("src.main.similarity", SimilarityEngine(tmp_path)):
+        mock_pub.close = AsyncMock()
+        from src.main import app
+        client = TestClient(app)
+
+        resp = client.post("/api/similar", json={"vectors": _vectors(2).tolist(), "ids": lesson_ids[:1], "k": 3})
+        assert resp.status_code == 200
+        results = resp.json()["results"]
+        assert [len(matches) for matches in results] == [3, 3, 3]
+        assert lesson_ids[0] not in {m["id"] for m in results[2]}
+
+        assert client.post("/api/similar", json={}).status_code == 400
+        assert client.post("/api/similar", json={"ids": [str(uuid4())]}).status_code == 404
+        assert client.post("/api/similar", json={"vectors": [[1.0, 2.0]]}).status_code == 400
+
+    with patch("src.main.similarity", SimilarityEngine(tmp_path / "empty")):
+        assert client.post("/api/similar", json={"vectors": [[1.0]]}).status_code == 503
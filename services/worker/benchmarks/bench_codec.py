@@ -0,0 +1,82 @@
+"""Microbenchmark: per-event CPU spent on serialization along the event path.
+
+Measures publish (ingest encode) + listen (worker decode) + the payload
+encoding for the learning_events JSONB column, for the old stdlib path and
+each codec.
+
+    cd services/worker && python -m benchmarks.bench_codec [iterations]
+"""
+
+import json
+import sys
+import time
+from datetime import datetime
+from uuid import uuid4
+
+from src.codec import RAW_KEY, get_codec, decode_event, to_json_text
+
+
+def sample_event() -> dict:
+    """A quiz_answer event shaped like LearningEvent.model_dump() output."""
+    return {
+        "id": uuid4(),
+        "event_type": "quiz_answer",
+        "payload": {
+            "quiz_id": str(uuid4()),
+            "question_id": str(uuid4()),
+            "selected_answer": "Mercury",
+            "is_correct": True,
+            "time_spent_ms": 4210,
+            "hints_used": 1,
+        },
+        "user_id": uuid4(),
+        "session_id": uuid4(),
+        "created_at": datetime.utcnow(),
+    }
+
+
+def stdlib_path(event: dict) -> None:
+    """Baseline: json.dumps on publish, json.loads on listen, json.dumps(payload) on insert."""
+    data = json.dumps(event, default=str)
+    decoded = json.loads(data)
+    json.dumps(decoded["payload"])
+
+
+def codec_path(codec):
+    def run(event: dict) -> None:
+        data = codec.encode(event)
+        decoded = decode_event(codec, data)
+        if RAW_KEY not in decoded:
+            to_json_text(decoded["payload"])
+
+    return run
+
+
+def measure(fn, event: dict, iterations: int) -> float:
+    """CPU microseconds per event."""
+    start = time.process_time()
+    for _ in range(iterations):
+        fn(event)
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    event = sample_event()
+
+    paths = [("stdlib json", stdlib_path)]
+    for name in ("json", "orjson", "msgpack"):
+        codec = get_codec(name)
+        paths.append((f"codec={codec.name}", codec_path(codec)))
+
+    baseline = None
+    print(f"{'path':<16} {'us/event':>10} {'saved':>10}")
+    for label, fn in paths:
+        fn(event)  # warm up
+        us = measure(fn, event, iterations)
+        baseline = baseline or us
+        print(f"{label:<16} {us:>10.2f} {baseline - us:>+10.2f}")
+
+
+if __name__ == "__main__":
+    main()
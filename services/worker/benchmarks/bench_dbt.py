@@ -0,0 +1,161 @@
+"""Benchmark: dbt full-refresh vs incremental run time on a synthetic history.
+
+Seeds `--rows` learning events (about a quarter of them quiz answers) spread
+over `--days` days for `--users` synthetic students, times
+`dbt run --full-refresh`, then adds `--delta` fresh events and times a plain
+incremental `dbt run`. Synthetic rows are tagged (users @bench.invalid,
+quizzes with source 'bench') and removed with --cleanup.
+
+    make dbt-bench ROWS=5000000
+    python -m benchmarks.bench_dbt --rows 2000000 [--delta 20000] [--keep]
+    python -m benchmarks.bench_dbt --cleanup
+
+Needs the database and the dbt CLI, so run it in the worker container.
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import psycopg2
+
+from src.config import settings
+from src.db.aggregates import rebuild, upsert_answer_aggregates
+
+DBT_DIR = Path(__file__).resolve().parent.parent / "dbt_project"
+BENCH_USERS = "SELECT id FROM users WHERE email LIKE '%%@bench.invalid'"
+EVENT_TYPES = ("quiz_answer", "lesson_view", "hint_request", "quiz_start")
+
+
+def seed_users(cur, users: int) -> None:
+    cur.execute(
+        """
+        INSERT INTO users (email, display_name, role, grade_level, password_hash)
+        SELECT 'student' || g || '@bench.invalid', 'Bench Student ' || g, 'student', 1 + g % 6, 'x'
+        FROM generate_series(1, %s) g
+        ON CONFLICT (email) DO NOTHING
+        """,
+        (users,),
+    )
+    cur.execute(
+        """
+        INSERT INTO quizzes (subject_id, title, difficulty, source)
+        SELECT s.id, 'Benchmark quiz ' || s.name, 'easy', 'bench'
+        FROM subjects s
+        WHERE NOT EXISTS (SELECT 1 FROM quizzes q WHERE q.source = 'bench' AND q.subject_id = s.id)
+        """
+    )
+
+
+def seed_events(cur, rows: int, newest_secs_ago: float, span_secs: float) -> list[str]:
+    """Insert `rows` events in a window ending `newest_secs_ago` seconds ago, plus an answer for each
+    quiz_answer event. Returns the new answer ids."""
+    cur.execute(
+        f"""
+        WITH bench_users AS (SELECT array_agg(id) AS ids FROM ({BENCH_USERS}) u),
+        events AS (
+            INSERT INTO learning_events (user_id, event_type, payload, session_id, created_at)
+            SELECT
+                u.ids[1 + g % array_length(u.ids, 1)],
+                (%s::text[])[1 + g % %s],
+                '{{}}'::jsonb,
+                md5((g / 20)::text)::uuid,
+                NOW() - make_interval(secs => %s + random() * %s)
+            FROM generate_series(1, %s) g, bench_users u
+            RETURNING id, user_id, event_type, created_at
+        ),
+        bench_quizzes AS (SELECT array_agg(id ORDER BY id) AS ids FROM quizzes WHERE source = 'bench'),
+        answers AS (
+            INSERT INTO quiz_answers (
+                user_id, quiz_id, selected_answer, is_correct, time_spent_ms, hints_used, event_id, created_at,
+                subject_id, difficulty
+            )
+            SELECT a.user_id, a.quiz_id, 'A', random() < 0.7, (1000 + random() * 20000)::int, (random() * 2)::int,
+                a.event_id, a.created_at, q.subject_id, q.difficulty
+            FROM (
+                SELECT e.user_id, e.id AS event_id, e.created_at,
+                    b.ids[1 + abs(hashtext(e.id::text)) % array_length(b.ids, 1)] AS quiz_id
+                FROM events e, bench_quizzes b
+                WHERE e.event_type = 'quiz_answer'
+            ) a
+            JOIN quizzes q ON q.id = a.quiz_id
+            RETURNING id
+        )
+        SELECT COALESCE(array_agg(id::text), '{{}}') FROM answers
+        """,
+        (list(EVENT_TYPES), len(EVENT_TYPES), newest_secs_ago, span_secs, rows),
+    )
+    return cur.fetchone()[0]
+
+
+def cleanup(cur) -> None:
+    cur.execute(f"DELETE FROM quiz_answers WHERE user_id IN ({BENCH_USERS})")
+    cur.execute(f"DELETE FROM agg_topic_performance WHERE user_id IN ({BENCH_USERS})")
+    cur.execute(f"DELETE FROM agg_user_daily_stats WHERE user_id IN ({BENCH_USERS})")
+    cur.execute(f"DELETE FROM learning_events WHERE user_id IN ({BENCH_USERS})")
+    cur.execute("DELETE FROM quizzes WHERE source = 'bench'")
+    cur.execute("DELETE FROM users WHERE email LIKE '%%@bench.invalid'")
+
+
+def timed_dbt_run(*flags: str) -> float:
+    cmd = ["dbt", "run", "--project-dir", str(DBT_DIR), "--profiles-dir", str(DBT_DIR), *flags]
+    start = time.perf_counter()
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Time dbt full-refresh vs incremental runs")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Historical events to seed")
+    parser.add_argument("--days", type=int, default=365, help="Days of history the events span")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--delta", type=int, default=20_000, help="Fresh events added before the incremental run")
+    parser.add_argument("--keep", action="store_true", help="Leave the synthetic rows in place afterwards")
+    parser.add_argument("--cleanup", action="store_true", help="Only remove synthetic rows from an earlier run")
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(settings.database_url)
+    try:
+        with conn.cursor() as cur:
+            if args.cleanup:
+                cleanup(cur)
+                conn.commit()
+                print("Removed synthetic rows; run `make dbt-full-refresh` to rebuild the models")
+                return
+
+            start = time.perf_counter()
+            seed_users(cur, args.users)
+            seed_events(cur, args.rows, 86400, (args.days - 1) * 86400)
+            rebuild(cur)
+            conn.commit()
+            print(f"Seeded {args.rows:,} events over {args.days} days in {time.perf_counter() - start:.1f}s")
+
+            full = timed_dbt_run("--full-refresh")
+
+            answer_ids = seed_events(cur, args.delta, 0, 3600)
+            upsert_answer_aggregates(cur, answer_ids)
+            conn.commit()
+
+            incremental = timed_dbt_run()
+
+            if not args.keep:
+                cleanup(cur)
+                conn.commit()
+    except subprocess.CalledProcessError as exc:
+        sys.exit(f"dbt failed: {exc}")
+    finally:
+        conn.close()
+
+    print(f"{'run':<14}{'seconds':>10}")
+    print(f"{'full-refresh':<14}{full:>10.1f}")
+    print(f"{'incremental':<14}{incremental:>10.1f}")
+    print(f"speedup {full / incremental:.1f}x with {args.delta:,} new events")
+    if not args.keep:
+        print("Synthetic rows removed; run `make dbt-full-refresh` to rebuild the models without them")
+
+
+if __name__ == "__main__":
+    main()
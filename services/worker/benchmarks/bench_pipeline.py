@@ -0,0 +1,209 @@
+"""Benchmark: worker pipeline throughput, end-to-end latency and peak memory.
+
+Feeds a synthetic event mix (see benchmarks.workload) through the same
+consume loops the worker runs (single, concurrent or batched), reading from
+an in-memory consumer instead of Redis. Events are written to an in-memory
+repository by default, or to the configured Postgres with --backend postgres.
+The memory backend needs no Redis, database or network.
+
+    cd services/worker && python -m benchmarks.bench_pipeline --events 50000
+    python -m benchmarks.bench_pipeline --path batched --db-latency-ms 2 --json after.json --baseline before.json
+    python -m benchmarks.bench_pipeline --backend postgres --path single --events 20000
+
+Latency is measured from when an event is handed to the pipeline (or was
+due, with --rate) until it is acked. Save a run with --json and pass it as
+--baseline to a later run to compare.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import resource
+import time
+from typing import Optional
+
+from benchmarks.workload import MemoryConsumer, MemoryDeadLetters, MemoryRepository, Workload, installed
+from src.codec import get_codec
+from src.config import settings
+from src.main import run_batched, run_concurrent, run_single
+from src.processors.batch_sink import BatchSink
+from src.processors.catalog import catalog
+from src.processors.dedupe import seen_events
+from src.processors.executor import BoundedExecutor
+from src.processors.retry import RetryScheduler
+
+PATHS = ("single", "concurrent", "batched")
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run_pipeline(consumer, path: str, concurrency: int, batch_size: int, linger_ms: int) -> RetryScheduler:
+    """Drive `consumer` through one of the worker's consume loops until it runs out of events."""
+    retries = RetryScheduler(dead_letters=MemoryDeadLetters(), ack=consumer.ack)
+    executor = BoundedExecutor(concurrency if path != "single" else 1)
+    retry_task = asyncio.create_task(retries.run(executor))
+    try:
+        if path == "batched":
+            await run_batched(consumer, BatchSink(batch_size, linger_ms, on_failure=retries.failed), executor)
+        elif path == "concurrent":
+            await run_concurrent(consumer, executor, retries)
+        else:
+            await run_single(consumer, retries)
+    finally:
+        retry_task.cancel()
+        await asyncio.gather(retry_task, return_exceptions=True)
+        await executor.drain()
+        executor.shutdown()
+    return retries
+
+
+def seed_postgres(workload: Workload) -> None:
+    """Insert the workload's students and quiz content, tagged so bench_dbt's cleanup removes them."""
+    import psycopg2
+    from psycopg2.extras import execute_values
+
+    conn = psycopg2.connect(settings.database_url)
+    try:
+        with conn.cursor() as cur:
+            execute_values(
+                cur,
+                "INSERT INTO users (id, email, display_name, role, password_hash) VALUES %s ON CONFLICT DO NOTHING",
+                [(u, f"{u}@bench.invalid", "Bench Student", "student", "x") for u in workload.users],
+            )
+            execute_values(
+                cur,
+                "INSERT INTO quizzes (id, subject_id, title, difficulty, source) VALUES %s ON CONFLICT DO NOTHING",
+                [(q, subject, "Benchmark quiz", difficulty, "bench") for q, subject, difficulty in workload.quizzes],
+            )
+            execute_values(
+                cur,
+                """
+                INSERT INTO quiz_questions (id, quiz_id, question_text, question_type, options, correct_answer, sort_order)
+                VALUES %s ON CONFLICT DO NOTHING
+                """,
+                [(q, quiz, "Benchmark question", "multiple_choice", '["A", "B", "C", "D"]', answer, order)
+                 for q, quiz, answer, order in workload.questions],
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def cleanup_postgres() -> None:
+    import psycopg2
+
+    from benchmarks.bench_dbt import cleanup
+
+    conn = psycopg2.connect(settings.database_url)
+    try:
+        with conn.cursor() as cur:
+            cleanup(cur)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def report(result: dict, baseline: Optional[dict]) -> None:
+    rows = [
+        ("events/sec", "events_per_s", "{:,.0f}"),
+        ("p50 latency ms", "p50_ms", "{:.2f}"),
+        ("p99 latency ms", "p99_ms", "{:.2f}"),
+        ("peak RSS MB", "peak_rss_mb", "{:.1f}"),
+    ]
+    summary = f"{result['events']:,} events, path={result['path']}, backend={result['backend']}, {result['seconds']:.2f}s"
+    if result["stored_events"] is not None:
+        summary += f" ({result['stored_events']:,} events and {result['stored_answers']:,} answers stored)"
+    print(summary)
+    print(f"{'metric':<16}{'value':>12}" + (f"{'baseline':>12}{'change':>10}" if baseline else ""))
+    for label, key, fmt in rows:
+        line = f"{label:<16}{fmt.format(result[key]):>12}"
+        if baseline and baseline.get(key):
+            line += f"{fmt.format(baseline[key]):>12}{(result[key] / baseline[key] - 1) * 100:>+9.1f}%"
+        print(line)
+
+
+def main(argv: Optional[list[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description="Measure worker pipeline throughput and latency")
+    parser.add_argument("--events", type=int, default=50_000)
+    parser.add_argument("--path", choices=PATHS, default="single", help="Consume loop to run")
+    parser.add_argument("--backend", choices=("memory", "postgres"), default="memory")
+    parser.add_argument("--db-latency-ms", type=float, default=0, help="Simulated round trip per write (memory backend)")
+    parser.add_argument("--rate", type=float, default=0, help="Events/sec to offer (0: as fast as the pipeline takes them)")
+    parser.add_argument("--concurrency", type=int, default=settings.concurrency)
+    parser.add_argument("--batch-size", type=int, default=settings.batch_size)
+    parser.add_argument("--linger-ms", type=int, default=settings.batch_linger_ms)
+    parser.add_argument("--codec", default=settings.codec)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Leave synthetic rows in Postgres afterwards")
+    parser.add_argument("--json", metavar="PATH", help="Write the results to this file")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare against results saved with --json")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(args.log_level)
+
+    workload = Workload(users=args.users, seed=args.seed)
+    codec = get_codec(args.codec)
+    messages = [codec.encode(event) for event in workload.events(args.events)]
+    consumer = MemoryConsumer(messages, codec, rate=args.rate)
+    seen_events.clear()
+
+    if args.backend == "postgres":
+        seed_postgres(workload)
+        catalog.load()
+        repository = None
+    else:
+        catalog.replace(workload.quizzes, workload.questions)
+        repository = MemoryRepository(args.db_latency_ms)
+
+    rss_before = peak_rss_mb()
+    try:
+        with installed(repository) if repository else contextlib.nullcontext():
+            start = time.perf_counter()
+            retries = asyncio.run(run_pipeline(consumer, args.path, args.concurrency, args.batch_size, args.linger_ms))
+            seconds = time.perf_counter() - start
+    finally:
+        if args.backend == "postgres" and not args.keep:
+            cleanup_postgres()
+
+    if len(retries):
+        print(f"warning: {len(retries)} events still waiting for a retry")
+    latencies = sorted(consumer.latencies)
+    result = {
+        "events": args.events,
+        "path": args.path,
+        "backend": args.backend,
+        "seconds": seconds,
+        "events_per_s": len(latencies) / seconds if seconds else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+        "rss_growth_mb": peak_rss_mb() - rss_before,
+        "stored_events": len(repository.events) if repository else None,
+        "stored_answers": len(repository.answers) if repository else None,
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(result, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Benchmark: recall and latency of ANN index search against exact search.
+
+Runs a sample of k-nearest-neighbour queries (cosine distance, as the API's
+search does) once as an exact sequential scan and then through the ANN
+index at several hnsw.ef_search / ivfflat.probes settings, and reports
+recall@k and p50/p99 latency for each. Needs Postgres with pgvector.
+
+Queries are stored embeddings with a little noise added, so they resemble
+real searches without matching a row exactly. --table uses a content table
+and the index already on it (see src.vector_index). --synthetic loads that
+many random unit vectors into a temp table and builds the index planned for
+that row count.
+
+    cd services/worker && python -m benchmarks.bench_vector_index --table quiz_questions
+    python -m benchmarks.bench_vector_index --synthetic 100000 --dim 256 --method ivfflat --search 1,5,10,20
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import Optional
+
+import psycopg2
+from psycopg2 import sql
+
+from benchmarks.bench_vectors import synthetic_embeddings
+from src.config import settings
+from src.db.vector_index import INDEXES, METHODS, IndexPlan, existing_index, plan, query_setting
+from src.db.vectors import copy_rows
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def load_synthetic(cur, rows: int, dim: int, seed: int) -> None:
+    cur.execute(f"CREATE TEMP TABLE bench_ann (id UUID PRIMARY KEY, embedding vector({dim}))")
+    ids, embeddings = synthetic_embeddings(rows, dim, seed)
+    cur.copy_expert("COPY bench_ann (id, embedding) FROM STDIN (FORMAT binary)", copy_rows(ids, embeddings))
+    cur.execute("ANALYZE bench_ann")
+
+
+def sample_queries(cur, table: str, count: int, noise: float, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    cur.execute(
+        sql.SQL("SELECT embedding::text FROM {} WHERE embedding IS NOT NULL ORDER BY random() LIMIT %s").format(
+            sql.Identifier(table)
+        ),
+        (count,),
+    )
+    return [json.dumps([v + rng.gauss(0, noise) for v in json.loads(text)]) for (text,) in cur.fetchall()]
+
+
+def search(cur, table: str, queries: list[str], k: int, settings_sql: list[str]) -> tuple[list[set], list[float]]:
+    """Run each query in its own transaction after `settings_sql`; return result ids and latencies."""
+    query = sql.SQL("SELECT id FROM {} WHERE embedding IS NOT NULL ORDER BY embedding <=> %s::vector LIMIT %s").format(
+        sql.Identifier(table)
+    )
+    results, latencies = [], []
+    for vector in queries:
+        for statement in settings_sql:
+            cur.execute(statement)
+        start = time.perf_counter()
+        cur.execute(query, (vector, k))
+        ids = {row[0] for row in cur.fetchall()}
+        latencies.append(time.perf_counter() - start)
+        cur.connection.rollback()
+        results.append(ids)
+    return results, sorted(latencies)
+
+
+def main(argv: Optional[list[str]] = None) -> list[dict]:
+    parser = argparse.ArgumentParser(description="Compare ANN index search with exact search")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--table", choices=sorted(INDEXES), default="quiz_questions")
+    source.add_argument("--synthetic", type=int, metavar="ROWS", help="Use ROWS random vectors in a temp table")
+    parser.add_argument("--dim", type=int, default=1536, help="Dimensions of --synthetic vectors")
+    parser.add_argument("--method", choices=METHODS, default=settings.vector_index_method, help="Index for --synthetic")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--search", help="Comma-separated ef_search or probes values (default: a range around the planned one)")
+    parser.add_argument("--noise", type=float, default=0.01, help="Std dev of the noise added to sampled queries")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(settings.database_url)
+    try:
+        with conn.cursor() as cur:
+            if args.synthetic:
+                table = "bench_ann"
+                load_synthetic(cur, args.synthetic, args.dim, args.seed)
+                index_plan = plan(args.synthetic, args.method)
+                started = time.perf_counter()
+                cur.execute(
+                    sql.SQL("CREATE INDEX ON bench_ann USING {} (embedding vector_cosine_ops) WITH ({})").format(
+                        sql.Identifier(index_plan.method), sql.SQL(index_plan.with_clause())
+                    )
+                )
+                print(f"Built {index_plan.method} ({index_plan.with_clause()}) on {args.synthetic:,} rows "
+                      f"in {time.perf_counter() - started:.1f}s")
+            else:
+                table = args.table
+                existing = existing_index(cur, INDEXES[table])
+                if existing is None:
+                    parser.error(f"{table} has no ANN index; run python -m src.vector_index first")
+                index_plan = IndexPlan(existing.method, existing.params)
+                print(f"Using {INDEXES[table]}: {existing.method} {existing.params}")
+            conn.commit()
+
+            queries = sample_queries(cur, table, args.queries, args.noise, args.seed)
+            conn.rollback()
+            exact, exact_latency = search(
+                cur, table, queries, args.k, ["SET LOCAL enable_indexscan = off", "SET LOCAL enable_bitmapscan = off"]
+            )
+
+            knob, default = query_setting(index_plan)
+            values = [int(v) for v in args.search.split(",")] if args.search else sorted(
+                {max(1, default // 4), max(1, default // 2), default, default * 2, default * 4}
+            )
+            rows = [{"setting": "exact", "recall": 1.0, "p50_ms": percentile(exact_latency, 0.5) * 1000,
+                     "p99_ms": percentile(exact_latency, 0.99) * 1000}]
+            for value in values:
+                found, latency = search(cur, table, queries, args.k, [f"SET LOCAL {knob} = {value}"])
+                recall = sum(len(a & e) / max(len(e), 1) for a, e in zip(found, exact)) / max(len(queries), 1)
+                rows.append({"setting": f"{knob}={value}", "recall": recall,
+                             "p50_ms": percentile(latency, 0.5) * 1000, "p99_ms": percentile(latency, 0.99) * 1000})
+    finally:
+        conn.close()
+
+    print(f"{len(queries)} queries, k={args.k}")
+    print(f"{'search':<22}{'recall@k':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for row in rows:
+        print(f"{row['setting']:<22}{row['recall']:>10.3f}{row['p50_ms']:>10.2f}{row['p99_ms']:>10.2f}")
+    return rows
+
+
+if __name__ == "__main__":
+    main()
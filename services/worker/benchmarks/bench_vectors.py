@@ -0,0 +1,117 @@
+"""Benchmark: embedding write path, JSON text UPDATE vs binary COPY.
+
+Generates synthetic embeddings shaped like the API's (1536 unit-length
+dimensions, as lists of floats for the text path and float32 arrays for the
+binary one) and reports, per path, the bytes sent for the embeddings and
+the rows/sec to encode them. With --postgres it also writes them to a temp
+table with a vector column on the configured database (pgvector required)
+and reports end-to-end rows/sec, server-side parsing included.
+
+    cd services/worker && python -m benchmarks.bench_vectors --rows 20000
+    python -m benchmarks.bench_vectors --rows 20000 --postgres
+"""
+
+import argparse
+import math
+import random
+import time
+from typing import Optional
+from uuid import UUID
+
+from src.config import settings
+from src.db.vectors import copy_embeddings, copy_rows, text_rows, to_float32, update_embeddings_text
+
+# Extra bytes per row on the text path: quotes, commas and parentheses of the VALUES list
+_VALUES_OVERHEAD = 8
+
+
+def synthetic_embeddings(rows: int, dim: int, seed: int) -> tuple[list[UUID], list[list[float]]]:
+    rng = random.Random(seed)
+    ids = [UUID(int=rng.getrandbits(128), version=4) for _ in range(rows)]
+    embeddings = []
+    for _ in range(rows):
+        values = [rng.gauss(0, 1) for _ in range(dim)]
+        norm = math.sqrt(sum(v * v for v in values))
+        # The API's float format prints about 10 significant digits
+        embeddings.append([float(f"{v / norm:.9g}") for v in values])
+    return ids, embeddings
+
+
+def text_bytes(ids, embeddings) -> int:
+    return sum(len(row_id) + len(text) + _VALUES_OVERHEAD for row_id, text in text_rows(ids, embeddings))
+
+
+def binary_bytes(ids, vectors) -> int:
+    return len(copy_rows(ids, vectors).getvalue())
+
+
+def rate(fn, rows: int) -> float:
+    start = time.perf_counter()
+    fn()
+    return rows / (time.perf_counter() - start)
+
+
+def write_postgres(ids, embeddings, vectors, dim: int, batch_size: int) -> dict[str, float]:
+    """End-to-end rows/sec for each path, writing `batch_size` rows per transaction."""
+    import psycopg2
+    from psycopg2.extras import execute_values
+
+    conn = psycopg2.connect(settings.database_url)
+    results = {}
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE TEMP TABLE bench_vectors (id UUID PRIMARY KEY, embedding vector({dim}))")
+            execute_values(cur, "INSERT INTO bench_vectors (id) VALUES %s", [(str(i),) for i in ids], page_size=5000)
+        conn.commit()
+        for name, write, values in (
+            ("text", update_embeddings_text, embeddings),
+            ("binary", copy_embeddings, vectors),
+        ):
+            start = time.perf_counter()
+            for i in range(0, len(ids), batch_size):
+                with conn.cursor() as cur:
+                    write(cur, "bench_vectors", ids[i:i + batch_size], values[i:i + batch_size])
+                conn.commit()
+            results[name] = len(ids) / (time.perf_counter() - start)
+            with conn.cursor() as cur:
+                cur.execute("SELECT count(*) FROM bench_vectors WHERE embedding IS NOT NULL")
+                assert cur.fetchone()[0] == len(ids), f"{name} path did not write every row"
+                cur.execute("UPDATE bench_vectors SET embedding = NULL")
+            conn.commit()
+    finally:
+        conn.close()
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare the JSON text and binary COPY embedding write paths")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--batch-size", type=int, default=settings.embedding_batch_size)
+    parser.add_argument("--postgres", action="store_true", help="Also write to a temp table on the configured database")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    ids, embeddings = synthetic_embeddings(args.rows, args.dim, args.seed)
+    vectors = [to_float32(embedding) for embedding in embeddings]
+
+    sizes = {"text": text_bytes(ids, embeddings), "binary": binary_bytes(ids, vectors)}
+    encode = {
+        "text": rate(lambda: text_rows(ids, embeddings), args.rows),
+        "binary": rate(lambda: copy_rows(ids, vectors), args.rows),
+    }
+    written = write_postgres(ids, embeddings, vectors, args.dim, args.batch_size) if args.postgres else {}
+
+    print(f"{args.rows:,} rows of {args.dim} dimensions")
+    header = f"{'path':<8}{'bytes/row':>12}{'total MB':>10}{'encode rows/s':>15}"
+    print(header + (f"{'write rows/s':>14}" if written else ""))
+    for name in ("text", "binary"):
+        line = f"{name:<8}{sizes[name] / args.rows:>12,.0f}{sizes[name] / 1e6:>10.1f}{encode[name]:>15,.0f}"
+        if written:
+            line += f"{written[name]:>14,.0f}"
+        print(line)
+    print(f"binary sends {sizes['binary'] / sizes['text']:.1%} of the text path's bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Synthetic workload and in-memory stand-ins for benchmarking the worker offline.
+
+- Workload generates a reproducible mix of quiz_answer, lesson_view and
+  hint_request events from a fixed set of students, sessions and quiz content.
+- MemoryConsumer feeds pre-encoded events through the Consumer interface,
+  decoding them with the wire codec like the Redis consumers do, and records
+  each event's end-to-end latency when it is acked.
+- MemoryRepository stands in for src.db.repository; installed() swaps it
+  into the event processor for the duration of a run.
+"""
+
+import asyncio
+import contextlib
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Iterator, Optional
+from uuid import UUID, uuid4
+
+from src.codec import Codec, decode_event
+from src.consumers.base import Consumer
+from src.processors import event_processor
+
+# Share of each event type in the generated stream
+DEFAULT_MIX = {"quiz_answer": 0.6, "lesson_view": 0.3, "hint_request": 0.1}
+ANSWERS = ("A", "B", "C", "D")
+DIFFICULTIES = ("easy", "medium", "hard")
+SUBJECTS = 5  # seeded by infra/scripts/init-db.sql
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(UUID(int=rng.getrandbits(128), version=4))
+
+
+class Workload:
+    """Students, quiz content and an event stream drawn from them, all seeded for repeatability."""
+
+    def __init__(
+        self,
+        users: int = 1000,
+        quizzes: int = 200,
+        questions_per_quiz: int = 10,
+        mix: Optional[dict[str, float]] = None,
+        correct_rate: float = 0.7,
+        seed: int = 42,
+    ):
+        self.rng = random.Random(seed)
+        self.mix = mix or DEFAULT_MIX
+        self.correct_rate = correct_rate
+        self.users = [_uuid(self.rng) for _ in range(users)]
+        # (id, subject_id, difficulty) and (id, quiz_id, correct_answer, sort_order), as the catalog takes them
+        self.quizzes = [(_uuid(self.rng), 1 + i % SUBJECTS, DIFFICULTIES[i % 3]) for i in range(quizzes)]
+        self.questions = [
+            (_uuid(self.rng), quiz_id, self.rng.choice(ANSWERS), order)
+            for quiz_id, _, _ in self.quizzes
+            for order in range(questions_per_quiz)
+        ]
+        self.questions.sort(key=lambda q: UUID(q[0]).int)
+        self.lessons = [_uuid(self.rng) for _ in range(max(1, quizzes // 2))]
+
+    def events(self, count: int, start: Optional[datetime] = None) -> Iterator[dict]:
+        """Yield `count` events shaped like the ingest service's LearningEvent, in time order.
+
+        Each student works through short sessions: a few lesson views, hints
+        and answers a couple of seconds apart.
+        """
+        rng = self.rng
+        types, weights = zip(*self.mix.items())
+        now = start or datetime.now(timezone.utc) - timedelta(hours=1)
+        sessions = {}
+        for _ in range(count):
+            user_id = rng.choice(self.users)
+            session = sessions.get(user_id)
+            if session is None or rng.random() < 0.05:
+                session = sessions[user_id] = _uuid(rng)
+            now += timedelta(milliseconds=rng.expovariate(1 / 20))
+            event_type = rng.choices(types, weights)[0]
+            yield {
+                "id": _uuid(rng),
+                "event_type": event_type,
+                "payload": self._payload(event_type),
+                "user_id": user_id,
+                "session_id": session,
+                "created_at": now.isoformat(),
+            }
+
+    def _payload(self, event_type: str) -> dict:
+        rng = self.rng
+        if event_type == "quiz_answer":
+            question_id, quiz_id, correct_answer, _ = rng.choice(self.questions)
+            correct = rng.random() < self.correct_rate
+            selected = correct_answer if correct else rng.choice([a for a in ANSWERS if a != correct_answer])
+            return {
+                "quiz_id": quiz_id,
+                "question_id": question_id,
+                "selected_answer": selected,
+                "is_correct": correct,
+                "time_spent_ms": int(rng.lognormvariate(8.5, 0.6)),
+                "hints_used": rng.choices((0, 1, 2), (0.75, 0.2, 0.05))[0],
+            }
+        if event_type == "lesson_view":
+            return {"lesson_id": rng.choice(self.lessons), "duration_ms": int(rng.lognormvariate(10, 0.8))}
+        question_id, quiz_id, _, _ = rng.choice(self.questions)
+        return {"quiz_id": quiz_id, "question_id": question_id}
+
+
+class MemoryConsumer(Consumer):
+    """Replays pre-encoded messages, optionally paced at `rate` events per second.
+
+    Latency runs from when an event was due to be delivered (so a backed-up
+    pipeline is not hidden by pacing) until it is acked.
+    """
+
+    def __init__(self, messages: list[bytes], codec: Codec, rate: float = 0):
+        self._messages = messages
+        self._codec = codec
+        self._interval = 1 / rate if rate else 0
+        self._due: dict[str, float] = {}
+        self.latencies: list[float] = []
+        self.started: Optional[float] = None
+
+    async def subscribe(self, channel: str) -> None:
+        pass
+
+    async def listen(self) -> AsyncIterator[dict]:
+        self.started = time.perf_counter()
+        for i, data in enumerate(self._messages):
+            due = self.started + i * self._interval
+            if self._interval:
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                due = time.perf_counter()
+                if i % 256 == 0:
+                    await asyncio.sleep(0)  # let executor callbacks run, as a network read would
+            event = decode_event(self._codec, data)
+            self._due[event["id"]] = due
+            yield event
+
+    async def ack(self, events: list[dict]) -> None:
+        now = time.perf_counter()
+        for event in events:
+            due = self._due.pop(event.get("id"), None)
+            if due is not None:
+                self.latencies.append(now - due)
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryRepository:
+    """Keeps events and answers in dicts, with the same duplicate handling as the real tables.
+
+    `latency_ms` adds a sleep to every call to stand in for a database round trip.
+    """
+
+    def __init__(self, latency_ms: float = 0):
+        self.latency = latency_ms / 1000
+        self.events: dict[tuple, tuple] = {}
+        self.answers: dict[str, dict] = {}
+
+    def _round_trip(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+
+    def insert_learning_event(self, event_type, payload, user_id=None, session_id=None, event_id=None,
+                              created_at=None, raw_event=None, answer=None) -> Optional[str]:
+        self._round_trip()
+        event_id = event_id or str(uuid4())
+        key = (str(event_id), created_at)
+        if key in self.events:
+            return None
+        self.events[key] = (user_id, event_type, raw_event or payload, session_id)
+        if answer is not None:
+            self.answers[str(uuid4())] = dict(zip(event_processor.ANSWER_COLUMNS, answer))
+        return str(event_id)
+
+    def insert_event_batch(self, events: list[tuple], answers: list[tuple]) -> set[str]:
+        self._round_trip()
+        inserted = set()
+        for event_id, user_id, event_type, payload, session_id, created_at, raw_event in events:
+            key = (str(event_id), created_at)
+            if key not in self.events:
+                self.events[key] = (user_id, event_type, raw_event or payload, session_id)
+                inserted.add(str(event_id))
+        for row in answers:
+            answer = dict(zip(event_processor.ANSWER_COLUMNS, row))
+            if answer["event_id"] in inserted:
+                self.answers[str(uuid4())] = answer
+        return inserted
+
+
+class MemoryDeadLetters:
+    """Dead-letter store that keeps entries in a list instead of Redis."""
+
+    def __init__(self):
+        self.entries: list[tuple[dict, str, int]] = []
+
+    def push(self, event: dict, error: str, attempts: int) -> None:
+        self.entries.append((event, error, attempts))
+
+
+@contextlib.contextmanager
+def installed(repository: MemoryRepository):
+    """Route the event processor's writes to `repository` until the block exits."""
+    names = ("insert_learning_event", "insert_event_batch")
+    saved = {name: getattr(event_processor, name) for name in names}
+    try:
+        for name in names:
+            setattr(event_processor, name, getattr(repository, name))
+        yield repository
+    finally:
+        for name, fn in saved.items():
+            setattr(event_processor, name, fn)
@@ -0,0 +1,18 @@
+{#
+    Watermark filter for incremental models.
+
+    On an incremental run, keeps source rows whose `column` is no older than
+    the newest `target_column` already in this model, minus a lookback window
+    (var 'lookback_days') so late-arriving rows are picked up and the affected
+    rows rebuilt. On a full refresh or the first run it is always true.
+#}
+{% macro incremental_since(column, target_column=none) %}
+    {%- if is_incremental() -%}
+        {{ column }} >= (
+            SELECT COALESCE(MAX({{ target_column or column }}), '-infinity'::timestamptz)
+            FROM {{ this }}
+        ) - INTERVAL '{{ var("lookback_days") }} days'
+    {%- else -%}
+        TRUE
+    {%- endif -%}
+{% endmacro %}
@@ -0,0 +1,21 @@
+{#
+    Start of the oldest learning_events partition still attached.
+
+    Partition maintenance (src.db.partitions) rolls partitions older than
+    partition_retention up into learning_event_rollups and detaches them, so
+    events before this point are no longer kept raw. Older events that land in
+    learning_events_default (replays, late events) are moved into a partition
+    for their period and rolled up on the next maintenance run, so they are
+    counted in the rollups rather than lost. Parses the partition bounds the
+    same way the worker does. NULL when learning_events has no range
+    partitions, so comparisons against it match nothing.
+#}
+{% macro retained_events_since() %}
+    (
+        SELECT MIN(b[1]::timestamptz)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        CROSS JOIN LATERAL regexp_match(pg_get_expr(c.relpartbound, c.oid), 'FROM \(''(.+?)''\) TO \(''(.+?)''\)') b
+        WHERE i.inhparent = 'learning_events'::regclass AND b IS NOT NULL
+    )
+{% endmacro %}
@@ -1,13 +1,20 @@
 -- Intermediate: performance per user per subject (all time)
+-- Reads the running totals the worker maintains as answers arrive. Every new
+-- answer moves last_activity forward, so it is the watermark for changed rows.
+{{ config(
+    materialized='incremental',
+    unique_key=['user_id', 'subject_id'],
+    indexes=[{'columns': ['user_id', 'subject_id'], 'unique': True}, {'columns': ['last_activity']}]
+) }}
+
 SELECT
     user_id,
     subject_id,
-    COUNT(*) AS total_questions,
-    SUM(CASE WHEN is_correct THEN 1 ELSE 0 END) AS correct_count,
-    ROUND(
-        100.0 * SUM(CASE WHEN is_correct THEN 1 ELSE 0 END) / NULLIF(COUNT(*), 0), 1
-    ) AS accuracy_pct,
-    AVG(time_spent_ms)::int AS avg_time_ms,
-    MAX(created_at) AS last_activity
-FROM {{ ref('stg_quiz_answers') }}
-GROUP BY user_id, subject_id
+    total_questions,
+    correct_count,
+    ROUND(100.0 * correct_count / NULLIF(total_questions, 0), 1) AS accuracy_pct,
+    ROUND(total_time_ms::numeric / NULLIF(timed_answers, 0))::int AS avg_time_ms,
+    total_hints,
+    last_activity
+FROM agg_topic_performance
+WHERE {{ incremental_since('last_activity') }}
@@ -1,14 +1,22 @@
 -- Intermediate: daily stats per user per subject
+-- Reads the running totals the worker maintains as answers arrive
+{{ config(
+    materialized='incremental',
+    unique_key=['user_id', 'subject_id', 'answer_date'],
+    indexes=[
+        {'columns': ['user_id', 'subject_id', 'answer_date'], 'unique': True},
+        {'columns': ['answer_date']}
+    ]
+) }}
+
 SELECT
     user_id,
     subject_id,
     answer_date,
-    COUNT(*) AS total_questions,
-    SUM(CASE WHEN is_correct THEN 1 ELSE 0 END) AS correct_count,
-    ROUND(
-        100.0 * SUM(CASE WHEN is_correct THEN 1 ELSE 0 END) / NULLIF(COUNT(*), 0), 1
-    ) AS accuracy_pct,
-    AVG(time_spent_ms)::int AS avg_time_ms,
-    SUM(hints_used) AS total_hints
-FROM {{ ref('stg_quiz_answers') }}
-GROUP BY user_id, subject_id, answer_date
+    total_questions,
+    correct_count,
+    ROUND(100.0 * correct_count / NULLIF(total_questions, 0), 1) AS accuracy_pct,
+    ROUND(total_time_ms::numeric / NULLIF(timed_answers, 0))::int AS avg_time_ms,
+    total_hints
+FROM agg_user_daily_stats
+WHERE {{ incremental_since('answer_date') }}
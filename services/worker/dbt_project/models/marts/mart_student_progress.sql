@@ -1,7 +1,14 @@
 -- Mart: overall student progress with subject breakdown
+{{ config(
+    materialized='incremental',
+    unique_key=['user_id', 'subject_id'],
+    indexes=[{'columns': ['user_id', 'subject_id'], 'unique': True}]
+) }}
+
 SELECT
     tp.user_id,
     u.display_name,
+    tp.subject_id,
     s.name AS subject_name,
     tp.total_questions,
     tp.correct_count,
@@ -11,3 +18,4 @@ SELECT
 FROM {{ ref('int_topic_performance') }} tp
 JOIN {{ ref('stg_users') }} u ON u.id = tp.user_id
 JOIN subjects s ON s.id = tp.subject_id
+WHERE {{ incremental_since('tp.last_activity', 'last_activity') }}
@@ -1,4 +1,17 @@
 -- Staging: clean raw learning events
+-- learning_events is partitioned on created_at, so the watermark filter
+-- prunes incremental runs to the newest partitions at execution time.
+-- Holds the same retention as learning_events: the post-hook deletes events
+-- older than the oldest attached partition, whose partitions have been rolled
+-- up into learning_event_rollups. mart_engagement_trends reads those days
+-- from the rollups instead, so it depends on this cutoff matching the rollups.
+{{ config(
+    materialized='incremental',
+    unique_key='id',
+    indexes=[{'columns': ['id'], 'unique': True}, {'columns': ['created_at']}, {'columns': ['event_date']}],
+    post_hook="DELETE FROM {{ this }} WHERE created_at < {{ retained_events_since() }}"
+) }}
+
 SELECT
     id,
     user_id,
@@ -9,3 +22,5 @@ SELECT
     created_at::date AS event_date
 FROM learning_events
 WHERE user_id IS NOT NULL
+  AND {{ incremental_since('created_at') }}
+  AND created_at >= COALESCE({{ retained_events_since() }}, '-infinity'::timestamptz)
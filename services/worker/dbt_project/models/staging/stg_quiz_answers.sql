@@ -1,17 +1,24 @@
 -- Staging: clean quiz answers with subject info
+-- subject_id and difficulty are stamped on quiz_answers by the worker, so no join to quizzes
+{{ config(
+    materialized='incremental',
+    unique_key='id',
+    indexes=[{'columns': ['id'], 'unique': True}, {'columns': ['created_at']}]
+) }}
+
 SELECT
-    qa.id,
-    qa.user_id,
-    qa.quiz_id,
-    qa.question_id,
-    qa.selected_answer,
-    qa.is_correct,
-    qa.time_spent_ms,
-    qa.hints_used,
-    qa.created_at,
-    qa.created_at::date AS answer_date,
-    q.subject_id,
-    q.difficulty
-FROM quiz_answers qa
-JOIN quizzes q ON q.id = qa.quiz_id
-WHERE qa.user_id IS NOT NULL
+    id,
+    user_id,
+    quiz_id,
+    question_id,
+    selected_answer,
+    is_correct,
+    time_spent_ms,
+    hints_used,
+    created_at,
+    created_at::date AS answer_date,
+    subject_id,
+    difficulty
+FROM quiz_answers
+WHERE user_id IS NOT NULL
+  AND {{ incremental_since('created_at') }}
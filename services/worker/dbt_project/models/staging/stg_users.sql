@@ -1,4 +1,5 @@
 -- Staging: clean user records
+-- Left as a view: users are small and updated in place, so there is no watermark
 SELECT
     id,
     email,
@@ -0,0 +1,15 @@
+-- Test: the worker-maintained topic totals match a recount of quiz_answers
+WITH expected AS (
+    SELECT
+        user_id,
+        subject_id,
+        COUNT(*) AS total_questions,
+        COUNT(*) FILTER (WHERE is_correct) AS correct_count
+    FROM {{ ref('stg_quiz_answers') }}
+    WHERE subject_id IS NOT NULL
+    GROUP BY user_id, subject_id
+)
+SELECT *
+FROM expected e
+FULL JOIN {{ ref('int_topic_performance') }} a USING (user_id, subject_id)
+WHERE (e.total_questions, e.correct_count) IS DISTINCT FROM (a.total_questions, a.correct_count)
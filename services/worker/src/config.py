@@ -8,6 +8,120 @@ class Settings(BaseSettings):
     log_level: str = "INFO"
     channel: str = "learning-events"
 
+    # Transport: "pubsub" (fire-and-forget) or "streams" (consumer group with acks).
+    # With streams, replicas sharing stream_group split the load between them.
+    # Publishers (the ingest service and the API) must use the same transport.
+    # An entry is acked once stored or dead-lettered; one still waiting for a
+    # retry after stream_claim_idle_ms may be claimed and stored again, which
+    # the duplicate checks absorb.
+    transport: str = "pubsub"
+    stream_group: str = "workers"
+    stream_consumer: str = ""  # defaults to <hostname>-<pid>
+    stream_batch_count: int = 100
+    stream_block_ms: int = 1000
+    stream_claim_idle_ms: int = 60000
+
+    # Wire codec: "json", "orjson" or "msgpack". JSON messages are always accepted.
+    codec: str = "orjson"
+
+    # How many recently stored event ids to remember for skipping duplicates (0 disables)
+    dedupe_cache_size: int = 100000
+
+    # Failed events are retried with exponential backoff, then pushed to the
+    # dead_letter_key Redis list (see python -m src.dead_letters)
+    retry_max_attempts: int = 5
+    retry_base_ms: int = 500
+    retry_max_ms: int = 30000
+    retry_max_pending: int = 10000
+    dead_letter_key: str = "learning-events:dead"
+
+    # Events per COPY transaction for python -m src.replay
+    replay_chunk_size: int = 5000
+
+    # Prometheus metrics port (0 disables). Shard processes use metrics_port + 1 + index.
+    metrics_port: int = 9100
+
+    # Event batching: flush when batch_size events are buffered or the oldest
+    # buffered event has waited batch_linger_ms. batch_size=1 disables batching.
+    batch_size: int = 200
+    batch_linger_ms: int = 50
+
+    # Database pool size, and how many events (or batches) may be written
+    # concurrently. Concurrency is capped at db_pool_max since every in-flight
+    # write holds a pooled connection. db_pool_min connections are opened (and
+    # their statements prepared) at startup and kept; connections above it are
+    # closed when returned, so set it to the usual concurrency.
+    db_pool_min: int = 4
+    db_pool_max: int = 5
+    concurrency: int = 4
+    # Seconds to wait for a free connection, idle seconds after which a
+    # connection is pinged before use, and TCP keepalive idle seconds
+    db_pool_timeout_s: float = 30.0
+    db_pool_check_idle_s: float = 30.0
+    db_keepalive_idle_s: int = 60
+
+    # Multi-process mode: worker_processes > 1 starts a supervisor that routes
+    # events to that many child processes by user, preserving per-user order.
+    worker_processes: int = 1
+    shard_queue_size: int = 1000
+
+    # learning_events partitions: one per partition_interval ("day", "week" or
+    # "month"), created partitions_ahead intervals in advance. Partitions older
+    # than partition_retention intervals are rolled up into learning_event_rollups
+    # and dropped (or kept as <name>_archived when partition_drop is false). The worker
+    # checks every partition_maintenance_s seconds; 0 disables maintenance.
+    partition_interval: str = "month"
+    partitions_ahead: int = 2
+    partition_retention: int = 12
+    partition_drop: bool = True
+    partition_maintenance_s: int = 3600
+
+    # In-memory content catalog used to stamp subject/difficulty on quiz answers
+    # and check is_correct: changes are picked up every catalog_refresh_s seconds
+    # (0 disables the catalog) and everything is reloaded every catalog_full_reload_s.
+    catalog_refresh_s: int = 60
+    catalog_full_reload_s: int = 3600
+
+    # Embedding backfill: runs in the background, woken by new content and at
+    # least every embedding_backfill_s seconds (0 disables it). Rows per API
+    # request and estimated tokens per request (the API allows 2048 inputs and
+    # 300k tokens), and rows fetched per page.
+    embedding_backfill_s: int = 300
+    embedding_batch_size: int = 256
+    embedding_batch_tokens: int = 100000
+    embedding_page_size: int = 2000
+    # Write embeddings with binary COPY into a staging table (false: JSON text in an UPDATE)
+    embedding_copy_binary: bool = True
+
+    # ANN indexes on the embedding columns ("hnsw" or "ivfflat"), checked after
+    # each backfill pass that stored rows. Tables with fewer embedded rows than
+    # vector_index_min_rows are left alone; an ivfflat index is rebuilt when the
+    # row count moves by more than vector_index_drift (a fraction) from its build.
+    vector_index_after_backfill: bool = True
+    vector_index_method: str = "hnsw"
+    vector_index_min_rows: int = 10000
+    vector_index_drift: float = 0.5
+    vector_index_work_mem: str = "512MB"
+    # Batches in flight at once, and the account's rate limits they are paced to.
+    # The backfill has its own pool of embedding_concurrency + 1 connections
+    # (one holds the backfill lock), apart from the db_pool_max for events.
+    # A 429 or 5xx pauses all requests for its Retry-After; a batch is given up
+    # after embedding_max_attempts tries. openai_base_url points at a proxy or stub.
+    embedding_concurrency: int = 4
+    embedding_rpm: int = 3000
+    embedding_tpm: int = 1000000
+    embedding_max_attempts: int = 6
+    embedding_progress_s: float = 10.0
+    openai_base_url: str = ""
+    # Reuse embeddings of identical (normalized) text; the cache keeps the
+    # embedding_cache_max_rows most recently used entries
+    embedding_cache_enabled: bool = True
+    embedding_cache_max_rows: int = 500000
+    # A row rejected on its own is skipped for embedding_failure_backoff_s,
+    # doubling per failure up to embedding_failure_backoff_max_s
+    embedding_failure_backoff_s: int = 3600
+    embedding_failure_backoff_max_s: int = 604800
+
     class Config:
         env_file = ".env"
 
@@ -13,6 +13,9 @@ class Consumer(ABC):
     async def listen(self) -> AsyncIterator[dict]:
         pass
 
+    async def ack(self, events: list[dict]) -> None:
+        """Acknowledge processed events. No-op for transports without delivery tracking."""
+
     @abstractmethod
     async def close(self) -> None:
         pass
@@ -0,0 +1,51 @@
+import asyncio
+import logging
+import queue
+from typing import AsyncIterator, Callable
+
+from src.consumers.base import Consumer
+from src.consumers.redis_stream import STREAM_ID_KEY
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.05
+
+
+class QueueConsumer(Consumer):
+    """Consumes events handed over by the supervisor through a multiprocessing queue.
+
+    A None item marks the end of the stream. Once should_stop() is true the
+    events already queued are still handed out, until the None the supervisor
+    queues when it stops or until the queue is empty, so a signalled shard
+    finishes what was routed to it. Stream entry ids of acked events are sent
+    back on ack_queue so the supervisor can ack them upstream.
+    """
+
+    def __init__(self, events, ack_queue, should_stop: Callable[[], bool] = lambda: False):
+        self._events = events
+        self._acks = ack_queue
+        self._should_stop = should_stop
+
+    async def subscribe(self, channel: str) -> None:
+        pass
+
+    async def listen(self) -> AsyncIterator[dict]:
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                if self._should_stop():
+                    return
+                await asyncio.sleep(POLL_INTERVAL)
+                continue
+            if event is None:
+                return
+            yield event
+
+    async def ack(self, events: list[dict]) -> None:
+        ids = [event.pop(STREAM_ID_KEY) for event in events if STREAM_ID_KEY in event]
+        if ids:
+            self._acks.put(ids)
+
+    async def close(self) -> None:
+        pass
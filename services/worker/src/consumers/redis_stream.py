@@ -0,0 +1,108 @@
+import logging
+import os
+import socket
+import time
+from typing import AsyncIterator, Optional
+
+import redis.asyncio as aioredis
+from redis.exceptions import ResponseError
+
+from src.codec import decode_event, get_codec
+from src.config import settings
+from src.consumers.base import Consumer
+from src.metrics import DECODE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Key under which the stream entry id travels with each event until it is acked
+STREAM_ID_KEY = "_stream_id"
+
+
+class RedisStreamConsumer(Consumer):
+    """Consumes events from a Redis Stream through a consumer group.
+
+    Replicas in the same group receive disjoint entries. Entries stay pending
+    until acked, and entries left pending by a dead consumer for longer than
+    stream_claim_idle_ms are claimed and redelivered here.
+    """
+
+    def __init__(self, group: Optional[str] = None, name: Optional[str] = None):
+        self._redis = aioredis.from_url(settings.redis_url)
+        self._codec = get_codec()
+        self._group = group or settings.stream_group
+        self._name = name or settings.stream_consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self._stream: Optional[str] = None
+        self._claim_cursor = "0-0"
+        self._next_claim_at = 0.0
+
+    async def subscribe(self, channel: str) -> None:
+        self._stream = channel
+        try:
+            # Start from the beginning so entries published before the group existed are delivered
+            await self._redis.xgroup_create(channel, self._group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        logger.info(f"Joined Redis stream {channel} as {self._group}/{self._name}")
+
+    async def listen(self) -> AsyncIterator[dict]:
+        while True:
+            if time.monotonic() >= self._next_claim_at:
+                entries = await self._claim_stale()
+            else:
+                response = await self._redis.xreadgroup(
+                    self._group,
+                    self._name,
+                    {self._stream: ">"},
+                    count=settings.stream_batch_count,
+                    block=settings.stream_block_ms,
+                )
+                entries = response[0][1] if response else []
+
+            for entry_id, fields in entries:
+                event = await self._decode(entry_id, fields)
+                if event is not None:
+                    yield event
+
+    async def _claim_stale(self) -> list:
+        """Claim one page of entries idle in other consumers' pending lists."""
+        result = await self._redis.xautoclaim(
+            self._stream,
+            self._group,
+            self._name,
+            min_idle_time=settings.stream_claim_idle_ms,
+            start_id=self._claim_cursor,
+            count=settings.stream_batch_count,
+        )
+        cursor, entries = result[0], result[1]
+        self._claim_cursor = cursor.decode() if isinstance(cursor, bytes) else cursor
+
+        if self._claim_cursor == "0-0":
+            # Scanned the whole pending list; check again after another idle period
+            self._next_claim_at = time.monotonic() + settings.stream_claim_idle_ms / 1000
+        if entries:
+            logger.info(f"Claimed {len(entries)} stale entries from {self._stream}")
+        return entries
+
+    async def _decode(self, entry_id, fields) -> Optional[dict]:
+        data = fields.get(b"data") if fields else None
+        start = time.perf_counter()
+        try:
+            event = decode_event(self._codec, data)
+        except (TypeError, ValueError):
+            logger.error(f"Invalid stream entry {entry_id}: {str(data)[:100]}")
+            # Ack poison entries so they don't sit in the pending list forever
+            await self._redis.xack(self._stream, self._group, entry_id)
+            return None
+        DECODE_SECONDS.observe(time.perf_counter() - start)
+        event[STREAM_ID_KEY] = entry_id
+        return event
+
+    async def ack(self, events: list[dict]) -> None:
+        ids = [event.pop(STREAM_ID_KEY) for event in events if STREAM_ID_KEY in event]
+        if ids:
+            await self._redis.xack(self._stream, self._group, *ids)
+
+    async def close(self) -> None:
+        await self._redis.close()
+        logger.info("Redis stream consumer closed")
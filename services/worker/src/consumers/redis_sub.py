@@ -1,11 +1,13 @@
-import json
 import logging
+import time
 from typing import AsyncIterator
 
 import redis.asyncio as aioredis
 
+from src.codec import decode_event, get_codec
 from src.config import settings
 from src.consumers.base import Consumer
+from src.metrics import DECODE_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +18,7 @@ class RedisConsumer(Consumer):
     def __init__(self):
         self._redis = aioredis.from_url(settings.redis_url)
         self._pubsub = self._redis.pubsub()
+        self._codec = get_codec()
 
     async def subscribe(self, channel: str) -> None:
         await self._pubsub.subscribe(channel)
@@ -25,11 +28,14 @@ class RedisConsumer(Consumer):
         async for message in self._pubsub.listen():
             if message["type"] != "message":
                 continue
+            start = time.perf_counter()
             try:
-                data = json.loads(message["data"])
-                yield data
-            except json.JSONDecodeError:
-                logger.error(f"Invalid JSON: {message['data'][:100]}")
+                data = decode_event(self._codec, message["data"])
+            except (TypeError, ValueError):
+                logger.error(f"Invalid message: {message['data'][:100]}")
+                continue
+            DECODE_SECONDS.observe(time.perf_counter() - start)
+            yield data
 
     async def close(self) -> None:
         await self._pubsub.unsubscribe()
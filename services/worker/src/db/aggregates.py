@@ -0,0 +1,127 @@
+"""Running per-student answer aggregates, kept in step with quiz_answers.
+
+agg_topic_performance holds one row per (user_id, subject_id) and
+agg_user_daily_stats one per (user_id, subject_id, answer_date). The worker
+adds each new batch of answers to them inside the transaction that inserts
+the answers, so they are never ahead of or behind the raw table. rebuild()
+recomputes both from quiz_answers for reconciliation.
+"""
+
+from src.db import prepared
+
+# Scored answers (subject_id is stamped at insert time); {where} narrows the set
+_SCORED = """
+    SELECT qa.user_id, qa.subject_id, qa.created_at, qa.is_correct, qa.time_spent_ms, qa.hints_used
+    FROM quiz_answers qa
+    WHERE qa.user_id IS NOT NULL AND qa.subject_id IS NOT NULL {where}
+"""
+
+_MEASURES = """
+        COUNT(*) AS total_questions,
+        COUNT(*) FILTER (WHERE is_correct) AS correct_count,
+        COALESCE(SUM(time_spent_ms), 0) AS total_time_ms,
+        COUNT(time_spent_ms) AS timed_answers,
+        COALESCE(SUM(hints_used), 0) AS total_hints
+"""
+
+# Ordered so concurrent upserts lock rows in the same order
+_TOPIC_ROWS = f"""
+    SELECT user_id, subject_id, {_MEASURES}, MAX(created_at) AS last_activity
+    FROM scored
+    GROUP BY user_id, subject_id
+    ORDER BY user_id, subject_id
+"""
+
+_DAILY_ROWS = f"""
+    SELECT user_id, subject_id, created_at::date AS answer_date, {_MEASURES}
+    FROM scored
+    GROUP BY user_id, subject_id, created_at::date
+    ORDER BY user_id, subject_id, answer_date
+"""
+
+_TOPIC_COLUMNS = (
+    "user_id, subject_id, total_questions, correct_count, total_time_ms, timed_answers, total_hints, last_activity"
+)
+_DAILY_COLUMNS = (
+    "user_id, subject_id, answer_date, total_questions, correct_count, total_time_ms, timed_answers, total_hints"
+)
+
+_ADD_MEASURES = """
+        total_questions = {t}.total_questions + EXCLUDED.total_questions,
+        correct_count = {t}.correct_count + EXCLUDED.correct_count,
+        total_time_ms = {t}.total_time_ms + EXCLUDED.total_time_ms,
+        timed_answers = {t}.timed_answers + EXCLUDED.timed_answers,
+        total_hints = {t}.total_hints + EXCLUDED.total_hints
+"""
+
+UPSERT_SQL = f"""
+    WITH scored AS ({_SCORED.format(where="AND qa.id = ANY(%s::uuid[])")}),
+    topic AS (
+        INSERT INTO agg_topic_performance AS t ({_TOPIC_COLUMNS})
+        {_TOPIC_ROWS}
+        ON CONFLICT (user_id, subject_id) DO UPDATE SET
+            {_ADD_MEASURES.format(t="t")},
+            last_activity = GREATEST(t.last_activity, EXCLUDED.last_activity)
+    )
+    INSERT INTO agg_user_daily_stats AS d ({_DAILY_COLUMNS})
+    {_DAILY_ROWS}
+    ON CONFLICT (user_id, subject_id, answer_date) DO UPDATE SET
+        {_ADD_MEASURES.format(t="d")}
+"""
+UPSERT = prepared.register("upsert_answer_aggregates", UPSERT_SQL, ("uuid[]",))
+
+_DRIFT_SQL = f"""
+    WITH scored AS ({_SCORED.format(where="")}),
+    expected AS ({{rows}})
+    SELECT COUNT(*)
+    FROM expected e
+    FULL JOIN {{table}} a USING ({{keys}})
+    WHERE (e.total_questions, e.correct_count, e.total_time_ms, e.timed_answers, e.total_hints)
+        IS DISTINCT FROM (a.total_questions, a.correct_count, a.total_time_ms, a.timed_answers, a.total_hints)
+"""
+
+
+def upsert_answer_aggregates(cur, answer_ids: list[str]) -> None:
+    """Add the given quiz_answers rows to the running aggregates.
+
+    Call in the same transaction that inserted the answers.
+    """
+    if answer_ids:
+        prepared.execute(cur, UPSERT, (list(answer_ids),))
+
+
+def find_drift(cur) -> dict[str, int]:
+    """Count aggregate rows that differ from a recomputation over quiz_answers."""
+    drift = {}
+    for table, rows, keys in (
+        ("agg_topic_performance", _TOPIC_ROWS, "user_id, subject_id"),
+        ("agg_user_daily_stats", _DAILY_ROWS, "user_id, subject_id, answer_date"),
+    ):
+        cur.execute(_DRIFT_SQL.format(rows=rows, table=table, keys=keys))
+        drift[table] = cur.fetchone()[0]
+    return drift
+
+
+def rebuild(cur) -> None:
+    """Replace both aggregate tables with a recomputation over quiz_answers.
+
+    The tables are locked first, so workers adding answers meanwhile wait and
+    apply their deltas on top of the rebuilt rows rather than being lost.
+    """
+    cur.execute("LOCK TABLE agg_topic_performance, agg_user_daily_stats IN EXCLUSIVE MODE")
+    cur.execute("DELETE FROM agg_topic_performance")
+    cur.execute("DELETE FROM agg_user_daily_stats")
+    cur.execute(
+        f"""
+        WITH scored AS ({_SCORED.format(where="")})
+        INSERT INTO agg_topic_performance ({_TOPIC_COLUMNS})
+        {_TOPIC_ROWS}
+        """
+    )
+    cur.execute(
+        f"""
+        WITH scored AS ({_SCORED.format(where="")})
+        INSERT INTO agg_user_daily_stats ({_DAILY_COLUMNS})
+        {_DAILY_ROWS}
+        """
+    )
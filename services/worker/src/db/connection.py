@@ -1,35 +1,149 @@
+"""Database connection pool.
+
+Wraps psycopg2's ThreadedConnectionPool with what the worker needs on top:
+
+- callers wait (up to db_pool_timeout_s) for a free connection instead of
+  getting PoolError when all db_pool_max are checked out;
+- a connection that sat idle for db_pool_check_idle_s is pinged before it is
+  handed out, and replaced if the server or network dropped it;
+- each new connection prepares the registered statements (src.db.prepared)
+  on first checkout, and warm_pool() does this for db_pool_min connections
+  at startup so the first events do not pay for it.
+
+Pool wait and checkout (hold) times are exported as metrics.
+"""
+
 import logging
+import threading
+import time
 
 import psycopg2
-from psycopg2.pool import ThreadedConnectionPool
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 
 from src.config import settings
+from src.db.prepared import PreparingConnection, prepare_all
+from src.metrics import POOL_CHECKOUT_SECONDS, POOL_IN_USE, POOL_RECONNECTS, POOL_WAIT_SECONDS
 
 logger = logging.getLogger(__name__)
 
+
+class ConnectionPool:
+    def __init__(self, dsn: str, minconn: int, maxconn: int, timeout: float, check_idle_s: float, **connect_kwargs):
+        self.timeout = timeout
+        self.check_idle_s = check_idle_s
+        self._pool = ThreadedConnectionPool(
+            minconn, maxconn, dsn=dsn, connection_factory=PreparingConnection, **connect_kwargs
+        )
+        self._slots = threading.BoundedSemaphore(maxconn)
+        # Per-connection monotonic time of the last return to the pool / of checkout
+        self._returned: dict[int, float] = {}
+        self._checked_out: dict[int, float] = {}
+        self.minconn = minconn
+        self.maxconn = maxconn
+
+    def getconn(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+            raise PoolError(f"No database connection free after {self.timeout}s")
+        try:
+            conn = self._checkout_live()
+        except BaseException:
+            self._slots.release()
+            raise
+        POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+        POOL_IN_USE.inc()
+        self._checked_out[id(conn)] = time.perf_counter()
+        return conn
+
+    def _checkout_live(self):
+        # Each dead connection is closed before the next try, so this ends
+        for _ in range(self.maxconn + 1):
+            conn = self._pool.getconn()
+            returned = self._returned.pop(id(conn), None)
+            # Connections just opened by the pool have no return time and are not pinged
+            idle = time.monotonic() - returned if returned is not None else 0.0
+            if not conn.closed and (returned is None or idle < self.check_idle_s or _ping(conn)):
+                prepare_all(conn)
+                return conn
+            logger.warning(f"Replacing dead database connection (idle {idle:.0f}s)")
+            POOL_RECONNECTS.inc()
+            self._pool.putconn(conn, close=True)
+        raise PoolError("Could not get a live database connection")
+
+    def putconn(self, conn) -> None:
+        checked_out = self._checked_out.pop(id(conn), None)
+        if checked_out is not None:
+            POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - checked_out)
+        try:
+            self._pool.putconn(conn, close=bool(conn.closed))
+            if not conn.closed:
+                self._returned[id(conn)] = time.monotonic()
+        finally:
+            POOL_IN_USE.dec()
+            self._slots.release()
+
+    def warm(self) -> None:
+        """Check out minconn connections at once so each is connected and has its statements prepared."""
+        conns = [self.getconn() for _ in range(self.minconn)]
+        for conn in conns:
+            self.putconn(conn)
+
+    def closeall(self) -> None:
+        self._pool.closeall()
+
+
+def _ping(conn) -> bool:
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
 _pool = None
+_pool_lock = threading.Lock()
 
 
-def get_pool() -> ThreadedConnectionPool:
+def create_pool(minconn: int, maxconn: int) -> ConnectionPool:
+    """A pool with the configured timeouts and keepalives, for `maxconn` connections."""
+    return ConnectionPool(
+        settings.database_url,
+        minconn=minconn,
+        maxconn=maxconn,
+        timeout=settings.db_pool_timeout_s,
+        check_idle_s=settings.db_pool_check_idle_s,
+        # TCP keepalives stop idle connections being silently dropped by NAT/firewalls
+        keepalives=1,
+        keepalives_idle=settings.db_keepalive_idle_s,
+    )
+
+
+def get_pool() -> ConnectionPool:
     global _pool
     if _pool is None:
-        _pool = ThreadedConnectionPool(
-            minconn=1,
-            maxconn=5,
-            dsn=settings.database_url,
-        )
-        logger.info("Database connection pool created")
+        with _pool_lock:
+            if _pool is None:
+                _pool = create_pool(settings.db_pool_min, settings.db_pool_max)
+                logger.info(f"Database connection pool created (min={settings.db_pool_min}, max={settings.db_pool_max})")
     return _pool
 
 
+def warm_pool() -> None:
+    """Open and prepare the pool's minimum connections ahead of the first event."""
+    start = time.perf_counter()
+    get_pool().warm()
+    logger.info(f"Warmed {settings.db_pool_min} database connections in {time.perf_counter() - start:.2f}s")
+
+
 def get_connection():
-    pool = get_pool()
-    return pool.getconn()
+    return get_pool().getconn()
 
 
 def release_connection(conn):
-    pool = get_pool()
-    pool.putconn(conn)
+    get_pool().putconn(conn)
 
 
 def close_pool():
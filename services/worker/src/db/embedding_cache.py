@@ -0,0 +1,75 @@
+"""Embeddings already computed, keyed by (model, hash of the normalized text).
+
+Duplicate content (re-seeded rows, the same OpenTDB question fetched twice)
+is embedded once: the embedding processor looks texts up here before calling
+the API and records what it gets back. Lookups bump last_used_at, and
+prune() drops the least recently used entries beyond a row limit.
+"""
+
+import hashlib
+import json
+import re
+import unicodedata
+
+from psycopg2.extras import execute_values
+
+from src.db import prepared
+
+_WHITESPACE = re.compile(r"\s+")
+
+LOOKUP = prepared.register(
+    "lookup_embeddings",
+    """
+    UPDATE embedding_cache SET last_used_at = NOW()
+    WHERE model = %s AND text_hash = ANY(%s)
+    RETURNING text_hash, embedding::text
+    """,
+    ("text", "bytea[]"),
+)
+
+PRUNE_SQL = """
+    DELETE FROM embedding_cache c
+    USING (
+        SELECT model, text_hash FROM embedding_cache
+        ORDER BY last_used_at DESC
+        OFFSET %s
+    ) stale
+    WHERE c.model = stale.model AND c.text_hash = stale.text_hash
+"""
+
+
+def normalize(text: str) -> str:
+    """Unicode-normalize text and collapse runs of whitespace, which don't change what it says."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def text_hash(text: str) -> bytes:
+    """Cache key for a text (the model is keyed separately)."""
+    return hashlib.sha256(normalize(text).encode()).digest()
+
+
+def lookup(cur, model: str, hashes: list[bytes]) -> dict[bytes, list[float]]:
+    """Cached embeddings for whichever of `hashes` are present."""
+    if not hashes:
+        return {}
+    prepared.execute(cur, LOOKUP, (model, list(hashes)))
+    return {bytes(key): json.loads(embedding) for key, embedding in cur.fetchall()}
+
+
+def store(cur, model: str, embeddings: dict) -> None:
+    """Remember embeddings by text hash. Entries already present are kept."""
+    if not embeddings:
+        return
+    execute_values(
+        cur,
+        "INSERT INTO embedding_cache (model, text_hash, embedding) VALUES %s ON CONFLICT (model, text_hash) DO NOTHING",
+        [(model, key, json.dumps(list(embedding))) for key, embedding in embeddings.items()],
+        template="(%s, %s, %s::vector)",
+        page_size=len(embeddings),
+    )
+
+
+def prune(cur, max_rows: int) -> int:
+    """Drop the least recently used entries beyond max_rows. Returns how many went."""
+    cur.execute(PRUNE_SQL, (max_rows,))
+    return cur.rowcount
@@ -0,0 +1,42 @@
+"""Rows the embedding backfill could not embed, and when to try them again.
+
+A row the API or the database rejects on its own is recorded here, and the
+backfill skips it until retry_at. Each further failure doubles the wait, from
+embedding_failure_backoff_s up to embedding_failure_backoff_max_s, so a row
+that can never be embedded costs one API call per backoff period instead of
+one per pass. Storing the row's embedding clears its record.
+"""
+
+RECORD_SQL = """
+    INSERT INTO embedding_failures AS f (table_name, row_id, attempts, last_error, retry_at)
+    VALUES (%(table)s, %(row_id)s, 1, %(error)s, NOW() + make_interval(secs => %(base)s))
+    ON CONFLICT (table_name, row_id) DO UPDATE SET
+        attempts = f.attempts + 1,
+        last_error = EXCLUDED.last_error,
+        failed_at = NOW(),
+        retry_at = NOW() + make_interval(secs => LEAST(%(max)s, %(base)s * 2 ^ f.attempts))
+"""
+
+
+def skip_clause(table: str) -> str:
+    """SQL condition, for a select from `table`, leaving out rows still backing off."""
+    return (
+        "NOT EXISTS (SELECT 1 FROM embedding_failures f "
+        f"WHERE f.table_name = '{table}' AND f.row_id = {table}.id AND f.retry_at > NOW())"
+    )
+
+
+def record(cur, table: str, row_id, error: str, base_s: float, max_s: float) -> None:
+    """Record a failed attempt at a row, pushing its next try back."""
+    cur.execute(
+        RECORD_SQL,
+        {"table": table, "row_id": str(row_id), "error": error[:1000], "base": base_s, "max": max_s},
+    )
+
+
+def clear(cur, table: str, ids: list) -> None:
+    """Forget failures of rows whose embeddings were just stored."""
+    cur.execute(
+        "DELETE FROM embedding_failures WHERE table_name = %s AND row_id = ANY(%s::uuid[])",
+        (table, [str(row_id) for row_id in ids]),
+    )
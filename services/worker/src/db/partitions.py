@@ -0,0 +1,265 @@
+"""Partition maintenance for learning_events.
+
+learning_events is range-partitioned on created_at, one partition per
+settings.partition_interval named learning_events_p<YYYYMMDD of its start>.
+Maintenance creates the current and upcoming partitions ahead of time and
+retires partitions older than the retention window: each is detached, its
+events are summarized into learning_event_rollups (one row per user per day),
+and it is dropped.
+
+Rows written before their partition exists land in learning_events_default and
+are moved into the partition when it is created. That includes rows for past
+periods (replayed or historical events, late events for a retired range):
+maintenance creates a partition for every period with rows in the default
+partition, so expired ones are rolled up like any other. Replicas coordinate
+with an advisory lock so only one of them maintains partitions at a time.
+"""
+
+import asyncio
+import calendar
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from psycopg2 import sql
+
+from src.config import settings
+from src.db.connection import get_connection, release_connection
+from src.metrics import PARTITIONS_CREATED, PARTITIONS_RETIRED
+
+logger = logging.getLogger(__name__)
+
+PARENT = "learning_events"
+DEFAULT_PARTITION = "learning_events_default"
+INTERVALS = ("day", "week", "month")
+
+_LOCK_SQL = "SELECT pg_try_advisory_xact_lock(hashtext('learning_events partition maintenance'))"
+
+_PARTITIONS_SQL = r"""
+    SELECT c.relname, b[1]::timestamptz, b[2]::timestamptz
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    CROSS JOIN LATERAL regexp_match(pg_get_expr(c.relpartbound, c.oid), 'FROM \(''(.+?)''\) TO \(''(.+?)''\)') b
+    WHERE i.inhparent = 'learning_events'::regclass AND b IS NOT NULL
+    ORDER BY 2
+"""
+
+_ROLLUP_SQL = """
+    WITH per_type AS (
+        SELECT user_id, created_at::date AS event_date, event_type, COUNT(*) AS n
+        FROM {partition}
+        WHERE user_id IS NOT NULL
+        GROUP BY 1, 2, 3
+    ), sessions AS (
+        SELECT user_id, created_at::date AS event_date, COUNT(DISTINCT session_id) AS sessions_count
+        FROM {partition}
+        WHERE user_id IS NOT NULL
+        GROUP BY 1, 2
+    )
+    INSERT INTO learning_event_rollups AS r (user_id, event_date, total_events, sessions_count, event_counts)
+    SELECT p.user_id, p.event_date, SUM(p.n), s.sessions_count, jsonb_object_agg(p.event_type, p.n)
+    FROM per_type p
+    JOIN sessions s USING (user_id, event_date)
+    GROUP BY p.user_id, p.event_date, s.sessions_count
+    -- A day can straddle two partitions when the session time zone is not UTC
+    ON CONFLICT (user_id, event_date) DO UPDATE SET
+        total_events = r.total_events + EXCLUDED.total_events,
+        sessions_count = r.sessions_count + EXCLUDED.sessions_count,
+        event_counts = (
+            SELECT jsonb_object_agg(k, COALESCE((r.event_counts ->> k)::int, 0) + COALESCE((EXCLUDED.event_counts ->> k)::int, 0))
+            FROM (SELECT jsonb_object_keys(r.event_counts) UNION SELECT jsonb_object_keys(EXCLUDED.event_counts)) keys (k)
+        )
+"""
+
+
+def period_start(when: datetime, interval: str) -> datetime:
+    """Start (UTC midnight) of the partition period containing `when`."""
+    when = when.astimezone(timezone.utc) if when.tzinfo else when.replace(tzinfo=timezone.utc)
+    day = datetime(when.year, when.month, when.day, tzinfo=timezone.utc)
+    if interval == "day":
+        return day
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown partition interval: {interval} (expected one of {INTERVALS})")
+
+
+def add_periods(start: datetime, interval: str, count: int) -> datetime:
+    """Shift a period start by `count` periods (negative goes back)."""
+    if interval == "day":
+        return start + timedelta(days=count)
+    if interval == "week":
+        return start + timedelta(weeks=count)
+    if interval == "month":
+        year, month = divmod(start.year * 12 + start.month - 1 + count, 12)
+        return start.replace(year=year, month=month + 1, day=min(start.day, calendar.monthrange(year, month + 1)[1]))
+    raise ValueError(f"Unknown partition interval: {interval} (expected one of {INTERVALS})")
+
+
+def partition_name(start: datetime) -> str:
+    return f"{PARENT}_p{start:%Y%m%d}"
+
+
+def try_lock(cur) -> bool:
+    """Take the maintenance lock for the current transaction, if no one else holds it."""
+    cur.execute(_LOCK_SQL)
+    return cur.fetchone()[0]
+
+
+def create_partition(cur, name: str, lower: datetime, upper: datetime) -> None:
+    """Create partition `name` for [lower, upper), moving matching rows out of the default partition.
+
+    The default partition is locked meanwhile, so inserts that would land
+    there wait instead of making the attach fail.
+    """
+    table = sql.Identifier(name)
+    cur.execute(sql.SQL("LOCK TABLE {} IN SHARE ROW EXCLUSIVE MODE").format(sql.Identifier(DEFAULT_PARTITION)))
+    cur.execute(
+        sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)").format(
+            table, sql.Identifier(PARENT)
+        )
+    )
+    cur.execute(
+        sql.SQL(
+            """
+            WITH moved AS (
+                DELETE FROM {} WHERE created_at >= %s AND created_at < %s RETURNING *
+            )
+            INSERT INTO {} SELECT * FROM moved
+            """
+        ).format(sql.Identifier(DEFAULT_PARTITION), table),
+        (lower, upper),
+    )
+    moved = cur.rowcount
+    cur.execute(
+        sql.SQL("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM (%s) TO (%s)").format(sql.Identifier(PARENT), table),
+        (lower, upper),
+    )
+    logger.info(f"Created partition {name} [{lower:%Y-%m-%d}, {upper:%Y-%m-%d})" + (f", moved {moved} rows" if moved else ""))
+
+
+def _create_missing(cur, lower: datetime, interval: str) -> Optional[str]:
+    """Create the partition for the period starting at `lower` unless a table by its name exists."""
+    name = partition_name(lower)
+    cur.execute("SELECT to_regclass(%s)", (name,))
+    if cur.fetchone()[0] is not None:
+        return None
+    create_partition(cur, name, lower, add_periods(lower, interval, 1))
+    return name
+
+
+def ensure_partitions(cur, now: datetime, interval: str, ahead: int) -> list[str]:
+    """Create any missing partitions from the current period through `ahead` periods on."""
+    start = period_start(now, interval)
+    created = (_create_missing(cur, add_periods(start, interval, offset), interval) for offset in range(ahead + 1))
+    return [name for name in created if name]
+
+
+def partition_default_rows(cur, interval: str) -> list[str]:
+    """Create a partition for every period with rows in the default partition, moving the rows into it.
+
+    A period whose partition was detached but not yet rolled up keeps its rows
+    in the default partition until a later run, after the rollup.
+    """
+    cur.execute(
+        sql.SQL("SELECT DISTINCT date_trunc(%s, created_at AT TIME ZONE 'UTC') FROM {} ORDER BY 1").format(
+            sql.Identifier(DEFAULT_PARTITION)
+        ),
+        (interval,),
+    )
+    created = (_create_missing(cur, period_start(start, interval), interval) for (start,) in cur.fetchall())
+    return [name for name in created if name]
+
+
+def expired_partitions(cur, cutoff: datetime) -> list[tuple[str, datetime, datetime]]:
+    """Attached (name, lower, upper) partitions that end at or before `cutoff`, oldest first."""
+    cur.execute(_PARTITIONS_SQL)
+    return [(name, lower, upper) for name, lower, upper in cur.fetchall() if upper <= cutoff]
+
+
+def detach_partition(cur, name: str) -> None:
+    """Detach a partition. Later events for its range go to the default partition."""
+    cur.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(sql.Identifier(PARENT), sql.Identifier(name)))
+
+
+def detached_partitions(cur) -> list[str]:
+    """Former partitions that were detached but not yet rolled up, oldest first."""
+    cur.execute(
+        "SELECT relname FROM pg_class WHERE relkind = 'r' AND NOT relispartition AND relname ~ %s ORDER BY relname",
+        (f"^{PARENT}_p[0-9]{{8}}$",),
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def roll_up(cur, name: str, drop: bool = True) -> None:
+    """Summarize a detached partition into learning_event_rollups, then drop it or archive it under a new name."""
+    table = sql.Identifier(name)
+    cur.execute(sql.SQL(_ROLLUP_SQL).format(partition=table))
+    if drop:
+        cur.execute(sql.SQL("DROP TABLE {}").format(table))
+    else:
+        cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(table, sql.Identifier(f"{name}_archived")))
+
+
+def run_maintenance(now: Optional[datetime] = None) -> dict[str, list[str]]:
+    """Partition rows left in the default partition, create upcoming partitions and retire
+    expired ones, committing after each step.
+
+    Expired partitions are detached in their own short transaction, then rolled
+    up and removed in another, so the parent table is never locked for the
+    length of a rollup. A partition left detached by a crash in between is
+    rolled up on the next run. Returns the partitions created and retired.
+    Does nothing if another process is already maintaining partitions.
+    """
+    now = now or datetime.now(timezone.utc)
+    interval = settings.partition_interval
+    cutoff = add_periods(period_start(now, interval), interval, -settings.partition_retention)
+    result: dict[str, list[str]] = {"created": [], "retired": []}
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            if not try_lock(cur):
+                conn.rollback()
+                logger.info("Partition maintenance already running elsewhere, skipping")
+                return result
+            # Periods in the default partition first: the expired ones among them are retired below
+            result["created"] = partition_default_rows(cur, interval)
+            result["created"] += ensure_partitions(cur, now, interval, settings.partitions_ahead)
+            for name, lower, upper in expired_partitions(cur, cutoff):
+                detach_partition(cur, name)
+                logger.info(f"Detached expired partition {name} [{lower:%Y-%m-%d}, {upper:%Y-%m-%d})")
+            conn.commit()
+            PARTITIONS_CREATED.inc(len(result["created"]))
+
+            for name in detached_partitions(cur):
+                if not try_lock(cur):
+                    break
+                roll_up(cur, name, settings.partition_drop)
+                conn.commit()
+                PARTITIONS_RETIRED.inc()
+                result["retired"].append(name)
+                action = "dropped" if settings.partition_drop else "archived"
+                logger.info(f"Rolled up and {action} partition {name}")
+            conn.rollback()  # end the transaction left open by the listing query
+            return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_connection(conn)
+
+
+async def maintain_partitions(every: float) -> None:
+    """Run partition maintenance now and then every `every` seconds. Runs until cancelled."""
+    while True:
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(run_maintenance)
+        except Exception:
+            logger.exception("Partition maintenance failed")
+        else:
+            logger.debug(f"Partition maintenance took {time.perf_counter() - start:.2f}s")
+        await asyncio.sleep(every)
@@ -0,0 +1,86 @@
+"""Server-side prepared statements for the worker's hot queries.
+
+Repository modules register their statements at import time:
+
+    INSERT_EVENT = register("insert_event", INSERT_EVENT_SQL, ("uuid", "uuid", ...))
+
+Statement text uses psycopg2 %s placeholders, one per entry in param_types.
+Each pooled connection PREPAREs every registered statement once, when it is
+first checked out, so later calls send only a short EXECUTE and Postgres
+skips parsing and (after a few runs) planning. A statement that is not
+prepared on a connection is sent as plain SQL instead.
+"""
+
+import logging
+from dataclasses import dataclass
+
+import psycopg2
+from psycopg2.extensions import connection as _connection
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Statement:
+    name: str
+    sql: str
+    param_types: tuple[str, ...]
+
+    @property
+    def prepare_sql(self) -> str:
+        placeholders = tuple(f"${i}" for i in range(1, len(self.param_types) + 1))
+        return f"PREPARE {self.name} ({', '.join(self.param_types)}) AS {self.sql % placeholders}"
+
+    @property
+    def execute_sql(self) -> str:
+        return f"EXECUTE {self.name} ({', '.join(f'%s::{t}' for t in self.param_types)})"
+
+
+STATEMENTS: dict[str, Statement] = {}
+
+
+def register(name: str, sql: str, param_types: tuple[str, ...]) -> Statement:
+    """Register (or replace) a statement to prepare on every pooled connection."""
+    statement = Statement(name, sql, tuple(param_types))
+    STATEMENTS[name] = statement
+    return statement
+
+
+class PreparingConnection(_connection):
+    """psycopg2 connection that remembers which statements are prepared on it."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared: set[str] = set()
+
+
+def prepare_all(conn) -> int:
+    """PREPARE registered statements missing from an idle connection, committing each.
+
+    Runs outside any transaction so a later rollback cannot undo a PREPARE.
+    A statement that fails to prepare (say, its table does not exist yet) is
+    skipped and retried at the next checkout. Returns how many were prepared.
+    """
+    prepared = 0
+    for statement in STATEMENTS.values():
+        if statement.name in conn.prepared:
+            continue
+        try:
+            with conn.cursor() as cur:
+                cur.execute(statement.prepare_sql)
+            conn.commit()
+        except psycopg2.Error as exc:
+            conn.rollback()
+            logger.warning(f"Could not prepare {statement.name}: {exc}")
+            continue
+        conn.prepared.add(statement.name)
+        prepared += 1
+    return prepared
+
+
+def execute(cur, statement: Statement, params: tuple) -> None:
+    """Run a registered statement, via EXECUTE when it is prepared on the cursor's connection."""
+    if statement.name in getattr(cur.connection, "prepared", ()):
+        cur.execute(statement.execute_sql, params)
+    else:
+        cur.execute(statement.sql, params)
@@ -1,14 +1,117 @@
-import json
+import functools
+import io
 import logging
+import time
 from datetime import datetime
 from typing import Optional
 from uuid import UUID
 
+from src.codec import to_json_text
+from src.db import prepared
+from src.db.aggregates import upsert_answer_aggregates
 from src.db.connection import get_connection, release_connection
+from src.metrics import DB_INSERT_SECONDS
 
 logger = logging.getLogger(__name__)
 
+# Column order of quiz_answers rows for insert_event_batch and copy_event_batch.
+# subject_id and difficulty may be None; they are then copied from the quiz.
+ANSWER_COLUMNS = (
+    "user_id", "quiz_id", "question_id", "selected_answer", "is_correct",
+    "time_spent_ms", "hints_used", "event_id", "subject_id", "difficulty",
+)
+_ANSWER_EVENT_ID = ANSWER_COLUMNS.index("event_id")
+_ANSWER_QUIZ_ID = ANSWER_COLUMNS.index("quiz_id")
+_ANSWER_TYPES = ("uuid", "uuid", "uuid", "text", "boolean", "int", "int", "uuid", "int", "text")
 
+INSERT_EVENT = prepared.register(
+    "insert_event",
+    """
+    INSERT INTO learning_events (id, user_id, event_type, payload, session_id, created_at)
+    VALUES (
+        COALESCE(%s::uuid, uuid_generate_v4()),
+        %s::uuid, %s,
+        COALESCE(%s::jsonb -> 'payload', %s::jsonb),
+        %s::uuid,
+        COALESCE(%s::timestamptz, NOW())
+    )
+    ON CONFLICT (id, created_at) DO NOTHING
+    RETURNING id
+    """,
+    ("uuid", "uuid", "text", "text", "text", "uuid", "timestamptz"),
+)
+
+INSERT_ANSWER = prepared.register(
+    "insert_answer",
+    """
+    INSERT INTO quiz_answers
+        (user_id, quiz_id, question_id, selected_answer, is_correct, time_spent_ms, hints_used, event_id,
+         subject_id, difficulty)
+    SELECT %s::uuid, %s::uuid, %s::uuid, %s, %s::boolean, %s::int, %s::int, %s::uuid,
+           COALESCE(%s::int, q.subject_id), COALESCE(%s, q.difficulty)
+    FROM (SELECT 1) one
+    LEFT JOIN quizzes q ON q.id = %s::uuid
+    RETURNING id
+    """,
+    _ANSWER_TYPES + ("uuid",),
+)
+
+# Batches are passed as one array per column and unnested, so the statement
+# text is the same for every batch size and can be prepared once
+INSERT_EVENTS = prepared.register(
+    "insert_events",
+    """
+    INSERT INTO learning_events (id, user_id, event_type, payload, session_id, created_at)
+    SELECT e.id, e.user_id, e.event_type, COALESCE(e.raw_event::jsonb -> 'payload', e.payload::jsonb),
+           e.session_id, COALESCE(e.created_at, NOW())
+    FROM unnest(%s::uuid[], %s::uuid[], %s::text[], %s::text[], %s::text[], %s::uuid[], %s::timestamptz[])
+        AS e (id, user_id, event_type, raw_event, payload, session_id, created_at)
+    ON CONFLICT (id, created_at) DO NOTHING
+    RETURNING id
+    """,
+    ("uuid[]", "uuid[]", "text[]", "text[]", "text[]", "uuid[]", "timestamptz[]"),
+)
+
+INSERT_ANSWERS = prepared.register(
+    "insert_answers",
+    """
+    INSERT INTO quiz_answers
+        (user_id, quiz_id, question_id, selected_answer, is_correct, time_spent_ms, hints_used, event_id,
+         subject_id, difficulty)
+    SELECT a.user_id, a.quiz_id, a.question_id, a.selected_answer, a.is_correct, a.time_spent_ms,
+           a.hints_used, a.event_id, COALESCE(a.subject_id, q.subject_id), COALESCE(a.difficulty, q.difficulty)
+    FROM unnest(%s::uuid[], %s::uuid[], %s::uuid[], %s::text[], %s::boolean[], %s::int[], %s::int[], %s::uuid[],
+                %s::int[], %s::text[])
+        AS a (user_id, quiz_id, question_id, selected_answer, is_correct, time_spent_ms, hints_used, event_id,
+              subject_id, difficulty)
+    LEFT JOIN quizzes q ON a.subject_id IS NULL AND q.id = a.quiz_id
+    RETURNING id
+    """,
+    tuple(f"{t}[]" for t in _ANSWER_TYPES),
+)
+
+
+def _columns(rows: list[tuple]) -> tuple[list, ...]:
+    """Transpose rows into one list per column, the form unnest() takes."""
+    return tuple(list(column) for column in zip(*rows))
+
+
+def _timed(fn):
+    """Record the wrapped repository function's duration in DB_INSERT_SECONDS."""
+    histogram = DB_INSERT_SECONDS.labels(fn.__name__)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+@_timed
 def insert_learning_event(
     event_type: str,
     payload: dict,
@@ -16,26 +119,44 @@ def insert_learning_event(
     session_id: Optional[str] = None,
     event_id: Optional[str] = None,
     created_at: Optional[str] = None,
-) -> str:
-    """Insert a raw learning event and return its ID."""
+    raw_event: Optional[str] = None,
+    answer: Optional[tuple] = None,
+) -> Optional[str]:
+    """Insert a raw learning event and return its ID, or None if it is already stored.
+
+    learning_events is partitioned on created_at, so an event is a duplicate
+    when both its id and created_at match a stored row.
+
+    If raw_event (the event's original JSON text) is given, Postgres extracts the
+    payload from it directly instead of the payload dict being re-serialized.
+
+    ``answer`` is the event's quiz_answers row (ANSWER_COLUMNS order). It is
+    inserted and added to the answer aggregates in the same transaction as the
+    event, so a failure can't leave the event stored without its answer; it is
+    skipped along with a duplicate event.
+    """
     conn = get_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO learning_events (id, user_id, event_type, payload, session_id, created_at)
-                VALUES (
-                    COALESCE(%s, uuid_generate_v4()),
-                    %s, %s, %s, %s,
-                    COALESCE(%s::timestamptz, NOW())
-                )
-                RETURNING id
-                """,
-                (event_id, user_id, event_type, json.dumps(payload), session_id, created_at),
+            prepared.execute(
+                cur,
+                INSERT_EVENT,
+                (
+                    event_id,
+                    user_id,
+                    event_type,
+                    raw_event,
+                    None if raw_event else to_json_text(payload),
+                    session_id,
+                    created_at,
+                ),
             )
-            result_id = str(cur.fetchone()[0])
+            row = cur.fetchone()
+            if row and answer is not None:
+                prepared.execute(cur, INSERT_ANSWER, (*answer, answer[_ANSWER_QUIZ_ID]))
+                upsert_answer_aggregates(cur, [str(cur.fetchone()[0])])
             conn.commit()
-            return result_id
+            return str(row[0]) if row else None
     except Exception:
         conn.rollback()
         raise
@@ -43,6 +164,7 @@ def insert_learning_event(
         release_connection(conn)
 
 
+@_timed
 def insert_quiz_answer(
     user_id: str,
     quiz_id: str,
@@ -52,21 +174,26 @@ def insert_quiz_answer(
     time_spent_ms: Optional[int] = None,
     hints_used: int = 0,
     event_id: Optional[str] = None,
+    subject_id: Optional[int] = None,
+    difficulty: Optional[str] = None,
 ) -> str:
-    """Insert a denormalized quiz answer record."""
+    """Insert a denormalized quiz answer record and add it to the answer aggregates.
+
+    subject_id and difficulty are looked up from the quiz when not given.
+    """
     conn = get_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO quiz_answers
-                    (user_id, quiz_id, question_id, selected_answer, is_correct, time_spent_ms, hints_used, event_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-                """,
-                (user_id, quiz_id, question_id, selected_answer, is_correct, time_spent_ms, hints_used, event_id),
+            prepared.execute(
+                cur,
+                INSERT_ANSWER,
+                (
+                    user_id, quiz_id, question_id, selected_answer, is_correct, time_spent_ms, hints_used, event_id,
+                    subject_id, difficulty, quiz_id,
+                ),
             )
             result_id = str(cur.fetchone()[0])
+            upsert_answer_aggregates(cur, [result_id])
             conn.commit()
             return result_id
     except Exception:
@@ -74,3 +201,163 @@ def insert_quiz_answer(
         raise
     finally:
         release_connection(conn)
+
+
+@_timed
+def insert_event_batch(events: list[tuple], answers: list[tuple]) -> set[str]:
+    """Insert a batch of raw events and their quiz answers in one transaction.
+
+    ``events`` rows are ``(id, user_id, event_type, payload, session_id, created_at,
+    raw_event)`` where raw_event is the event's original JSON text or None, and
+    ``answers`` rows follow ANSWER_COLUMNS. Event ids must be assigned by the
+    caller so answers can reference them without a round-trip.
+
+    Events already stored (same id and created_at) are skipped along with their answers.
+    Inserted answers are added to the answer aggregates in the same transaction.
+    Returns the ids that were inserted.
+    """
+    if not events:
+        return set()
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            prepared.execute(
+                cur,
+                INSERT_EVENTS,
+                _columns(
+                    [
+                        (
+                            event_id,
+                            user_id,
+                            event_type,
+                            raw_event,
+                            None if raw_event else to_json_text(payload),
+                            session_id,
+                            created_at,
+                        )
+                        for event_id, user_id, event_type, payload, session_id, created_at, raw_event in events
+                    ]
+                ),
+            )
+            inserted_ids = {str(row[0]) for row in cur.fetchall()}
+            answers = [answer for answer in answers if answer[_ANSWER_EVENT_ID] in inserted_ids]
+            if answers:
+                prepared.execute(cur, INSERT_ANSWERS, _columns(answers))
+                answer_ids = cur.fetchall()
+                upsert_answer_aggregates(cur, [str(row[0]) for row in answer_ids])
+            conn.commit()
+            return inserted_ids
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_connection(conn)
+
+
+def _copy_field(value) -> str:
+    """Format a value for COPY ... FROM STDIN text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy_buffer(rows) -> io.StringIO:
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_field(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+@_timed
+def copy_event_batch(events: list[tuple], answers: list[tuple]) -> int:
+    """Bulk-load events and quiz answers with COPY, in one transaction.
+
+    Rows have the same layout as for insert_event_batch. They are copied into
+    temporary staging tables and moved over with INSERT ... ON CONFLICT DO
+    NOTHING, so loading the same events twice is harmless. Answers are kept
+    only for events that were actually inserted, and are added to the answer
+    aggregates in the same transaction. Returns the number of events inserted.
+    """
+    if not events:
+        return 0
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TEMP TABLE IF NOT EXISTS staging_events (
+                    id UUID, user_id UUID, event_type VARCHAR(50), payload TEXT,
+                    raw_event TEXT, session_id UUID, created_at TIMESTAMPTZ
+                ) ON COMMIT DELETE ROWS;
+                CREATE TEMP TABLE IF NOT EXISTS staging_answers (
+                    user_id UUID, quiz_id UUID, question_id UUID, selected_answer VARCHAR(255),
+                    is_correct BOOLEAN, time_spent_ms INTEGER, hints_used INTEGER, event_id UUID,
+                    subject_id INTEGER, difficulty VARCHAR(20)
+                ) ON COMMIT DELETE ROWS;
+                """
+            )
+            cur.copy_expert(
+                "COPY staging_events FROM STDIN",
+                _copy_buffer(
+                    (
+                        event_id,
+                        user_id,
+                        event_type,
+                        None if raw_event else to_json_text(payload),
+                        raw_event,
+                        session_id,
+                        created_at,
+                    )
+                    for event_id, user_id, event_type, payload, session_id, created_at, raw_event in events
+                ),
+            )
+            if answers:
+                cur.copy_expert("COPY staging_answers FROM STDIN", _copy_buffer(answers))
+            cur.execute(
+                """
+                WITH inserted AS (
+                    INSERT INTO learning_events (id, user_id, event_type, payload, session_id, created_at)
+                    SELECT
+                        id, user_id, event_type,
+                        COALESCE(raw_event::jsonb -> 'payload', payload::jsonb),
+                        session_id, COALESCE(created_at, NOW())
+                    FROM staging_events
+                    ON CONFLICT (id, created_at) DO NOTHING
+                    RETURNING id
+                ), answers AS (
+                    INSERT INTO quiz_answers
+                        (user_id, quiz_id, question_id, selected_answer, is_correct, time_spent_ms, hints_used, event_id,
+                         subject_id, difficulty)
+                    SELECT a.user_id, a.quiz_id, a.question_id, a.selected_answer, a.is_correct,
+                           a.time_spent_ms, COALESCE(a.hints_used, 0), a.event_id,
+                           COALESCE(a.subject_id, q.subject_id), COALESCE(a.difficulty, q.difficulty)
+                    FROM staging_answers a
+                    JOIN inserted i ON i.id = a.event_id
+                    LEFT JOIN quizzes q ON a.subject_id IS NULL AND q.id = a.quiz_id
+                    RETURNING id
+                )
+                SELECT (SELECT COUNT(*) FROM inserted), ARRAY(SELECT id::text FROM answers)
+                """
+            )
+            inserted, answer_ids = cur.fetchone()
+            # A separate statement: CTEs can't see each other's inserted rows
+            upsert_answer_aggregates(cur, answer_ids)
+            conn.commit()
+            return inserted
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_connection(conn)
@@ -0,0 +1,202 @@
+"""Approximate nearest-neighbour indexes on lessons.embedding and quiz_questions.embedding.
+
+The API's similarity search orders by `embedding <=> $1` (cosine distance),
+which pgvector can serve from an HNSW or IVFFlat index built with
+vector_cosine_ops. Index parameters depend on how many rows are embedded:
+
+- hnsw: m and ef_construction grow with the table, trading build time for
+  recall on large tables.
+- ivfflat: lists = rows / 1000 up to 1M rows, sqrt(rows) beyond. Its
+  centroids are fixed at build time, so it is rebuilt once the embedded row
+  count has moved more than vector_index_drift from the count it was built on.
+
+An index is (re)built when it is missing, invalid (a failed concurrent
+build), of the wrong method, built with different parameters than the row
+count now calls for, or drifted. Rebuilds use CREATE INDEX CONCURRENTLY under
+a temporary name and swap it in, so searches and writes carry on meanwhile.
+The row count an index was built for is kept in its comment.
+
+The schema creates no ANN index: an index built on an empty table is sized
+for nothing and slows every backfill write. The worker runs
+maintain_indexes() after each embedding backfill pass that stored rows, which
+builds the first index once a table has vector_index_min_rows embedded rows;
+python -m src.vector_index runs it by hand.
+"""
+
+import logging
+import math
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+METHODS = ("hnsw", "ivfflat")
+# Table -> name of its embedding index, created here rather than by init-db.sql
+INDEXES = {
+    "lessons": "idx_lessons_embedding_ann",
+    "quiz_questions": "idx_questions_embedding_ann",
+}
+
+# Session-level: CREATE INDEX CONCURRENTLY can't run inside a transaction
+_LOCK_SQL = "SELECT pg_try_advisory_lock(hashtext('vector index maintenance'))"
+_UNLOCK_SQL = "SELECT pg_advisory_unlock(hashtext('vector index maintenance'))"
+
+_INDEX_SQL = """
+    SELECT am.amname, c.reloptions, i.indisvalid, obj_description(c.oid, 'pg_class')
+    FROM pg_class c
+    JOIN pg_index i ON i.indexrelid = c.oid
+    JOIN pg_am am ON am.oid = c.relam
+    WHERE c.oid = to_regclass(%s)
+"""
+
+
+@dataclass(frozen=True)
+class IndexPlan:
+    method: str
+    params: dict[str, int]
+
+    def with_clause(self) -> str:
+        return ", ".join(f"{name} = {value}" for name, value in sorted(self.params.items()))
+
+
+@dataclass(frozen=True)
+class ExistingIndex:
+    method: str
+    params: dict[str, int]
+    valid: bool
+    built_rows: Optional[int]
+
+
+def plan(rows: int, method: str) -> IndexPlan:
+    """Index parameters for a table with `rows` embedded rows."""
+    if method == "hnsw":
+        if rows < 1_000_000:
+            m, ef_construction = 16, 64
+        elif rows < 10_000_000:
+            m, ef_construction = 24, 128
+        else:
+            m, ef_construction = 32, 200
+        return IndexPlan("hnsw", {"m": m, "ef_construction": ef_construction})
+    if method == "ivfflat":
+        lists = rows // 1000 if rows <= 1_000_000 else int(math.sqrt(rows))
+        return IndexPlan("ivfflat", {"lists": max(1, lists)})
+    raise ValueError(f"Unknown vector index method: {method} (expected one of {METHODS})")
+
+
+def query_setting(index_plan: IndexPlan) -> tuple[str, int]:
+    """The search-time knob to pair with an index: hnsw.ef_search or ivfflat.probes."""
+    if index_plan.method == "hnsw":
+        return "hnsw.ef_search", max(40, 2 * index_plan.params["m"])
+    return "ivfflat.probes", max(1, round(math.sqrt(index_plan.params["lists"])))
+
+
+def rebuild_reason(existing: Optional[ExistingIndex], wanted: IndexPlan, rows: int) -> Optional[str]:
+    """Why the index should be (re)built, or None if it is fine as it is."""
+    if existing is None:
+        return "missing"
+    if not existing.valid:
+        return "invalid"
+    if existing.method != wanted.method:
+        return f"method {existing.method} -> {wanted.method}"
+    if existing.params != wanted.params:
+        return f"parameters {existing.params} -> {wanted.params}"
+    if wanted.method == "ivfflat":
+        built = existing.built_rows or 0
+        if abs(rows - built) > settings.vector_index_drift * max(built, 1):
+            return f"row count drifted {built} -> {rows}"
+    return None
+
+
+def _parse_options(reloptions: Optional[list[str]]) -> dict[str, int]:
+    options = {}
+    for option in reloptions or ():
+        name, _, value = option.partition("=")
+        if value.isdigit():
+            options[name] = int(value)
+    return options
+
+
+def existing_index(cur, name: str) -> Optional[ExistingIndex]:
+    cur.execute(_INDEX_SQL, (name,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    method, reloptions, valid, comment = row
+    built = re.search(r"rows=(\d+)", comment or "")
+    params = _parse_options(reloptions)
+    # Parameters left at pgvector's defaults aren't listed in reloptions
+    defaults = {"hnsw": {"m": 16, "ef_construction": 64}, "ivfflat": {"lists": 100}}.get(method, {})
+    return ExistingIndex(method, {**defaults, **params}, valid, int(built.group(1)) if built else None)
+
+
+def embedded_rows(cur, table: str) -> int:
+    cur.execute(sql.SQL("SELECT count(*) FROM {} WHERE embedding IS NOT NULL").format(sql.Identifier(table)))
+    return cur.fetchone()[0]
+
+
+def build(cur, table: str, name: str, index_plan: IndexPlan, rows: int) -> None:
+    """Build the index under a temporary name without blocking writes, then swap it in for `name`.
+
+    Needs an autocommit connection.
+    """
+    temp = f"{name}_new"
+    cur.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(temp)))
+    cur.execute(sql.SQL("SET maintenance_work_mem = {}").format(sql.Literal(settings.vector_index_work_mem)))
+    cur.execute(
+        sql.SQL("CREATE INDEX CONCURRENTLY {} ON {} USING {} (embedding vector_cosine_ops) WITH ({})").format(
+            sql.Identifier(temp),
+            sql.Identifier(table),
+            sql.Identifier(index_plan.method),
+            sql.SQL(index_plan.with_clause()),
+        )
+    )
+    cur.execute(sql.SQL("COMMENT ON INDEX {} IS {}").format(sql.Identifier(temp), sql.Literal(f"rows={rows}")))
+    # The swap is one short transaction, so searches never find the table without an index
+    cur.execute("BEGIN")
+    cur.execute(sql.SQL("DROP INDEX IF EXISTS {}").format(sql.Identifier(name)))
+    cur.execute(sql.SQL("ALTER INDEX {} RENAME TO {}").format(sql.Identifier(temp), sql.Identifier(name)))
+    cur.execute("COMMIT")
+
+
+def maintain_indexes(method: Optional[str] = None, force: bool = False, dry_run: bool = False) -> dict[str, str]:
+    """Build or rebuild the embedding indexes that need it. Returns {table: what was done or why not}.
+
+    Does nothing if another process is already maintaining them.
+    """
+    method = method or settings.vector_index_method
+    conn = psycopg2.connect(settings.database_url)
+    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    result = {}
+    try:
+        with conn.cursor() as cur:
+            cur.execute(_LOCK_SQL)
+            if not cur.fetchone()[0]:
+                logger.info("Vector index maintenance already running elsewhere, skipping")
+                return result
+            try:
+                for table, name in INDEXES.items():
+                    rows = embedded_rows(cur, table)
+                    wanted = plan(rows, method)
+                    if rows < settings.vector_index_min_rows and not force:
+                        result[table] = f"skipped: {rows} embedded rows (< {settings.vector_index_min_rows})"
+                        continue
+                    reason = "forced" if force else rebuild_reason(existing_index(cur, name), wanted, rows)
+                    if reason is None:
+                        result[table] = "up to date"
+                        continue
+                    result[table] = f"{'would build' if dry_run else 'built'} {wanted.method} ({wanted.with_clause()}): {reason}"
+                    if not dry_run:
+                        logger.info(f"Building {name} on {rows} rows: {reason}")
+                        build(cur, table, name, wanted, rows)
+            finally:
+                cur.execute(_UNLOCK_SQL)
+        return result
+    finally:
+        conn.close()
@@ -0,0 +1,93 @@
+"""Writing embeddings to pgvector columns.
+
+Embeddings are held as float32 arrays (array('f'), 4 bytes a value) from the
+API response to the database. copy_embeddings() sends them with COPY ...
+(FORMAT binary) into a temporary staging table, in pgvector's binary
+representation, and moves them into place with one UPDATE ... FROM. This
+keeps decimal formatting and parsing out of the path: a 1536-dimension row
+is about 6 KB on the wire instead of the 30 KB update_embeddings_text()
+sends as JSON text, which is kept for servers where binary COPY of vectors
+is not available (embedding_copy_binary = false).
+"""
+
+import base64
+import io
+import json
+import struct
+import sys
+from array import array
+from typing import Iterable, Sequence, Union
+from uuid import UUID
+
+from psycopg2.extras import execute_values
+
+Vector = Union[array, Sequence[float]]
+
+# Binary COPY header: signature, flags, header extension length
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_COPY_TRAILER = struct.pack("!h", -1)
+# Per row: field count, then the uuid (length, 16 bytes) and the vector's length,
+# dimension count and unused flags; the float4 values follow
+_ROW_PREFIX = struct.Struct("!hi16sihh")
+
+
+def to_float32(embedding: Vector) -> array:
+    """An embedding as a float32 array: from a list of floats, or the API's base64 (little-endian float32)."""
+    if isinstance(embedding, array) and embedding.typecode == "f":
+        return embedding
+    if isinstance(embedding, str):
+        vector = array("f")
+        vector.frombytes(base64.b64decode(embedding))
+        if sys.byteorder == "big":
+            vector.byteswap()
+        return vector
+    return array("f", embedding)
+
+
+def copy_rows(ids: Iterable, vectors: Iterable[Vector]) -> io.BytesIO:
+    """A binary COPY stream of (id uuid, embedding vector) rows."""
+    buffer = io.BytesIO()
+    buffer.write(_COPY_HEADER)
+    for row_id, vector in zip(ids, vectors):
+        values = array("f", to_float32(vector))
+        if sys.byteorder == "little":
+            values.byteswap()  # COPY binary is big-endian
+        uuid = row_id if isinstance(row_id, UUID) else UUID(str(row_id))
+        buffer.write(_ROW_PREFIX.pack(2, 16, uuid.bytes, 4 + 4 * len(values), len(values), 0))
+        buffer.write(values.tobytes())
+    buffer.write(_COPY_TRAILER)
+    buffer.seek(0)
+    return buffer
+
+
+def copy_embeddings(cur, table: str, ids: list, vectors: list[Vector]) -> None:
+    """Write embeddings for rows of `table` with a binary COPY and one UPDATE."""
+    cur.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS staging_embeddings (id UUID, embedding vector) ON COMMIT DELETE ROWS"
+    )
+    cur.copy_expert("COPY staging_embeddings (id, embedding) FROM STDIN (FORMAT binary)", copy_rows(ids, vectors))
+    # table is one of the embedding processor's own table names, never user input
+    cur.execute(
+        f"UPDATE {table} AS t SET embedding = s.embedding FROM staging_embeddings s WHERE t.id = s.id"
+    )
+    # Emptied here too, for callers that write several tables in one transaction
+    cur.execute("TRUNCATE staging_embeddings")
+
+
+def text_rows(ids: Iterable, vectors: Iterable[Vector]) -> list[tuple[str, str]]:
+    """(id, JSON text) rows for update_embeddings_text()."""
+    return [
+        (str(row_id), json.dumps(vector if isinstance(vector, list) else to_float32(vector).tolist()))
+        for row_id, vector in zip(ids, vectors)
+    ]
+
+
+def update_embeddings_text(cur, table: str, ids: list, vectors: list[Vector]) -> None:
+    """Write embeddings for rows of `table` in one UPDATE, sending each as JSON text."""
+    execute_values(
+        cur,
+        f"UPDATE {table} AS t SET embedding = v.embedding::vector FROM (VALUES %s) AS v (id, embedding) "
+        "WHERE t.id = v.id::uuid",
+        text_rows(ids, vectors),
+        page_size=len(ids),
+    )
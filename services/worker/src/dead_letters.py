@@ -0,0 +1,104 @@
+"""Dead-letter store for events that exhausted their retries, plus a CLI to inspect and requeue them.
+
+    python -m src.dead_letters count
+    python -m src.dead_letters list [--limit N]
+    python -m src.dead_letters requeue [--limit N]
+"""
+
+import argparse
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+import redis
+
+from src.codec import get_codec, to_json_text
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def strip_transport_keys(event: dict) -> dict:
+    """Drop keys added in transit (stream ids, raw text) before an event is stored or republished."""
+    return {k: v for k, v in event.items() if not k.startswith("_")}
+
+
+class DeadLetterStore:
+    """Redis list of failed events, oldest first.
+
+    Each entry is JSON: {"event", "error", "attempts", "failed_at"}.
+    """
+
+    def __init__(self, client: Optional[redis.Redis] = None, key: Optional[str] = None):
+        self._redis = client or redis.Redis.from_url(settings.redis_url)
+        self.key = key or settings.dead_letter_key
+
+    def push(self, event: dict, error: str, attempts: int) -> None:
+        entry = {
+            "event": strip_transport_keys(event),
+            "error": error,
+            "attempts": attempts,
+            "failed_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self._redis.rpush(self.key, to_json_text(entry))
+
+    def count(self) -> int:
+        return self._redis.llen(self.key)
+
+    def list(self, limit: int = 20) -> list[dict]:
+        return [json.loads(item) for item in self._redis.lrange(self.key, 0, limit - 1)]
+
+    def requeue(self, channel: Optional[str] = None, limit: Optional[int] = None, chunk: int = 500) -> int:
+        """Republish dead-lettered events to the worker's transport. Returns how many were requeued."""
+        channel = channel or settings.channel
+        codec = get_codec()
+        requeued = 0
+
+        while limit is None or requeued < limit:
+            take = chunk if limit is None else min(chunk, limit - requeued)
+            items = self._redis.lpop(self.key, take)
+            if not items:
+                break
+            pipe = self._redis.pipeline(transaction=False)
+            for item in items:
+                data = codec.encode(json.loads(item)["event"])
+                if settings.transport == "streams":
+                    pipe.xadd(channel, {"data": data})
+                else:
+                    pipe.publish(channel, data)
+            try:
+                pipe.execute()
+            except Exception:
+                # Put the chunk back at the head so nothing is lost
+                self._redis.lpush(self.key, *reversed(items))
+                raise
+            requeued += len(items)
+
+        return requeued
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Inspect and requeue dead-lettered learning events")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("count", help="Number of dead-lettered events")
+    list_cmd = sub.add_parser("list", help="Show the oldest dead-lettered events")
+    list_cmd.add_argument("--limit", type=int, default=20)
+    requeue_cmd = sub.add_parser("requeue", help="Republish dead-lettered events to the worker")
+    requeue_cmd.add_argument("--limit", type=int, default=None)
+    requeue_cmd.add_argument("--channel", default=None)
+    args = parser.parse_args(argv)
+
+    store = DeadLetterStore()
+    if args.command == "count":
+        print(store.count())
+    elif args.command == "list":
+        for entry in store.list(args.limit):
+            print(json.dumps(entry, default=str))
+    elif args.command == "requeue":
+        requeued = store.requeue(channel=args.channel, limit=args.limit)
+        print(f"Requeued {requeued} events")
+
+
+if __name__ == "__main__":
+    main()
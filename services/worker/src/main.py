@@ -1,12 +1,22 @@
 import asyncio
 import logging
 import signal
+from typing import AsyncIterator
 
 from src.config import settings
+from src.consumers.base import Consumer
+from src.consumers.queue import QueueConsumer
+from src.consumers.redis_stream import RedisStreamConsumer
 from src.consumers.redis_sub import RedisConsumer
-from src.db.connection import close_pool
-from src.processors.event_processor import process_event
-from src.processors.embedding_processor import generate_all_embeddings
+from src.db.connection import close_pool, warm_pool
+from src.db.partitions import maintain_partitions
+from src.metrics import EVENTS_RECEIVED, event_type_label, start_http_server
+from src.processors.batch_sink import BatchSink
+from src.processors.catalog import maintain_catalog
+from src.processors.executor import BoundedExecutor
+from src.processors.retry import RetryScheduler
+from src.processors.embedding_processor import maintain_embeddings
+from src.supervisor import Supervisor
 
 logging.basicConfig(
     level=settings.log_level,
@@ -15,32 +25,243 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 shutdown = False
+# Set in shard processes instead of shutdown: the shard drains its queue, then exits
+draining = False
+supervisor = None
 
 
 def handle_signal(sig, frame):
     global shutdown
     logger.info(f"Received signal {sig}, shutting down gracefully...")
     shutdown = True
+    if supervisor is not None:
+        supervisor.forward_signal(sig)
+
+
+def handle_shard_signal(sig, frame):
+    global draining
+    logger.info(f"Received signal {sig}, draining queued events before stopping...")
+    draining = True
+
+
+def build_consumer() -> Consumer:
+    """Create the consumer for the configured transport."""
+    if settings.transport == "streams":
+        return RedisStreamConsumer()
+    if settings.transport != "pubsub":
+        raise ValueError(f"Unknown transport: {settings.transport}")
+    return RedisConsumer()
+
+
+async def receive(consumer: Consumer) -> AsyncIterator[dict]:
+    """The consumer's events, each counted once as received.
+
+    Counted here at intake rather than in the processor, which sees an event
+    again each time a failed batch is replayed or the event is retried.
+    """
+    async for event in consumer.listen():
+        EVENTS_RECEIVED.labels(event_type_label(event)).inc()
+        yield event
+
+
+async def _pump(consumer: Consumer, queue: asyncio.Queue) -> None:
+    """Move events from the consumer into a queue so reads can be awaited with a timeout."""
+    try:
+        async for event in receive(consumer):
+            await queue.put(event)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        await queue.put(None)
+        raise
+    await queue.put(None)
+
+
+def effective_concurrency() -> int:
+    """Configured concurrency, capped so in-flight writes never exhaust the pool."""
+    if settings.worker_processes > 1:
+        # Shards write sequentially so each user's events land in order
+        return 1
+    if settings.concurrency > settings.db_pool_max:
+        logger.warning(
+            f"concurrency={settings.concurrency} exceeds db_pool_max={settings.db_pool_max}, "
+            f"capping to {settings.db_pool_max}"
+        )
+        return settings.db_pool_max
+    return max(1, settings.concurrency)
+
+
+async def _submit_batch(consumer: Consumer, sink: BatchSink, executor: BoundedExecutor) -> None:
+    # Only settled events are acked; the rest are acked by the retry scheduler once settled
+    await executor.submit(sink.write, sink.take(), on_done=consumer.ack)
+
+
+async def run_batched(consumer: Consumer, sink: BatchSink, executor: BoundedExecutor) -> None:
+    """Consume events into the batch sink, flushing on size or linger deadline."""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=sink.max_size * 2)
+    reader = asyncio.create_task(_pump(consumer, queue))
+
+    try:
+        while not shutdown:
+            try:
+                event = await asyncio.wait_for(queue.get(), sink.time_until_due())
+            except asyncio.TimeoutError:
+                await _submit_batch(consumer, sink, executor)
+                continue
+            if event is None:
+                await reader  # re-raise consumer errors
+                break
+            if sink.add(event):
+                await _submit_batch(consumer, sink, executor)
+    finally:
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+        # Events already read off the consumer are flushed, not dropped with the queue
+        while not queue.empty():
+            event = queue.get_nowait()
+            if event is not None and sink.add(event):
+                await _submit_batch(consumer, sink, executor)
+        if len(sink):
+            await _submit_batch(consumer, sink, executor)
+        await executor.drain()
+
+
+async def run_concurrent(consumer: Consumer, executor: BoundedExecutor, retries: RetryScheduler) -> None:
+    """Consume events, processing up to executor.limit of them at once."""
+    try:
+        async for event in receive(consumer):
+            if shutdown:
+                break
+            await executor.submit(
+                retries.process, event, on_done=lambda settled, event=event: consumer.ack([event] if settled else [])
+            )
+    finally:
+        await executor.drain()
+
+
+async def run_single(consumer: Consumer, retries: RetryScheduler) -> None:
+    """Consume events and process them one at a time."""
+    async for event in receive(consumer):
+        if shutdown:
+            break
+        if retries.process(event):
+            await consumer.ack([event])
+
+
+async def consume(consumer: Consumer) -> None:
+    """Process events from a subscribed consumer until it ends or shutdown is requested."""
+    try:
+        await asyncio.to_thread(warm_pool)
+    except Exception as exc:
+        # Connections are opened on demand instead; failed writes go through the retry path
+        logger.warning(f"Could not warm the database pool: {exc}")
+
+    concurrency = effective_concurrency()
+    executor = BoundedExecutor(concurrency)
+    # Failed events are retried beside the main loop instead of inline, and acked once settled
+    retries = RetryScheduler(ack=consumer.ack)
+    retry_task = asyncio.create_task(retries.run(executor))
+    # Each process that writes answers keeps its own copy of the content catalog
+    background = [retry_task]
+    if settings.catalog_refresh_s:
+        background.append(asyncio.create_task(maintain_catalog(settings.catalog_refresh_s)))
+
+    try:
+        if settings.batch_size > 1:
+            logger.info(
+                f"Batching events (size={settings.batch_size}, linger={settings.batch_linger_ms}ms, "
+                f"concurrency={concurrency})"
+            )
+            await run_batched(consumer, BatchSink(on_failure=retries.failed), executor)
+        elif concurrency > 1:
+            logger.info(f"Processing events concurrently (concurrency={concurrency})")
+            await run_concurrent(consumer, executor, retries)
+        else:
+            await run_single(consumer, retries)
+    finally:
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        await executor.drain()
+        await consumer.ack(retries.dead_letter_pending())
+        executor.shutdown()
+
+
+def start_maintenance() -> list[asyncio.Task]:
+    """Start the scheduled database maintenance tasks for this worker."""
+    tasks = []
+    if settings.partition_maintenance_s:
+        tasks.append(asyncio.create_task(maintain_partitions(settings.partition_maintenance_s)))
+    if settings.embedding_backfill_s:
+        tasks.append(asyncio.create_task(maintain_embeddings(settings.embedding_backfill_s)))
+    return tasks
 
 
 async def run():
-    consumer = RedisConsumer()
+    consumer = build_consumer()
     await consumer.subscribe(settings.channel)
 
-    logger.info(f"Worker listening on channel: {settings.channel}")
+    logger.info(f"Worker listening on channel: {settings.channel} (transport={settings.transport})")
 
+    maintenance = start_maintenance()
+    try:
+        await consume(consumer)
+    finally:
+        for task in maintenance:
+            task.cancel()
+        await asyncio.gather(*maintenance, return_exceptions=True)
+        await consumer.close()
+        close_pool()
+        logger.info("Worker stopped")
+
+
+def run_shard(index: int, events, acks) -> None:
+    """Entry point of a shard process started by the supervisor."""
+    # Not handle_signal: setting shutdown would make the consume loops drop the events still queued
+    signal.signal(signal.SIGINT, handle_shard_signal)
+    signal.signal(signal.SIGTERM, handle_shard_signal)
+
+    logger.info(f"Shard {index} starting")
+    if settings.metrics_port:
+        start_http_server(settings.metrics_port + 1 + index)
+    consumer = QueueConsumer(events, acks, should_stop=lambda: draining)
+    try:
+        asyncio.run(consume(consumer))
+    finally:
+        close_pool()
+        logger.info(f"Shard {index} stopped")
+
+
+async def run_supervised():
+    global supervisor
+    consumer = build_consumer()
+    await consumer.subscribe(settings.channel)
+
+    supervisor = Supervisor(settings.worker_processes, target=run_shard)
+    supervisor.start()
+    logger.info(
+        f"Supervisor listening on channel: {settings.channel} "
+        f"(transport={settings.transport}, processes={settings.worker_processes})"
+    )
+
+    background = [
+        asyncio.create_task(supervisor.monitor()),
+        asyncio.create_task(supervisor.pump_acks(consumer)),
+        *start_maintenance(),
+    ]
     try:
         async for event in consumer.listen():
             if shutdown:
                 break
-            try:
-                process_event(event)
-            except Exception:
-                logger.exception(f"Failed to process event: {event.get('event_type', 'unknown')}")
+            await supervisor.dispatch(event)
     finally:
+        for task in background:
+            task.cancel()
+        supervisor.stop()
+        await supervisor.pump_acks(consumer, once=True)
         await consumer.close()
         close_pool()
-        logger.info("Worker stopped")
+        logger.info("Supervisor stopped")
 
 
 def main():
@@ -49,13 +270,13 @@ def main():
 
     logger.info("Worker service starting")
 
-    # Generate embeddings for any content missing them
-    try:
-        generate_all_embeddings()
-    except Exception:
-        logger.exception("Embedding generation failed (continuing without)")
+    if settings.metrics_port:
+        start_http_server(settings.metrics_port)
 
-    asyncio.run(run())
+    if settings.worker_processes > 1:
+        asyncio.run(run_supervised())
+    else:
+        asyncio.run(run())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,265 @@
+"""In-process metrics — counters and histograms served in Prometheus text format.
+
+Label children are created once and cached, so recording a sample is a dict
+lookup plus a locked add. Keep label values low-cardinality: each metric
+folds values beyond MAX_LABEL_VALUES into "other".
+"""
+
+import bisect
+import logging
+import threading
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+MAX_LABEL_VALUES = 50
+OVERFLOW_LABEL = "other"
+
+# Seconds; spans sub-millisecond decodes up to slow DB round-trips
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+
+    @abstractmethod
+    def _new_child(self):
+        """A fresh value holder for one label combination."""
+
+    def labels(self, *values):
+        """Child for the given label values, created on first use."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    if len(self._children) >= MAX_LABEL_VALUES:
+                        values = (OVERFLOW_LABEL,) * len(self.labelnames)
+                        child = self._children.get(values)
+                    if child is None:
+                        child = self._new_child()
+                        self._children[values] = child
+        return child
+
+    def _label_text(self, values: tuple, extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(str(v))}"' for k, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    @abstractmethod
+    def _render_child(self, values: tuple, child) -> list[str]:
+        """Exposition lines for one child."""
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.inc(amount)
+
+    @property
+    def value(self) -> float:
+        return self._default.value
+
+    def _render_child(self, values: tuple, child: _CounterChild) -> list[str]:
+        return [f"{self.name}{self._label_text(values)} {child.value}"]
+
+
+class Gauge(Counter):
+    """A value that can go up and down, or be set outright."""
+
+    kind = "gauge"
+
+    def set(self, value: float) -> None:
+        self._default.value = value
+
+    def dec(self, amount: float = 1) -> None:
+        self._default.inc(-amount)
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def _render_child(self, values: tuple, child: _HistogramChild) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            labels = self._label_text(values, 'le="' + le + '"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(values)} {child.sum}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {child.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labelnames))
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def event_type_label(event: dict) -> str:
+    """event_type as a label value, tolerating malformed events."""
+    event_type = event.get("event_type")
+    return event_type if isinstance(event_type, str) else "unknown"
+
+
+def start_http_server(port: int, registry: Optional[Registry] = None) -> ThreadingHTTPServer:
+    """Serve /metrics on a daemon thread."""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry or REGISTRY})
+    server = ThreadingHTTPServer(("0.0.0.0", port), handler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    logger.info(f"Metrics served on :{server.server_address[1]}/metrics")
+    return server
+
+
+# --- Worker metrics ---
+
+EVENTS_RECEIVED = counter("worker_events_received_total", "Events taken from the transport", ["event_type"])
+EVENTS_FAILED = counter("worker_events_failed_total", "Events that raised while being stored", ["event_type"])
+DECODE_SECONDS = histogram("worker_decode_seconds", "Time to decode a message from the transport")
+VALIDATE_SECONDS = histogram("worker_validate_seconds", "Time to validate an event", ["event_type"])
+EVENTS_REJECTED = counter("worker_events_rejected_total", "Events dropped for failing validation", ["event_type"])
+DB_INSERT_SECONDS = histogram("worker_db_insert_seconds", "Time spent in repository inserts", ["function"])
+DEDUPE_HITS = counter("worker_dedupe_hits_total", "Duplicate events skipped by the seen-id cache")
+DEDUPE_MISSES = counter("worker_dedupe_misses_total", "Events not found in the seen-id cache")
+DEDUPE_CACHE_SIZE = gauge("worker_dedupe_cache_size", "Event ids held in the seen-id cache")
+DUPLICATE_INSERTS = counter("worker_duplicate_inserts_total", "Events already in learning_events when inserted")
+RETRIES_SCHEDULED = counter("worker_retries_scheduled_total", "Failed events scheduled for another try")
+RETRIES_PENDING = gauge("worker_retries_pending", "Failed events waiting for their backoff to expire")
+DEAD_LETTERED = counter("worker_dead_lettered_total", "Events moved to the dead-letter store")
+POOL_WAIT_SECONDS = histogram("worker_pool_wait_seconds", "Time to check out a pooled connection")
+POOL_CHECKOUT_SECONDS = histogram("worker_pool_checkout_seconds", "Time a pooled connection is held before being returned")
+POOL_IN_USE = gauge("worker_pool_connections_in_use", "Pooled connections currently checked out")
+POOL_RECONNECTS = counter("worker_pool_reconnects_total", "Dead pooled connections replaced on checkout")
+PARTITIONS_CREATED = counter("worker_partitions_created_total", "learning_events partitions created ahead of time")
+PARTITIONS_RETIRED = counter("worker_partitions_retired_total", "learning_events partitions rolled up and detached")
+CATALOG_HITS = counter("worker_catalog_hits_total", "Quiz question lookups served from the content catalog")
+CATALOG_MISSES = counter("worker_catalog_misses_total", "Quiz question lookups not in the content catalog")
+CATALOG_QUESTIONS = gauge("worker_catalog_questions", "Quiz questions held in the content catalog")
+CATALOG_REFRESH_SECONDS = histogram(
+    "worker_catalog_refresh_seconds", "Time to load or refresh the content catalog", ["kind"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+ANSWERS_CORRECTED = counter("worker_answers_corrected_total", "Quiz answers whose client is_correct disagreed with the catalog")
+ANSWERS_UNKNOWN = counter(
+    "worker_answers_unknown_total", "Quiz answers stored unchecked for an unknown question, or dropped for a mismatched quiz"
+)
+EMBEDDINGS_STORED = counter("worker_embeddings_stored_total", "Content rows given an embedding", ["table"])
+EMBEDDING_REQUESTS = counter("worker_embedding_requests_total", "Embeddings API requests by outcome", ["outcome"])
+EMBEDDING_CACHE_HITS = counter("worker_embedding_cache_hits_total", "Texts whose embedding was reused instead of requested")
+EMBEDDING_CACHE_MISSES = counter("worker_embedding_cache_misses_total", "Distinct texts sent to the embeddings API")
+EMBEDDING_REQUEST_SECONDS = histogram(
+    "worker_embedding_request_seconds", "Time for one embeddings API request",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
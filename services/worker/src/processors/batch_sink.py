@@ -0,0 +1,90 @@
+"""Batch sink — buffers events and flushes them to Postgres in one transaction."""
+
+import logging
+import time
+from typing import Callable, Optional
+
+from src.config import settings
+from src.metrics import EVENTS_FAILED, event_type_label
+from src.processors.event_processor import process_batch, process_event
+
+logger = logging.getLogger(__name__)
+
+
+class BatchSink:
+    """Collects events and flushes them when max_size is reached or linger_ms elapses.
+
+    The linger clock starts when the first event enters an empty buffer, so an
+    event never waits longer than linger_ms before being written. Events that
+    still fail on their own are passed to on_failure (e.g. a retry scheduler),
+    which returns whether it is done with the event (False while a retry is
+    pending).
+    """
+
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        linger_ms: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+        on_failure: Optional[Callable[[dict, Exception], bool]] = None,
+    ):
+        self.max_size = max_size or settings.batch_size
+        self.linger = (linger_ms if linger_ms is not None else settings.batch_linger_ms) / 1000
+        self._clock = clock
+        self._on_failure = on_failure
+        self._buffer: list[dict] = []
+        self._first_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def add(self, event: dict) -> bool:
+        """Buffer an event. Returns True when the batch is full and should be flushed."""
+        if not self._buffer:
+            self._first_at = self._clock()
+        self._buffer.append(event)
+        return len(self._buffer) >= self.max_size
+
+    def time_until_due(self) -> Optional[float]:
+        """Seconds until the linger deadline, or None if the buffer is empty."""
+        if not self._buffer:
+            return None
+        return max(0.0, self._first_at + self.linger - self._clock())
+
+    def take(self) -> list[dict]:
+        """Remove and return everything buffered, resetting the linger clock."""
+        batch, self._buffer, self._first_at = self._buffer, [], None
+        return batch
+
+    def write(self, batch: list[dict]) -> list[dict]:
+        """Write a batch of events. Returns the events that are settled and can be acked.
+
+        If the batch transaction fails, events are replayed one by one so a single
+        bad row doesn't take the rest of the batch down with it. Events left
+        waiting for a retry are not returned; they are acked once the retry
+        settles them.
+        """
+        if not batch:
+            return []
+
+        try:
+            process_batch(batch)
+        except Exception:
+            logger.exception(f"Batch insert of {len(batch)} events failed, retrying individually")
+            settled = []
+            for event in batch:
+                try:
+                    process_event(event)
+                except Exception as exc:
+                    if self._on_failure is None:
+                        EVENTS_FAILED.labels(event_type_label(event)).inc()
+                        logger.exception(f"Failed to process event: {event.get('event_type', 'unknown')}")
+                    elif not self._on_failure(event, exc):
+                        continue
+                settled.append(event)
+            return settled
+        return batch
+
+    def flush(self) -> int:
+        """Write all buffered events synchronously. Returns how many were settled."""
+        return len(self.write(self.take()))
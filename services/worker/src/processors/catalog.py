@@ -0,0 +1,311 @@
+"""Content catalog — an in-memory copy of quiz_questions and quizzes for enriching answers.
+
+Loaded in bulk at startup, then refreshed from the updated_at watermark every
+catalog_refresh_s seconds, with a full reload every catalog_full_reload_s.
+Lookups of known questions never touch the database. A question the catalog
+has not seen yet is fetched once and added.
+
+Questions are held in id order as parallel typed arrays (the 128-bit id split
+into two uint64 columns, plus quiz row, sort order and an index into a table
+of distinct answers), about 30 bytes per question. Questions added between
+full reloads go to a small overlay dict.
+"""
+
+import asyncio
+import bisect
+import logging
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+from uuid import UUID
+
+from src.config import settings
+from src.db import prepared
+from src.db.connection import get_connection, release_connection
+from src.metrics import CATALOG_HITS, CATALOG_MISSES, CATALOG_QUESTIONS, CATALOG_REFRESH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES = ("easy", "medium", "hard")
+_LOW_BITS = (1 << 64) - 1
+# Rows changed up to this long before the watermark are re-read, in case their
+# transaction committed after the previous refresh read past them
+_WATERMARK_OVERLAP = timedelta(minutes=5)
+# Unknown question ids remembered so bad input does not hit the database each time
+_MAX_MISSING = 10000
+
+FETCH_QUESTION = prepared.register(
+    "catalog_question",
+    """
+    SELECT qq.id, qq.quiz_id, qq.correct_answer, qq.sort_order, q.subject_id, q.difficulty
+    FROM quiz_questions qq
+    JOIN quizzes q ON q.id = qq.quiz_id
+    WHERE qq.id = %s::uuid
+    """,
+    ("uuid",),
+)
+
+
+@dataclass(frozen=True)
+class QuestionInfo:
+    quiz_id: UUID
+    correct_answer: str
+    sort_order: int
+    subject_id: Optional[int]
+    difficulty: Optional[str]
+
+
+def _key(value) -> Optional[int]:
+    """128-bit integer form of a UUID (or UUID string), or None if it is not one."""
+    if isinstance(value, UUID):
+        return value.int
+    try:
+        return UUID(str(value)).int
+    except ValueError:
+        return None
+
+
+class _Tables:
+    """The catalog's data. Not thread-safe; ContentCatalog guards it with a lock."""
+
+    def __init__(self):
+        # Quizzes: row index by id, and per-row subject and difficulty (-1 for NULL)
+        self.quiz_rows: dict[int, int] = {}
+        self.quiz_keys: list[int] = []
+        self.quiz_subject = array("i")
+        self.quiz_difficulty = array("b")
+        # Questions sorted by id, plus an overlay of ones added since the bulk load
+        self.q_hi = array("Q")
+        self.q_lo = array("Q")
+        self.q_quiz = array("i")
+        self.q_sort = array("i")
+        self.q_answer = array("i")
+        self.overlay: dict[int, tuple[int, int, int]] = {}
+        # Distinct correct answers ("True", "False", ...) stored once
+        self.answers: list[str] = []
+        self.answer_rows: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.q_hi) + len(self.overlay)
+
+    def find(self, key: int) -> int:
+        hi, lo = key >> 64, key & _LOW_BITS
+        i = bisect.bisect_left(self.q_hi, hi)
+        while i < len(self.q_hi) and self.q_hi[i] == hi:
+            if self.q_lo[i] == lo:
+                return i
+            i += 1
+        return -1
+
+    def get(self, key: int) -> Optional[QuestionInfo]:
+        row = self.overlay.get(key)
+        if row is None:
+            i = self.find(key)
+            if i < 0:
+                return None
+            row = (self.q_quiz[i], self.q_sort[i], self.q_answer[i])
+        quiz_row, sort_order, answer = row
+        subject = self.quiz_subject[quiz_row]
+        difficulty = self.quiz_difficulty[quiz_row]
+        return QuestionInfo(
+            quiz_id=UUID(int=self.quiz_keys[quiz_row]),
+            correct_answer=self.answers[answer],
+            sort_order=sort_order,
+            subject_id=subject if subject >= 0 else None,
+            difficulty=DIFFICULTIES[difficulty] if difficulty >= 0 else None,
+        )
+
+    def answer_row(self, answer: str) -> int:
+        row = self.answer_rows.get(answer)
+        if row is None:
+            row = self.answer_rows[answer] = len(self.answers)
+            self.answers.append(answer)
+        return row
+
+    def put_quiz(self, quiz_id, subject_id, difficulty) -> None:
+        key = _key(quiz_id)
+        subject = subject_id if subject_id is not None else -1
+        level = DIFFICULTIES.index(difficulty) if difficulty in DIFFICULTIES else -1
+        row = self.quiz_rows.get(key)
+        if row is None:
+            self.quiz_rows[key] = len(self.quiz_keys)
+            self.quiz_keys.append(key)
+            self.quiz_subject.append(subject)
+            self.quiz_difficulty.append(level)
+        else:
+            self.quiz_subject[row] = subject
+            self.quiz_difficulty[row] = level
+
+    def append_question(self, question_id, quiz_id, correct_answer, sort_order) -> None:
+        """Add a question during a bulk load, which must arrive in id order."""
+        quiz_row = self.quiz_rows.get(_key(quiz_id))
+        if quiz_row is None:
+            return
+        key = _key(question_id)
+        self.q_hi.append(key >> 64)
+        self.q_lo.append(key & _LOW_BITS)
+        self.q_quiz.append(quiz_row)
+        self.q_sort.append(sort_order or 0)
+        self.q_answer.append(self.answer_row(correct_answer))
+
+    def put_question(self, question_id, quiz_id, correct_answer, sort_order) -> None:
+        """Add or update a question after the bulk load."""
+        quiz_row = self.quiz_rows.get(_key(quiz_id))
+        if quiz_row is None:
+            return
+        key = _key(question_id)
+        row = (quiz_row, sort_order or 0, self.answer_row(correct_answer))
+        i = self.find(key)
+        if i >= 0:
+            self.q_quiz[i], self.q_sort[i], self.q_answer[i] = row
+        else:
+            self.overlay[key] = row
+
+
+class ContentCatalog:
+    def __init__(self, overlay_limit: int = 50000):
+        self.overlay_limit = overlay_limit
+        self.loaded = False
+        self._tables = _Tables()
+        self._lock = threading.Lock()
+        self._watermark: Optional[datetime] = None
+        self._last_full = 0.0
+        self._missing: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+    def get(self, question_id) -> Optional[QuestionInfo]:
+        """Cached details for a question, or None if it is not in memory."""
+        key = _key(question_id)
+        if key is None:
+            return None
+        with self._lock:
+            return self._tables.get(key)
+
+    def resolve(self, question_id) -> Optional[QuestionInfo]:
+        """Details for a question, fetching it from the database on a miss.
+
+        Before the first load this only consults memory, so the worker runs
+        (without enrichment) when the catalog is disabled or failed to load.
+        """
+        info = self.get(question_id)
+        if info is not None:
+            CATALOG_HITS.inc()
+            return info
+        CATALOG_MISSES.inc()
+        key = _key(question_id)
+        if not self.loaded or key is None or key in self._missing:
+            return None
+        self._fetch_question(key)
+        info = self.get(question_id)
+        if info is None:
+            with self._lock:
+                if len(self._missing) >= _MAX_MISSING:
+                    self._missing.clear()
+                self._missing.add(key)
+        return info
+
+    def _fetch_question(self, key: int) -> None:
+        conn = get_connection()
+        try:
+            with conn.cursor() as cur:
+                prepared.execute(cur, FETCH_QUESTION, (str(UUID(int=key)),))
+                row = cur.fetchone()
+            conn.commit()
+        finally:
+            release_connection(conn)
+        if row is not None:
+            question_id, quiz_id, correct_answer, sort_order, subject_id, difficulty = row
+            with self._lock:
+                self._tables.put_quiz(quiz_id, subject_id, difficulty)
+                self._tables.put_question(question_id, quiz_id, correct_answer, sort_order)
+
+    def load(self) -> None:
+        """Replace the catalog with a fresh bulk load of every quiz and question."""
+        start = time.perf_counter()
+        conn = get_connection()
+        try:
+            with conn.cursor() as cur, conn.cursor(name="catalog_questions") as questions:
+                cur.execute(
+                    "SELECT GREATEST((SELECT MAX(updated_at) FROM quizzes), (SELECT MAX(updated_at) FROM quiz_questions))"
+                )
+                watermark = cur.fetchone()[0]
+                cur.execute("SELECT id, subject_id, difficulty FROM quizzes")
+                # Stream questions in id order straight into the sorted arrays
+                questions.itersize = 20000
+                questions.execute("SELECT id, quiz_id, correct_answer, sort_order FROM quiz_questions ORDER BY id")
+                self.replace(cur, questions, watermark)
+            conn.commit()
+        finally:
+            release_connection(conn)
+
+        elapsed = time.perf_counter() - start
+        CATALOG_REFRESH_SECONDS.labels("full").observe(elapsed)
+        logger.info(f"Content catalog loaded: {len(self)} questions, {len(self._tables.quiz_keys)} quizzes in {elapsed:.2f}s")
+
+    def replace(self, quizzes: Iterable[tuple], questions: Iterable[tuple], watermark: Optional[datetime] = None) -> None:
+        """Swap in a catalog built from (id, subject_id, difficulty) quiz rows and
+        (id, quiz_id, correct_answer, sort_order) question rows, the latter in id order."""
+        tables = _Tables()
+        for quiz_id, subject_id, difficulty in quizzes:
+            tables.put_quiz(quiz_id, subject_id, difficulty)
+        for question_id, quiz_id, correct_answer, sort_order in questions:
+            tables.append_question(question_id, quiz_id, correct_answer, sort_order)
+        with self._lock:
+            self._tables = tables
+            self._missing = set()
+            self._watermark = watermark
+            self._last_full = time.monotonic()
+            self.loaded = True
+        CATALOG_QUESTIONS.set(len(tables))
+
+    def refresh(self) -> None:
+        """Apply quizzes and questions changed since the last load, or reload fully when due."""
+        due = time.monotonic() - self._last_full >= settings.catalog_full_reload_s
+        if not self.loaded or self._watermark is None or due or len(self._tables.overlay) > self.overlay_limit:
+            self.load()
+            return
+
+        start = time.perf_counter()
+        since = self._watermark - _WATERMARK_OVERLAP
+        conn = get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT id, subject_id, difficulty, updated_at FROM quizzes WHERE updated_at > %s", (since,))
+                quizzes = cur.fetchall()
+                cur.execute(
+                    "SELECT id, quiz_id, correct_answer, sort_order, updated_at FROM quiz_questions WHERE updated_at > %s",
+                    (since,),
+                )
+                questions = cur.fetchall()
+            conn.commit()
+        finally:
+            release_connection(conn)
+
+        with self._lock:
+            for quiz_id, subject_id, difficulty, updated_at in quizzes:
+                self._tables.put_quiz(quiz_id, subject_id, difficulty)
+                self._watermark = max(self._watermark, updated_at)
+            for question_id, quiz_id, correct_answer, sort_order, updated_at in questions:
+                self._tables.put_question(question_id, quiz_id, correct_answer, sort_order)
+                self._missing.discard(_key(question_id))
+                self._watermark = max(self._watermark, updated_at)
+        CATALOG_REFRESH_SECONDS.labels("incremental").observe(time.perf_counter() - start)
+        CATALOG_QUESTIONS.set(len(self))
+
+
+catalog = ContentCatalog()
+
+
+async def maintain_catalog(every: float) -> None:
+    """Load the catalog, then refresh it every `every` seconds. Runs until cancelled."""
+    while True:
+        try:
+            await asyncio.to_thread(catalog.refresh)
+        except Exception:
+            logger.exception("Content catalog refresh failed")
+        await asyncio.sleep(every)
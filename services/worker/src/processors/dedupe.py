@@ -0,0 +1,54 @@
+"""Dedupe — remembers recently stored event ids so replays skip the database."""
+
+import threading
+from collections import OrderedDict
+
+from src.config import settings
+from src.metrics import DEDUPE_CACHE_SIZE, DEDUPE_HITS, DEDUPE_MISSES
+
+
+class SeenCache:
+    """Bounded LRU set of event ids.
+
+    Ids are added only after their event is committed, so a failed insert can
+    still be retried. Two copies racing through at once both miss here; the
+    ON CONFLICT DO NOTHING insert is the backstop for that case.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._ids: OrderedDict[str, None] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, event_id: str) -> bool:
+        if not self.max_size:
+            return False
+        with self._lock:
+            if event_id in self._ids:
+                self._ids.move_to_end(event_id)
+                hit = True
+            else:
+                hit = False
+        (DEDUPE_HITS if hit else DEDUPE_MISSES).inc()
+        return hit
+
+    def add(self, event_id: str) -> None:
+        if not self.max_size:
+            return
+        with self._lock:
+            self._ids[event_id] = None
+            self._ids.move_to_end(event_id)
+            while len(self._ids) > self.max_size:
+                self._ids.popitem(last=False)
+            DEDUPE_CACHE_SIZE.set(len(self._ids))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids.clear()
+            DEDUPE_CACHE_SIZE.set(0)
+
+
+seen_events = SeenCache(settings.dedupe_cache_size)
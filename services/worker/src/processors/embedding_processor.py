@@ -1,112 +1,657 @@
-"""Embedding processor — generates vector embeddings for lessons and questions."""
+"""Embedding processor — generates vector embeddings for lessons and questions.
 
-import json
+The worker runs maintain_embeddings() in the background: it pages through
+rows with no embedding (keyset pagination on id) until none are left, then
+sleeps until Postgres signals new content on the content_changed channel
+(LISTEN/NOTIFY) or embedding_backfill_s passes, whichever is first.
+Replicas coordinate with an advisory lock so only one of them backfills at
+a time.
+
+Rows missing an embedding are packed into batches of at most
+embedding_batch_size texts and embedding_batch_tokens (estimated) tokens.
+Each batch is one embeddings API call and one write; embeddings stay float32
+arrays from the response to the binary COPY that stores them (src.db.vectors).
+A batch the API or the database rejects is split in half and retried, down
+to single rows, so one bad row only costs itself.
+
+Batches are sent embedding_concurrency at a time through one shared
+AsyncOpenAI client, paced by a requests-per-minute and tokens-per-minute
+token bucket. A 429 or 5xx response pauses every request for the
+Retry-After the API sent (exponential backoff when it sent none). Progress
+and throughput are logged every embedding_progress_s seconds.
+
+Texts are looked up in the embedding cache (src.db.embedding_cache) first,
+and identical texts within a batch are sent once, so duplicate content costs
+no API calls. Cache hits and misses are reported with each run's progress.
+
+A row rejected on its own is recorded in embedding_failures and skipped by
+later passes until its backoff expires (src.db.embedding_failures).
+
+The backfill takes its database connections from a pool of its own, so a
+pass never holds connections the event writes are sized to.
+"""
+
+import asyncio
 import logging
-from typing import Optional
+import random
+import time
+import uuid
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Iterable, Iterator, Optional
 
-from openai import OpenAI
-from tenacity import retry, stop_after_attempt, wait_exponential
+from openai import APIConnectionError, APITimeoutError, AsyncOpenAI, InternalServerError, RateLimitError
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 
 from src.config import settings
-from src.db.connection import get_connection, release_connection
+from src.db import embedding_cache, embedding_failures, vector_index, vectors
+from src.db.connection import ConnectionPool, create_pool
+from src.metrics import (
+    EMBEDDING_CACHE_HITS,
+    EMBEDDING_CACHE_MISSES,
+    EMBEDDING_REQUEST_SECONDS,
+    EMBEDDING_REQUESTS,
+    EMBEDDINGS_STORED,
+)
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional, exact token counts
+    tiktoken = None
 
 logger = logging.getLogger(__name__)
 
 MODEL = "text-embedding-3-small"
+# Characters per token when tiktoken is not installed; errs towards overestimating
+_CHARS_PER_TOKEN = 3
+# Errors worth retrying after a pause; anything else fails the batch at once
+_TRANSIENT = (RateLimitError, InternalServerError, APIConnectionError, APITimeoutError)
+
+# Postgres NOTIFY channel the content tables' insert triggers signal (see init-db.sql)
+CONTENT_CHANNEL = "content_changed"
 
+# Session-level, as a pass spans many transactions on other connections
+_LOCK_SQL = "SELECT pg_try_advisory_lock(hashtext('embedding backfill'))"
+_UNLOCK_SQL = "SELECT pg_advisory_unlock(hashtext('embedding backfill'))"
 
-def get_client() -> Optional[OpenAI]:
+_encoding = None
+_pool: Optional[ConnectionPool] = None
+
+Batch = list[tuple[tuple, str]]
+
+
+def get_client() -> Optional[AsyncOpenAI]:
+    """A client for one embedding run, shared by all its requests. Retries are left to the pipeline."""
     if not settings.openai_api_key:
         logger.warning("OPENAI_API_KEY not set, skipping embeddings")
         return None
-    return OpenAI(api_key=settings.openai_api_key)
+    return AsyncOpenAI(api_key=settings.openai_api_key, base_url=settings.openai_base_url or None, max_retries=0)
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-def generate_embedding(client: OpenAI, text: str) -> list[float]:
-    """Generate embedding vector for a text string."""
-    response = client.embeddings.create(input=text, model=MODEL)
-    return response.data[0].embedding
+def count_tokens(text: str) -> int:
+    """Tokens in text for the embedding model: exact with tiktoken, otherwise an upper estimate."""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.encoding_for_model(MODEL)
+        return len(_encoding.encode(text))
+    return len(text) // _CHARS_PER_TOKEN + 1
 
 
-def process_lessons():
-    """Generate embeddings for lessons that don't have them yet."""
-    client = get_client()
-    if not client:
-        return
+def pack_batches(
+    rows: Iterable[tuple], text_of: Callable[[tuple], str], max_items: int, max_tokens: int
+) -> Iterator[Batch]:
+    """Group rows into (row, text) batches within the item and token limits.
+
+    A single text over max_tokens still gets a batch of its own; the API
+    reports it and it is skipped.
+    """
+    batch: Batch = []
+    tokens = 0
+    for row in rows:
+        text = text_of(row)
+        n = count_tokens(text)
+        if batch and (len(batch) >= max_items or tokens + n > max_tokens):
+            yield batch
+            batch, tokens = [], 0
+        batch.append((row, text))
+        tokens += n
+    if batch:
+        yield batch
+
 
-    conn = get_connection()
+class TokenBucket:
+    """Holds up to a minute's worth of `per_minute` units, refilling continuously."""
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = per_minute
+        self.level = per_minute
+        self._rate = per_minute / 60
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available. Amounts over capacity wait for a full bucket."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self._rate)
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Paces requests to embedding_rpm requests and embedding_tpm tokens per minute.
+
+    Callers are served in arrival order. pause() holds everyone back, for
+    when the API says to slow down.
+    """
+
+    def __init__(
+        self,
+        rpm: float,
+        tpm: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], object] = asyncio.sleep,
+    ):
+        self.requests = TokenBucket(rpm, clock)
+        self.tokens = TokenBucket(tpm, clock)
+        self._clock = clock
+        self._sleep = sleep
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int) -> None:
+        async with self._lock:
+            while True:
+                wait = max(
+                    self._paused_until - self._clock(),
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(tokens),
+                )
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    return
+                await self._sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+def retry_after(exc: Exception) -> Optional[float]:
+    """Seconds the API asked us to wait (retry-after-ms or Retry-After), if it said."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt: int) -> float:
+    """Fallback delay before retry number `attempt` when the API gave no Retry-After."""
+    return min(60.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def _connect():
+    """A connection from the backfill's pool: the lock holder plus one per batch in flight."""
+    global _pool
+    if _pool is None:
+        _pool = create_pool(0, settings.embedding_concurrency + 1)
+    return _pool.getconn()
+
+
+def _release(conn) -> None:
+    _pool.putconn(conn)
+
+
+def close_backfill_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.closeall()
+        _pool = None
+
+
+def store_embeddings(cur, table: str, ids: list, embeddings: list[vectors.Vector]) -> None:
+    """Write embeddings for rows of `table`: binary COPY and one UPDATE, or one UPDATE of JSON text."""
+    if settings.embedding_copy_binary:
+        vectors.copy_embeddings(cur, table, ids, embeddings)
+    else:
+        vectors.update_embeddings_text(cur, table, ids, embeddings)
+
+
+def _store(table: str, ids: list, embeddings: list[vectors.Vector], new: Optional[dict] = None) -> None:
+    """Write embeddings for rows of `table`, and cache the `new` ones by text hash, in one transaction."""
+    conn = _connect()
     try:
         with conn.cursor() as cur:
-            cur.execute(
-                "SELECT id, title, content FROM lessons WHERE embedding IS NULL LIMIT 50"
+            store_embeddings(cur, table, ids, embeddings)
+            embedding_failures.clear(cur, table, ids)
+            if new:
+                embedding_cache.store(cur, MODEL, new)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        _release(conn)
+
+
+def _record_failure(table: str, row_id, error: str) -> None:
+    conn = _connect()
+    try:
+        with conn.cursor() as cur:
+            embedding_failures.record(
+                cur, table, row_id, error, settings.embedding_failure_backoff_s, settings.embedding_failure_backoff_max_s
             )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        _release(conn)
+
+
+def _cached(keys: list[bytes]) -> dict[bytes, list[float]]:
+    conn = _connect()
+    try:
+        with conn.cursor() as cur:
+            found = embedding_cache.lookup(cur, MODEL, keys)
+        conn.commit()
+        return found
+    finally:
+        _release(conn)
+
+
+def _prune_cache() -> int:
+    conn = _connect()
+    try:
+        with conn.cursor() as cur:
+            removed = embedding_cache.prune(cur, settings.embedding_cache_max_rows)
+        conn.commit()
+        return removed
+    finally:
+        _release(conn)
+
+
+def _fetch_page(select_sql: str, after: uuid.UUID) -> list[tuple]:
+    conn = _connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(select_sql, (str(after), settings.embedding_page_size))
             rows = cur.fetchall()
+        conn.commit()
+        return rows
+    finally:
+        _release(conn)
 
-            if not rows:
-                logger.info("No lessons need embeddings")
-                return
 
-            logger.info(f"Generating embeddings for {len(rows)} lessons")
+@dataclass
+class Progress:
+    table: str
+    total: int
+    stored: int = 0
+    failed: int = 0
+    requests: int = 0
+    rate_limited: int = 0
+    tokens: int = 0
+    # Rows whose embedding came from the cache or an identical text in the same
+    # batch, and distinct texts that had to be sent to the API
+    cache_hits: int = 0
+    cache_misses: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    def summary(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return (
+            f"{self.table}: {self.stored}/{self.total} embedded, {self.failed} failed, "
+            f"{self.requests} requests ({self.rate_limited} rate limited), "
+            f"cache {self.cache_hits} hits / {self.cache_misses} misses, "
+            f"{self.stored / elapsed:.1f} rows/s, {self.tokens / elapsed * 60:,.0f} tokens/min"
+        )
+
+
+class EmbeddingPipeline:
+    """Embeds batches concurrently through one client under a shared rate limit."""
+
+    def __init__(
+        self, client: AsyncOpenAI, limiter: RateLimiter, concurrency: int, max_attempts: int, cache: bool = True
+    ):
+        self.client = client
+        self.limiter = limiter
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.cache = cache
 
-            for lesson_id, title, content in rows:
-                text = f"{title}\n\n{content[:2000]}"
+    async def request(self, texts: list[str], progress: Progress) -> list[array]:
+        """One embeddings call, waiting out rate limits and retrying transient errors."""
+        tokens = sum(count_tokens(text) for text in texts)
+        for attempt in range(1, self.max_attempts + 1):
+            await self.limiter.acquire(tokens)
+            progress.requests += 1
+            start = time.perf_counter()
+            try:
+                # Base64 float32 decodes straight into arrays, without a list of Python floats
+                response = await self.client.embeddings.create(input=texts, model=MODEL, encoding_format="base64")
+            except _TRANSIENT as exc:
+                limited = isinstance(exc, RateLimitError)
+                EMBEDDING_REQUESTS.labels("rate_limited" if limited else "error").inc()
+                progress.rate_limited += limited
+                if attempt == self.max_attempts:
+                    raise
+                delay = retry_after(exc)
+                delay = backoff(attempt) if delay is None else delay
+                # Every request waits, not just this one: the limit is per account
+                self.limiter.pause(delay)
+                logger.warning(f"Embeddings request failed ({type(exc).__name__}), retrying in {delay:.1f}s")
+                continue
+            finally:
+                EMBEDDING_REQUEST_SECONDS.observe(time.perf_counter() - start)
+            EMBEDDING_REQUESTS.labels("ok").inc()
+            progress.tokens += tokens
+            if len(response.data) != len(texts):
+                raise ValueError(f"Expected {len(texts)} embeddings, got {len(response.data)}")
+            return [vectors.to_float32(item.embedding) for item in sorted(response.data, key=lambda item: item.index)]
+        raise AssertionError("unreachable")
+
+    async def embed_batch(self, table: str, batch: Batch, progress: Progress) -> None:
+        """Embed and store a batch. Rejected batches are split; persistent API errors fail the batch."""
+        keys = [embedding_cache.text_hash(text) for _, text in batch]
+        try:
+            found = await asyncio.to_thread(_cached, keys) if self.cache else {}
+            # Each distinct text not in the cache is sent once
+            missing = {}
+            for key, (_, text) in zip(keys, batch):
+                if key not in found:
+                    missing.setdefault(key, text)
+            new = dict(zip(missing, await self.request(list(missing.values()), progress))) if missing else {}
+            embeddings = [found[key] if key in found else new[key] for key in keys]
+            await asyncio.to_thread(
+                _store, table, [row[0] for row, _ in batch], embeddings, new if self.cache else None
+            )
+        except _TRANSIENT as exc:
+            progress.failed += len(batch)
+            logger.error(f"Gave up on {len(batch)} {table} rows after {self.max_attempts} attempts: {exc}")
+            return
+        except Exception as exc:
+            if len(batch) == 1:
+                row, text = batch[0]
+                progress.failed += 1
+                logger.error(f"Failed to embed {table} row {row[0]} ({text[:50]!r}): {exc}")
                 try:
-                    embedding = generate_embedding(client, text)
-                    cur.execute(
-                        "UPDATE lessons SET embedding = %s WHERE id = %s",
-                        (json.dumps(embedding), lesson_id),
-                    )
-                    conn.commit()
-                    logger.info(f"Embedded lesson: {title}")
+                    await asyncio.to_thread(_record_failure, table, row[0], str(exc))
                 except Exception:
-                    conn.rollback()
-                    logger.exception(f"Failed to embed lesson: {title}")
+                    logger.exception(f"Could not record the failure of {table} row {row[0]}")
+                return
+            logger.warning(f"Embedding batch of {len(batch)} {table} rows failed ({exc}), splitting")
+            middle = len(batch) // 2
+            await self.embed_batch(table, batch[:middle], progress)
+            await self.embed_batch(table, batch[middle:], progress)
+            return
+        progress.stored += len(batch)
+        progress.cache_hits += len(batch) - len(new)
+        progress.cache_misses += len(new)
+        EMBEDDINGS_STORED.labels(table).inc(len(batch))
+        if self.cache:
+            EMBEDDING_CACHE_HITS.inc(len(batch) - len(new))
+            EMBEDDING_CACHE_MISSES.inc(len(new))
+
+    async def run(
+        self, table: str, rows: list[tuple], text_of: Callable[[tuple], str], progress: Optional[Progress] = None
+    ) -> Progress:
+        """Embed `rows` of `table`, logging progress as it goes. Counts are added to `progress` when given."""
+        progress = progress or Progress(table, len(rows))
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def embed(batch: Batch) -> None:
+            async with slots:
+                await self.embed_batch(table, batch, progress)
+
+        async def report() -> None:
+            while True:
+                await asyncio.sleep(settings.embedding_progress_s)
+                logger.info(progress.summary())
+
+        reporter = asyncio.create_task(report())
+        try:
+            batches = pack_batches(rows, text_of, settings.embedding_batch_size, settings.embedding_batch_tokens)
+            await asyncio.gather(*(embed(batch) for batch in batches))
+        finally:
+            reporter.cancel()
+        return progress
+
+
+async def _process(pipeline: EmbeddingPipeline, table: str, select_sql: str, text_of) -> Progress:
+    """Embed every row the select finds, a page at a time, in id order.
+
+    Rows that fail keep a NULL embedding and are skipped for the rest of the
+    pass. Rows rejected on their own are skipped by later passes too, until
+    their backoff in embedding_failures expires; the rest are tried again on
+    the next pass.
+    """
+    progress = Progress(table, 0)
+    after = uuid.UUID(int=0)
+    while rows := await asyncio.to_thread(_fetch_page, select_sql, after):
+        progress.total += len(rows)
+        await pipeline.run(table, rows, text_of, progress)
+        after = rows[-1][0]
+    if progress.total:
+        logger.info(progress.summary())
+    return progress
+
+
+async def process_lessons(pipeline: EmbeddingPipeline) -> Progress:
+    """Generate embeddings for lessons that don't have them."""
+    return await _process(
+        pipeline,
+        "lessons",
+        "SELECT id, title, content FROM lessons WHERE embedding IS NULL AND id > %s "
+        f"AND {embedding_failures.skip_clause('lessons')} ORDER BY id LIMIT %s",
+        lambda row: f"{row[1]}\n\n{row[2][:2000]}",
+    )
+
+
+async def process_questions(pipeline: EmbeddingPipeline) -> Progress:
+    """Generate embeddings for quiz questions that don't have them."""
+    return await _process(
+        pipeline,
+        "quiz_questions",
+        "SELECT id, question_text FROM quiz_questions WHERE embedding IS NULL AND id > %s "
+        f"AND {embedding_failures.skip_clause('quiz_questions')} ORDER BY id LIMIT %s",
+        lambda row: row[1],
+    )
+
+
+def build_pipeline(client: AsyncOpenAI) -> EmbeddingPipeline:
+    limiter = RateLimiter(settings.embedding_rpm, settings.embedding_tpm)
+    return EmbeddingPipeline(
+        client, limiter, settings.embedding_concurrency, settings.embedding_max_attempts,
+        cache=settings.embedding_cache_enabled,
+    )
+
+
+async def backfill(pipeline: EmbeddingPipeline) -> list[Progress]:
+    """Embed all lessons, then all questions, that are missing embeddings."""
+    results = [await process_lessons(pipeline), await process_questions(pipeline)]
+    if settings.embedding_cache_enabled:
+        removed = await asyncio.to_thread(_prune_cache)
+        if removed:
+            logger.info(f"Pruned {removed} least recently used embedding cache entries")
+    return results
+
+
+def _try_lock():
+    """A connection from the backfill's pool holding the backfill lock, or None when another replica holds it."""
+    conn = _connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(_LOCK_SQL)
+            locked = cur.fetchone()[0]
+        conn.commit()
+    except Exception:
+        _release(conn)
+        raise
+    if not locked:
+        _release(conn)
+        return None
+    return conn
+
 
+def _unlock(conn) -> None:
+    try:
+        with conn.cursor() as cur:
+            cur.execute(_UNLOCK_SQL)
+        conn.commit()
+    finally:
+        _release(conn)
+
+
+async def locked_backfill(pipeline: EmbeddingPipeline) -> Optional[list[Progress]]:
+    """Run backfill() unless another replica is already running one (then returns None).
+
+    A pass that stored embeddings is followed by a check of the tables' ANN indexes.
+    """
+    conn = await asyncio.to_thread(_try_lock)
+    if conn is None:
+        logger.debug("Embedding backfill is running elsewhere, skipping")
+        return None
+    try:
+        results = await backfill(pipeline)
     finally:
-        release_connection(conn)
+        await asyncio.to_thread(_unlock, conn)
+    if settings.vector_index_after_backfill and any(progress.stored for progress in results):
+        for table, outcome in (await asyncio.to_thread(vector_index.maintain_indexes)).items():
+            logger.info(f"Vector index on {table}: {outcome}")
+    return results
 
 
-def process_questions():
-    """Generate embeddings for quiz questions that don't have them yet."""
+async def embed_all() -> list[Progress]:
+    """Run one backfill through a client of its own."""
     client = get_client()
     if not client:
-        return
-
-    conn = get_connection()
+        return []
     try:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT id, question_text FROM quiz_questions WHERE embedding IS NULL LIMIT 100"
-            )
-            rows = cur.fetchall()
+        return await backfill(build_pipeline(client))
+    finally:
+        await client.close()
+        close_backfill_pool()
 
-            if not rows:
-                logger.info("No questions need embeddings")
-                return
 
-            logger.info(f"Generating embeddings for {len(rows)} questions")
+class ContentListener:
+    """LISTENs for new content on a dedicated connection and wakes wait() when it arrives.
 
-            for question_id, question_text in rows:
-                try:
-                    embedding = generate_embedding(client, question_text)
-                    cur.execute(
-                        "UPDATE quiz_questions SET embedding = %s WHERE id = %s",
-                        (json.dumps(embedding), question_id),
-                    )
-                    conn.commit()
-                    logger.debug(f"Embedded question: {question_text[:50]}")
-                except Exception:
-                    conn.rollback()
-                    logger.exception(f"Failed to embed question: {question_text[:50]}")
+    If the connection can't be opened or drops, wait() just times out, and
+    connect() is tried again on the next round.
+    """
+
+    def __init__(self, channel: str = CONTENT_CHANNEL):
+        self.channel = channel
+        self._conn = None
+        self._fd = None
+        self._woken = asyncio.Event()
+
+    @property
+    def connected(self) -> bool:
+        return self._conn is not None and not self._conn.closed
+
+    async def connect(self) -> None:
+        if self.connected:
+            return
+        try:
+            conn = await asyncio.to_thread(psycopg2.connect, settings.database_url)
+            conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {self.channel}")
+        except psycopg2.Error as exc:
+            logger.warning(f"Could not LISTEN for new content, polling every {settings.embedding_backfill_s}s: {exc}")
+            return
+        self._conn, self._fd = conn, conn.fileno()
+        asyncio.get_running_loop().add_reader(self._fd, self._on_readable)
+
+    def _on_readable(self) -> None:
+        try:
+            self._conn.poll()
+        except psycopg2.Error as exc:
+            logger.warning(f"Content listener connection lost: {exc}")
+            self.close()
+            return
+        if self._conn.notifies:
+            self._conn.notifies.clear()
+            self._woken.set()
+
+    def clear(self) -> None:
+        self._woken.clear()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait until content arrives (True) or `timeout` seconds pass (False)."""
+        try:
+            await asyncio.wait_for(self._woken.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        # By the fd saved at connect: a dropped connection no longer reports one
+        asyncio.get_running_loop().remove_reader(self._fd)
+        self._conn.close()
+        self._conn = self._fd = None
 
+
+async def maintain_embeddings(every: float, listener: Optional[ContentListener] = None) -> None:
+    """Backfill embeddings now, then whenever content arrives or `every` seconds pass. Runs until cancelled."""
+    client = get_client()
+    if not client:
+        return
+    pipeline = build_pipeline(client)
+    listener = listener or ContentListener()
+    try:
+        while True:
+            await listener.connect()
+            # Cleared before the pass, so content added during it triggers another
+            listener.clear()
+            try:
+                await locked_backfill(pipeline)
+            except Exception:
+                logger.exception("Embedding backfill failed")
+            await listener.wait(every)
     finally:
-        release_connection(conn)
+        listener.close()
+        await client.close()
+        close_backfill_pool()
 
 
 def generate_all_embeddings():
     """Generate embeddings for all content that needs them."""
     logger.info("Starting embedding generation")
-    process_lessons()
-    process_questions()
+    asyncio.run(embed_all())
     logger.info("Embedding generation complete")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=settings.log_level, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    generate_all_embeddings()
@@ -1,21 +1,37 @@
 import logging
+import time
 from datetime import datetime
+from typing import Optional
+from uuid import uuid4
 
-from src.db.repository import insert_learning_event, insert_quiz_answer
+from src.codec import RAW_KEY
+from src.db.repository import ANSWER_COLUMNS, insert_event_batch, insert_learning_event
+from src.metrics import DUPLICATE_INSERTS, EVENTS_REJECTED, VALIDATE_SECONDS
+from src.processors.dedupe import seen_events
+from src.processors.handlers import EventHandler, get_handler
 
 logger = logging.getLogger(__name__)
 
 REQUIRED_FIELDS = {"event_type", "payload"}
 
 
-def validate_event(event: dict) -> bool:
-    """Check that event has required fields."""
+def validate_event(event: dict, handler: Optional[EventHandler] = None) -> bool:
+    """Check that event has required fields and a payload its type's handler accepts."""
     if not REQUIRED_FIELDS.issubset(event.keys()):
         logger.warning(f"Event missing required fields: {REQUIRED_FIELDS - event.keys()}")
         return False
-    if not isinstance(event.get("payload"), dict):
+    if not isinstance(event["event_type"], str):
+        logger.warning("Event type must be a string")
+        return False
+    payload = event["payload"]
+    if not isinstance(payload, dict):
         logger.warning("Event payload must be a dict")
         return False
+    handler = handler or get_handler(event["event_type"])
+    error = handler.validate(payload)
+    if error:
+        logger.warning(f"Rejected {event['event_type']} event {event.get('id')}: {error}")
+        return False
     return True
 
 
@@ -25,39 +41,123 @@ def enrich_event(event: dict) -> dict:
     return event
 
 
+def _validated(event: dict) -> Optional[EventHandler]:
+    """Validate an event, timing the validation per type.
+
+    Returns the event's handler, or None if the event was rejected. Not where
+    events are counted as received: batch replays and retries validate the
+    same event again (see main.receive).
+    """
+    handler = get_handler(event.get("event_type"))
+    start = time.perf_counter()
+    valid = validate_event(event, handler)
+    VALIDATE_SECONDS.labels(handler.label).observe(time.perf_counter() - start)
+    if not valid:
+        EVENTS_REJECTED.labels(handler.label).inc()
+        return None
+    return handler
+
+
+def _is_duplicate(event: dict) -> bool:
+    """Whether the event's id was stored recently. Events without an id are never duplicates."""
+    event_id = event.get("id")
+    return event_id is not None and str(event_id) in seen_events
+
+
 def process_event(event: dict) -> None:
-    """Process a single learning event: validate, enrich, store."""
-    if not validate_event(event):
+    """Process a single learning event: validate, enrich, store it with its quiz answer in one transaction."""
+    handler = _validated(event)
+    if handler is None or _is_duplicate(event):
         return
 
     event = enrich_event(event)
     event_type = event["event_type"]
     payload = event["payload"]
+    # Assigned up front so the quiz answer can reference its event and go in the same transaction
+    event_id = str(event.get("id") or uuid4())
+    answer = handler.answer_row(event, event_id) if handler.answer_row is not None else None
 
-    # Store raw event
-    event_id = insert_learning_event(
+    stored_id = insert_learning_event(
         event_type=event_type,
         payload=payload,
         user_id=event.get("user_id"),
         session_id=event.get("session_id"),
-        event_id=event.get("id"),
+        event_id=event_id,
         created_at=event.get("created_at"),
+        raw_event=event.get(RAW_KEY),
+        answer=answer,
     )
 
-    logger.info(f"Stored event {event_id} (type={event_type})")
-
-    # Denormalize quiz answers for fast analytics
-    if event_type == "quiz_answer" and all(
-        k in payload for k in ("quiz_id", "question_id", "selected_answer", "is_correct")
-    ):
-        answer_id = insert_quiz_answer(
-            user_id=event.get("user_id", ""),
-            quiz_id=payload["quiz_id"],
-            question_id=payload["question_id"],
-            selected_answer=payload["selected_answer"],
-            is_correct=payload["is_correct"],
-            time_spent_ms=payload.get("time_spent_ms"),
-            hints_used=payload.get("hints_used", 0),
-            event_id=event_id,
+    if stored_id is None:
+        DUPLICATE_INSERTS.inc()
+        seen_events.add(event_id)
+        logger.info(f"Skipped duplicate event {event_id} (type={event_type})")
+        return
+
+    logger.info(f"Stored event {stored_id} (type={event_type}, quiz answer={answer is not None})")
+
+    seen_events.add(stored_id)
+
+
+def build_batch_rows(events: list[dict]) -> tuple[list[tuple], list[tuple], set[str]]:
+    """Validate and enrich events into rows for insert_event_batch / copy_event_batch.
+
+    Returns (event_rows, answer_rows, event_ids). Invalid events and ids seen
+    recently or earlier in the same batch are dropped.
+    """
+    event_rows = []
+    answer_rows = []
+    batch_ids = set()
+
+    for event in events:
+        handler = _validated(event)
+        if handler is None or _is_duplicate(event):
+            continue
+
+        event = enrich_event(event)
+        event_type = event["event_type"]
+        payload = event["payload"]
+        # Assign ids up front so quiz answers can reference their event in the same batch
+        event_id = str(event.get("id") or uuid4())
+        if event_id in batch_ids:
+            continue
+        batch_ids.add(event_id)
+
+        event_rows.append(
+            (
+                event_id,
+                event.get("user_id"),
+                event_type,
+                payload,
+                event.get("session_id"),
+                event.get("created_at"),
+                event.get(RAW_KEY),
+            )
         )
-        logger.info(f"Stored quiz answer {answer_id} (correct={payload['is_correct']})")
+
+        row = handler.answer_row(event, event_id) if handler.answer_row is not None else None
+        if row is not None:
+            answer_rows.append(row)
+
+    return event_rows, answer_rows, batch_ids
+
+
+def process_batch(events: list[dict]) -> int:
+    """Process a batch of events: validate, enrich, store in one transaction.
+
+    Returns the number of events stored. Invalid events are dropped, as in
+    process_event.
+    """
+    event_rows, answer_rows, batch_ids = build_batch_rows(events)
+    if not event_rows:
+        return 0
+
+    inserted = insert_event_batch(event_rows, answer_rows)
+    for event_id in batch_ids:
+        seen_events.add(event_id)
+
+    duplicates = len(event_rows) - len(inserted)
+    if duplicates:
+        DUPLICATE_INSERTS.inc(duplicates)
+    logger.info(f"Stored batch of {len(inserted)} events ({duplicates} duplicates skipped)")
+    return len(inserted)
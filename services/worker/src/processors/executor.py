@@ -0,0 +1,63 @@
+"""Bounded executor — runs blocking DB work off the event loop."""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedExecutor:
+    """Runs blocking calls on worker threads with at most `limit` in flight.
+
+    submit() returns as soon as the call is scheduled and only waits when all
+    slots are taken, so the event loop keeps reading messages while psycopg2
+    waits on Postgres. Size `limit` to the connection pool: each in-flight call
+    holds one pooled connection.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._threads = ThreadPoolExecutor(max_workers=limit, thread_name_prefix="db-writer")
+        self._slots = asyncio.Semaphore(limit)
+        self._pending: set[asyncio.Task] = set()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    async def submit(
+        self,
+        fn: Callable,
+        *args,
+        on_done: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ) -> None:
+        """Schedule fn(*args) on a worker thread, waiting for a free slot first.
+
+        on_done, if given, is awaited on the event loop with fn's return value
+        after fn returns, while the slot is still held (e.g. to acknowledge the
+        messages fn just stored).
+        """
+        await self._slots.acquire()
+        task = asyncio.create_task(self._run(fn, args, on_done))
+        self._pending.add(task)
+
+    async def _run(self, fn: Callable, args: tuple, on_done) -> None:
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._threads, fn, *args)
+            if on_done is not None:
+                await on_done(result)
+        except Exception:
+            logger.exception("Background DB task failed")
+        finally:
+            self._pending.discard(asyncio.current_task())
+            self._slots.release()
+
+    async def drain(self) -> None:
+        """Wait for every in-flight call to finish."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def shutdown(self) -> None:
+        self._threads.shutdown(wait=True)
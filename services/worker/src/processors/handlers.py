@@ -0,0 +1,165 @@
+"""Event handlers — per-event-type payload validation and denormalization.
+
+Each event_type maps to an EventHandler: a payload validator compiled once
+when the handler is registered, plus an optional function that turns the
+stored event into a quiz_answers row (or None to store the event alone).
+Event types without a handler take the fallback, which accepts any dict
+payload and stores only the raw event.
+
+New event types plug in by registering at import time:
+
+    register("badge_earned", required={"badge_id": UUID}, optional={"level": int})
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from typing import Callable, Mapping, Optional, Union
+from uuid import UUID
+
+from src.metrics import ANSWERS_CORRECTED, ANSWERS_UNKNOWN
+from src.processors.catalog import catalog
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_LABEL = "unregistered"
+
+_UUID_RE = re.compile(r"^[0-9a-fA-F]{8}-?([0-9a-fA-F]{4}-?){3}[0-9a-fA-F]{12}$")
+
+FieldType = Union[type, tuple[type, ...]]
+Validator = Callable[[dict], Optional[str]]
+
+
+def _field_check(name: str, types: FieldType) -> Callable[[object], Optional[str]]:
+    """Compile a type check for one payload field. UUID accepts UUID objects or UUID strings."""
+    types = types if isinstance(types, tuple) else (types,)
+    wants_uuid = UUID in types
+    # bool is an int subclass; only accept it where bool is asked for
+    rejects_bool = bool not in types
+    expected = "/".join(t.__name__ for t in types)
+
+    def check(value) -> Optional[str]:
+        if isinstance(value, types) and not (rejects_bool and isinstance(value, bool)):
+            return None
+        if wants_uuid and isinstance(value, str) and _UUID_RE.match(value):
+            return None
+        return f"{name} must be {expected}, got {type(value).__name__}"
+
+    return check
+
+
+def compile_validator(
+    required: Optional[Mapping[str, FieldType]] = None,
+    optional: Optional[Mapping[str, FieldType]] = None,
+) -> Validator:
+    """Build a payload validator returning an error message, or None if the payload is valid.
+
+    Required fields must be present and non-null; optional fields may be
+    missing or null. Other keys are allowed.
+    """
+    required_checks = tuple((name, _field_check(name, types)) for name, types in (required or {}).items())
+    optional_checks = tuple((name, _field_check(name, types)) for name, types in (optional or {}).items())
+
+    def validate(payload: dict) -> Optional[str]:
+        for name, check in required_checks:
+            value = payload.get(name)
+            if value is None:
+                return f"missing {name}"
+            error = check(value)
+            if error:
+                return error
+        for name, check in optional_checks:
+            value = payload.get(name)
+            if value is not None:
+                error = check(value)
+                if error:
+                    return error
+        return None
+
+    return validate
+
+
+@dataclass(frozen=True)
+class EventHandler:
+    label: str
+    validate: Validator
+    # (event, event_id) -> quiz_answers row in ANSWER_COLUMNS order (or None), for events that record an answer
+    answer_row: Optional[Callable[[dict, str], Optional[tuple]]] = None
+
+
+def _accept_any(payload: dict) -> Optional[str]:
+    return None
+
+
+FALLBACK = EventHandler(FALLBACK_LABEL, _accept_any)
+HANDLERS: dict[str, EventHandler] = {}
+
+
+def register(
+    event_type: str,
+    required: Optional[Mapping[str, FieldType]] = None,
+    optional: Optional[Mapping[str, FieldType]] = None,
+    answer_row: Optional[Callable[[dict, str], Optional[tuple]]] = None,
+) -> EventHandler:
+    """Register (or replace) the handler for an event type."""
+    handler = EventHandler(event_type, compile_validator(required, optional), answer_row)
+    HANDLERS[event_type] = handler
+    return handler
+
+
+def get_handler(event_type) -> EventHandler:
+    """Handler for an event type, or the fallback for unregistered (or malformed) types."""
+    if not isinstance(event_type, str):
+        return FALLBACK
+    return HANDLERS.get(event_type, FALLBACK)
+
+
+def quiz_answer_row(event: dict, event_id: str) -> Optional[tuple]:
+    """quiz_answers row stamped with the quiz's subject and difficulty from the content catalog.
+
+    is_correct is recomputed from the question's correct answer. A question
+    the catalog does not know (yet) is stored unenriched with the client's
+    is_correct, as before the catalog has loaded. Returns None (store the raw
+    event only) when the question belongs to another quiz.
+    """
+    payload = event["payload"]
+    is_correct = payload["is_correct"]
+    subject_id = difficulty = None
+
+    question = catalog.resolve(payload["question_id"])
+    if question is not None:
+        if str(question.quiz_id) != str(payload["quiz_id"]).lower():
+            ANSWERS_UNKNOWN.inc()
+            logger.warning(f"Question {payload['question_id']} is not in quiz {payload['quiz_id']}, answer not stored")
+            return None
+        subject_id, difficulty = question.subject_id, question.difficulty
+        checked = payload["selected_answer"] == question.correct_answer
+        if checked != is_correct:
+            ANSWERS_CORRECTED.inc()
+            is_correct = checked
+    elif catalog.loaded:
+        ANSWERS_UNKNOWN.inc()
+        logger.warning(f"Unknown question {payload['question_id']}, answer stored unchecked")
+
+    return (
+        event.get("user_id", ""),
+        payload["quiz_id"],
+        payload["question_id"],
+        payload["selected_answer"],
+        is_correct,
+        payload.get("time_spent_ms"),
+        payload.get("hints_used") or 0,
+        event_id,
+        subject_id,
+        difficulty,
+    )
+
+
+register(
+    "quiz_answer",
+    required={"quiz_id": UUID, "question_id": UUID, "selected_answer": str, "is_correct": bool},
+    optional={"time_spent_ms": int, "hints_used": int},
+    answer_row=quiz_answer_row,
+)
+register("lesson_view", optional={"lesson_id": str, "duration_ms": int})
+register("hint_request", optional={"quiz_id": UUID, "question_id": UUID})
@@ -0,0 +1,162 @@
+"""Retry scheduler — retries failed events with backoff without holding up the stream."""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Optional
+
+from src.config import settings
+from src.dead_letters import DeadLetterStore
+from src.metrics import DEAD_LETTERED, EVENTS_FAILED, RETRIES_PENDING, RETRIES_SCHEDULED, event_type_label
+from src.processors.event_processor import process_event
+from src.processors.executor import BoundedExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class RetryScheduler:
+    """Holds failed events until their backoff expires, then resubmits them.
+
+    failed() may be called from executor threads. run() is a task on the event
+    loop that hands due retries to the executor, so a retry waits for a free
+    slot like any other event and never blocks reading from the transport.
+    After max_attempts, or when max_pending retries are already waiting, the
+    event goes to the dead-letter store. Pending retries live in memory and are
+    dead-lettered on shutdown.
+
+    process() and failed() return whether the event is settled: stored,
+    rejected or dead-lettered. An event waiting for a retry is not, so it must
+    not be acked yet; `ack` is awaited with it once a retry settles it.
+    """
+
+    def __init__(
+        self,
+        dead_letters: Optional[DeadLetterStore] = None,
+        max_attempts: Optional[int] = None,
+        base_delay_ms: Optional[int] = None,
+        max_delay_ms: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        ack: Optional[Callable[[list[dict]], Awaitable[None]]] = None,
+    ):
+        self._dead_letters = dead_letters or DeadLetterStore()
+        self._ack = ack
+        self.max_attempts = max_attempts or settings.retry_max_attempts
+        self.base_delay = (base_delay_ms or settings.retry_base_ms) / 1000
+        self.max_delay = (max_delay_ms or settings.retry_max_ms) / 1000
+        self.max_pending = max_pending or settings.retry_max_pending
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def backoff(self, attempt: int) -> float:
+        """Delay in seconds before retry number `attempt`, exponential with jitter."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def process(self, event: dict, attempt: int = 0) -> bool:
+        """Process an event, scheduling a retry if it fails. `attempt` counts earlier tries.
+
+        Returns whether the event is settled.
+        """
+        try:
+            process_event(event)
+        except Exception as exc:
+            return self.failed(event, exc, attempt + 1)
+        return True
+
+    def failed(self, event: dict, error: Exception, attempt: int = 1) -> bool:
+        """Record a failed try. Returns True if the event was dead-lettered. Safe to call from any thread."""
+        EVENTS_FAILED.labels(event_type_label(event)).inc()
+        event_type = event.get("event_type", "unknown")
+
+        if attempt >= self.max_attempts or len(self._heap) >= self.max_pending:
+            logger.error(f"Giving up on event {event.get('id')} (type={event_type}) after {attempt} attempts: {error}")
+            return self._dead_letter(event, error, attempt)
+
+        delay = self.backoff(attempt)
+        with self._lock:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), attempt, event))
+            RETRIES_PENDING.set(len(self._heap))
+        RETRIES_SCHEDULED.inc()
+        logger.warning(f"Event {event.get('id')} (type={event_type}) failed, retry {attempt} in {delay:.2f}s: {error}")
+
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        return False
+
+    def _dead_letter(self, event: dict, error: Exception, attempts: int) -> bool:
+        try:
+            self._dead_letters.push(event, repr(error), attempts)
+        except Exception:
+            # Left unacked, so a transport that tracks deliveries redelivers it
+            logger.exception(f"Could not dead-letter event {event.get('id')}, dropping it")
+            return False
+        DEAD_LETTERED.inc()
+        return True
+
+    def take_due(self, now: Optional[float] = None) -> list[tuple[int, dict]]:
+        """Pop every retry whose backoff has expired, as (attempt, event) pairs."""
+        now = time.monotonic() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, attempt, event = heapq.heappop(self._heap)
+                due.append((attempt, event))
+            RETRIES_PENDING.set(len(self._heap))
+        return due
+
+    def time_until_due(self) -> Optional[float]:
+        with self._lock:
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - time.monotonic())
+
+    async def run(self, executor: BoundedExecutor) -> None:
+        """Resubmit retries as they come due. Runs until cancelled."""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        try:
+            while True:
+                self._wake.clear()
+                for attempt, event in self.take_due():
+                    await executor.submit(self.process, event, attempt, on_done=self._settled(event))
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.time_until_due())
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._loop = None
+
+    def _settled(self, event: dict) -> Optional[Callable[[bool], Awaitable[None]]]:
+        """on_done callback acking a retried event once it is settled."""
+        if self._ack is None:
+            return None
+
+        async def ack(settled: bool) -> None:
+            if settled:
+                await self._ack([event])
+
+        return ack
+
+    def dead_letter_pending(self) -> list[dict]:
+        """Move every waiting retry to the dead-letter store. Returns the events moved, to be acked."""
+        with self._lock:
+            pending, self._heap = self._heap, []
+            RETRIES_PENDING.set(0)
+        moved = [
+            event
+            for _, _, attempt, event in pending
+            if self._dead_letter(event, RuntimeError("worker shut down before retry"), attempt)
+        ]
+        if pending:
+            logger.warning(f"Dead-lettered {len(moved)} of {len(pending)} events still waiting for retry")
+        return moved
@@ -0,0 +1,60 @@
+"""Reconcile — checks the answer aggregate tables against quiz_answers.
+
+    python -m src.reconcile          # report rows that drifted
+    python -m src.reconcile --fix    # rebuild both tables from quiz_answers
+
+Exits 1 when drift is found and not fixed, so it can run as a scheduled check.
+A fix does not move the incremental dbt models' watermarks; follow it with
+`make dbt-full-refresh`.
+"""
+
+import argparse
+import logging
+import sys
+from typing import Optional
+
+from src.config import settings
+from src.db.aggregates import find_drift, rebuild
+from src.db.connection import close_pool, get_connection, release_connection
+
+logger = logging.getLogger(__name__)
+
+
+def reconcile(fix: bool = False) -> dict[str, int]:
+    """Return drifted row counts per aggregate table, rebuilding them first if `fix` and any drifted."""
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            drift = find_drift(cur)
+            if fix and any(drift.values()):
+                rebuild(cur)
+                logger.info(f"Rebuilt answer aggregates ({drift})")
+            conn.commit()
+        return drift
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_connection(conn)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare answer aggregates with quiz_answers")
+    parser.add_argument("--fix", action="store_true", help="Rebuild the aggregates if they drifted")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=settings.log_level, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    try:
+        drift = reconcile(args.fix)
+    finally:
+        close_pool()
+
+    for table, rows in drift.items():
+        print(f"{table}: {rows} drifted rows")
+    if any(drift.values()) and not args.fix:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Replay — bulk-loads historical learning events from NDJSON files.
+
+Each line is one event as published (event_type, payload, user_id, ...) or a
+row exported from learning_events. Events go through the same validation and
+enrichment as live traffic and are loaded with COPY in chunks, committing
+after each one. Memory use is bounded by the chunk size, not the file size.
+
+    python -m src.replay events.ndjson [--chunk-size 5000] [--offset BYTES] [--checkpoint FILE]
+
+After each committed chunk the byte offset of the next unread line is logged
+(and written to --checkpoint), so an interrupted replay can resume with
+--offset, or by passing the same --checkpoint again.
+"""
+
+import argparse
+import logging
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+
+from src.codec import RAW_KEY, get_codec
+from src.config import settings
+from src.db.connection import close_pool
+from src.db.repository import copy_event_batch
+from src.processors.event_processor import build_batch_rows
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReplayStats:
+    lines: int = 0
+    loaded: int = 0
+    skipped: int = 0
+    offset: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.loaded / self.elapsed if self.elapsed else 0.0
+
+
+def read_chunks(stream: BinaryIO, chunk_size: int, offset: int = 0) -> Iterator[tuple[list[dict], int, int]]:
+    """Yield (events, lines_read, end_offset) for each chunk of NDJSON lines starting at offset.
+
+    Blank and undecodable lines count as read but produce no event.
+    """
+    codec = get_codec("orjson")
+    stream.seek(offset)
+    position = offset
+    events: list[dict] = []
+    lines = 0
+
+    for line in stream:
+        position += len(line)
+        lines += 1
+        text = line.strip()
+        if text:
+            try:
+                event = codec.decode(text)
+            except ValueError:
+                logger.warning(f"Skipping undecodable line ending at byte {position}")
+                event = None
+            if isinstance(event, dict):
+                event[RAW_KEY] = text.decode()
+                events.append(event)
+        if lines >= chunk_size:
+            yield events, lines, position
+            events, lines = [], 0
+
+    if lines:
+        yield events, lines, position
+
+
+def replay(
+    path: Path,
+    chunk_size: Optional[int] = None,
+    offset: int = 0,
+    checkpoint: Optional[Path] = None,
+) -> ReplayStats:
+    """Load every event in `path` from `offset` on. Returns the totals."""
+    chunk_size = chunk_size or settings.replay_chunk_size
+    stats = ReplayStats(offset=offset)
+    start = time.perf_counter()
+
+    with open(path, "rb") as stream:
+        for events, lines, end_offset in read_chunks(stream, chunk_size, offset):
+            event_rows, answer_rows, _ = build_batch_rows(events)
+            loaded = copy_event_batch(event_rows, answer_rows) if event_rows else 0
+
+            stats.lines += lines
+            stats.loaded += loaded
+            stats.skipped += lines - loaded
+            stats.offset = end_offset
+            stats.elapsed = time.perf_counter() - start
+            if checkpoint is not None:
+                checkpoint.write_text(str(end_offset))
+
+            logger.info(
+                f"Loaded {stats.loaded} events ({stats.skipped} skipped) "
+                f"at {stats.rows_per_sec:,.0f} rows/sec, offset {end_offset}"
+            )
+
+    return stats
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Bulk-load learning events from an NDJSON file")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--chunk-size", type=int, default=None, help="Events per COPY transaction")
+    parser.add_argument("--offset", type=int, default=None, help="Byte offset to resume from")
+    parser.add_argument("--checkpoint", type=Path, default=None, help="File recording the resume offset")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=settings.log_level, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    offset = args.offset
+    if offset is None and args.checkpoint is not None and args.checkpoint.exists():
+        offset = int(args.checkpoint.read_text().strip() or 0)
+        logger.info(f"Resuming from checkpoint offset {offset}")
+
+    try:
+        stats = replay(args.path, args.chunk_size, offset or 0, args.checkpoint)
+    except Exception:
+        logger.exception("Replay failed; resume with --offset set to the last logged offset")
+        sys.exit(1)
+    finally:
+        close_pool()
+
+    print(
+        f"Replayed {stats.lines} lines: {stats.loaded} loaded, {stats.skipped} skipped, "
+        f"{stats.rows_per_sec:,.0f} rows/sec, end offset {stats.offset}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Supervisor — fans events out to worker processes sharded by user."""
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import zlib
+from typing import Callable, Optional
+
+from src.config import settings
+from src.consumers.base import Consumer
+from src.consumers.redis_stream import STREAM_ID_KEY
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.05
+
+
+def shard_for_user(user_id: str, shards: int) -> int:
+    """Stable shard index for a user, identical across processes and restarts."""
+    return zlib.crc32(str(user_id).encode()) % shards
+
+
+class Supervisor:
+    """Starts `processes` children running `target` and routes events between them.
+
+    Events for the same user always go to the same child, which handles them in
+    order. Events without a user are spread round-robin. Children that exit
+    while the supervisor is running are restarted on fresh queues, so a child
+    killed while holding a queue's lock can't stall its shard. Events still
+    readable from the old queue are moved over and not lost with the process;
+    any the dead child had locked away are redelivered upstream (streams) or
+    lost (Pub/Sub).
+    """
+
+    def __init__(self, processes: int, target: Callable, queue_size: Optional[int] = None):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._target = target
+        self.processes = processes
+        self._queue_size = queue_size or settings.shard_queue_size
+        self._queues = [self._ctx.Queue(maxsize=self._queue_size) for _ in range(processes)]
+        self._acks: list = [None] * processes
+        self._children: list = [None] * processes
+        self._round_robin = itertools.count()
+        self._stopping = False
+
+    def start(self) -> None:
+        for index in range(self.processes):
+            self._spawn(index)
+
+    def _spawn(self, index: int) -> None:
+        # Fresh queues per child: a crashed child may die holding the old queues' locks
+        if self._children[index] is not None:
+            self._replace_events_queue(index)
+        self._acks[index] = self._ctx.Queue()
+        child = self._ctx.Process(
+            target=self._target,
+            args=(index, self._queues[index], self._acks[index]),
+            name=f"worker-shard-{index}",
+        )
+        child.start()
+        self._children[index] = child
+        logger.info(f"Started shard {index} (pid={child.pid})")
+
+    def _replace_events_queue(self, index: int) -> None:
+        """Give a shard a new events queue, moving over whatever can still be read from the old one."""
+        old = self._queues[index]
+        self._queues[index] = self._ctx.Queue(maxsize=self._queue_size)
+        moved = 0
+        while True:
+            try:
+                # Not get_nowait: events put just before the crash may still be in the feeder thread
+                event = old.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                break
+            self._queues[index].put_nowait(event)
+            moved += 1
+        old.close()
+        old.cancel_join_thread()  # anything left behind the dead child's lock can't be flushed
+        logger.info(f"Moved {moved} queued events to shard {index}'s new queue")
+
+    def shard_for(self, event: dict) -> int:
+        user_id = event.get("user_id")
+        if user_id:
+            return shard_for_user(user_id, self.processes)
+        return next(self._round_robin) % self.processes
+
+    async def dispatch(self, event: dict) -> None:
+        """Route an event to its shard, waiting if that shard's queue is full."""
+        shard = self._queues[self.shard_for(event)]
+        while True:
+            try:
+                shard.put_nowait(event)
+                return
+            except queue.Full:
+                await asyncio.sleep(POLL_INTERVAL)
+
+    async def monitor(self, interval: float = 1.0) -> None:
+        """Restart children that exit unexpectedly."""
+        while not self._stopping:
+            for index, child in enumerate(self._children):
+                if child is not None and not child.is_alive() and not self._stopping:
+                    logger.error(f"Shard {index} (pid={child.pid}) exited with code {child.exitcode}, restarting")
+                    self._spawn(index)
+            await asyncio.sleep(interval)
+
+    async def pump_acks(self, consumer: Consumer, once: bool = False) -> None:
+        """Forward acks reported by children to the upstream consumer.
+
+        With once=True, forward whatever is queued and return instead of polling.
+        """
+        while True:
+            ids = []
+            for acks in self._acks:
+                while acks is not None:
+                    try:
+                        ids.extend(acks.get_nowait())
+                    except queue.Empty:
+                        break
+            if ids:
+                await consumer.ack([{STREAM_ID_KEY: entry_id} for entry_id in ids])
+            elif once:
+                return
+            else:
+                await asyncio.sleep(POLL_INTERVAL)
+
+    def forward_signal(self, sig: int) -> None:
+        self._stopping = True
+        for child in self._children:
+            if child is not None and child.is_alive():
+                os.kill(child.pid, sig)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Ask children to drain their queues and exit, terminating stragglers."""
+        self._stopping = True
+        for shard in self._queues:
+            try:
+                shard.put_nowait(None)
+            except queue.Full:
+                pass
+        for index, child in enumerate(self._children):
+            if child is None:
+                continue
+            child.join(timeout)
+            if child.is_alive():
+                logger.warning(f"Shard {index} did not stop in time, terminating")
+                child.terminate()
+                child.join()
+        logger.info("All shards stopped")
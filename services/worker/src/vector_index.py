@@ -0,0 +1,41 @@
+"""Vector index maintenance — builds or rebuilds the embedding ANN indexes.
+
+    python -m src.vector_index              # build or rebuild what needs it
+    python -m src.vector_index --dry-run    # report what would be done
+    python -m src.vector_index --force --method ivfflat
+
+See src.db.vector_index for when an index is rebuilt and how its parameters
+are chosen.
+"""
+
+import argparse
+import logging
+import sys
+from typing import Optional
+
+import psycopg2
+
+from src.config import settings
+from src.db.vector_index import METHODS, maintain_indexes
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build or rebuild the embedding ANN indexes")
+    parser.add_argument("--method", choices=METHODS, default=None, help="Default: vector_index_method")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the indexes look fine")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be built")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=settings.log_level, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    try:
+        result = maintain_indexes(args.method, args.force, args.dry_run)
+    except psycopg2.Error as exc:
+        print(f"Vector index maintenance failed: {exc}", file=sys.stderr)
+        sys.exit(1)
+    for table, outcome in result.items():
+        print(f"{table}: {outcome}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+from unittest.mock import MagicMock, patch
+
+from src.db.aggregates import UPSERT_SQL, find_drift, rebuild, upsert_answer_aggregates
+from src.db.repository import copy_event_batch, insert_learning_event, insert_quiz_answer
+from src.reconcile import reconcile
+
+
+def _connection(cursor):
+    conn = MagicMock()
+    conn.cursor.return_value.__enter__.return_value = cursor
+    return conn
+
+
+def test_upsert_skips_empty_batches():
+    cur = MagicMock()
+    upsert_answer_aggregates(cur, [])
+    cur.execute.assert_not_called()
+
+
+def test_upsert_adds_to_both_tables_in_one_statement():
+    cur = MagicMock()
+    upsert_answer_aggregates(cur, ["a1", "a2"])
+
+    cur.execute.assert_called_once_with(UPSERT_SQL, (["a1", "a2"],))
+    assert "INSERT INTO agg_topic_performance" in UPSERT_SQL
+    assert "INSERT INTO agg_user_daily_stats" in UPSERT_SQL
+    assert "t.total_questions + EXCLUDED.total_questions" in UPSERT_SQL
+
+
+@patch("src.db.repository.release_connection")
+@patch("src.db.repository.get_connection")
+def test_insert_quiz_answer_updates_aggregates_before_commit(mock_get_conn, _release):
+    cur = MagicMock()
+    cur.fetchone.return_value = ("answer-1",)
+    calls = []
+    conn = _connection(cur)
+    conn.commit.side_effect = lambda: calls.append("commit")
+    cur.execute.side_effect = lambda sql, params=None: calls.append(sql)
+    mock_get_conn.return_value = conn
+
+    insert_quiz_answer("u1", "q1", "qq1", "A", True, 1200)
+
+    assert calls[1] is UPSERT_SQL
+    assert calls[-1] == "commit"
+
+
+@patch("src.db.repository.release_connection")
+@patch("src.db.repository.get_connection")
+def test_insert_learning_event_stores_its_answer_in_the_same_transaction(mock_get_conn, _release):
+    cur = MagicMock()
+    cur.fetchone.side_effect = [("e1",), ("answer-1",)]
+    calls = []
+    conn = _connection(cur)
+    conn.commit.side_effect = lambda: calls.append("commit")
+    cur.execute.side_effect = lambda sql, params=None: calls.append(sql)
+    mock_get_conn.return_value = conn
+    answer = ("u1", "q1", "qq1", "A", True, 1200, 0, "e1", None, None)
+
+    assert insert_learning_event("quiz_answer", {}, event_id="e1", answer=answer) == "e1"
+    assert calls[2] is UPSERT_SQL
+    assert calls[3:] == ["commit"]
+
+    # A duplicate event skips its answer
+    cur.fetchone.side_effect = [None]
+    calls.clear()
+    assert insert_learning_event("quiz_answer", {}, event_id="e1", answer=answer) is None
+    assert len(calls) == 2 and calls[-1] == "commit"
+
+
+@patch("src.db.repository.release_connection")
+@patch("src.db.repository.get_connection")
+def test_copy_event_batch_updates_aggregates_for_inserted_answers(mock_get_conn, _release):
+    cur = MagicMock()
+    cur.fetchone.return_value = (1, ["answer-1"])
+    mock_get_conn.return_value = _connection(cur)
+
+    events = [("e1", "u1", "quiz_answer", {}, None, None, None)]
+    answers = [("u1", "q1", "qq1", "A", True, 1200, 0, "e1")]
+    assert copy_event_batch(events, answers) == 1
+
+    cur.execute.assert_called_with(UPSERT_SQL, (["answer-1"],))
+
+
+def test_find_drift_reports_per_table():
+    cur = MagicMock()
+    cur.fetchone.side_effect = [(0,), (3,)]
+    assert find_drift(cur) == {"agg_topic_performance": 0, "agg_user_daily_stats": 3}
+
+
+def test_rebuild_locks_before_clearing():
+    cur = MagicMock()
+    rebuild(cur)
+    statements = [c.args[0] for c in cur.execute.call_args_list]
+    assert statements[0].startswith("LOCK TABLE agg_topic_performance, agg_user_daily_stats")
+    assert statements[1:3] == ["DELETE FROM agg_topic_performance", "DELETE FROM agg_user_daily_stats"]
+
+
+@patch("src.reconcile.release_connection")
+@patch("src.reconcile.get_connection")
+@patch("src.reconcile.rebuild")
+@patch("src.reconcile.find_drift")
+def test_reconcile_rebuilds_only_when_fixing_drift(mock_drift, mock_rebuild, mock_get_conn, _release):
+    mock_get_conn.return_value = _connection(MagicMock())
+
+    mock_drift.return_value = {"agg_topic_performance": 2, "agg_user_daily_stats": 0}
+    reconcile(fix=False)
+    mock_rebuild.assert_not_called()
+    reconcile(fix=True)
+    mock_rebuild.assert_called_once()
+
+    mock_drift.return_value = {"agg_topic_performance": 0, "agg_user_daily_stats": 0}
+    reconcile(fix=True)
+    assert mock_rebuild.call_count == 1
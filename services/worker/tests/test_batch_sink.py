@@ -0,0 +1,103 @@
+import asyncio
+import queue
+from unittest.mock import patch
+
+from src.processors.batch_sink import BatchSink
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_add_reports_full_at_max_size():
+    sink = BatchSink(max_size=3, linger_ms=50)
+    assert sink.add({"n": 1}) is False
+    assert sink.add({"n": 2}) is False
+    assert sink.add({"n": 3}) is True
+    assert len(sink) == 3
+
+
+def test_time_until_due_tracks_oldest_event():
+    clock = FakeClock()
+    sink = BatchSink(max_size=10, linger_ms=100, clock=clock)
+    assert sink.time_until_due() is None
+
+    sink.add({"n": 1})
+    clock.now = 0.04
+    sink.add({"n": 2})
+    assert abs(sink.time_until_due() - 0.06) < 1e-9
+
+    clock.now = 0.5
+    assert sink.time_until_due() == 0.0
+
+
+@patch("src.processors.batch_sink.process_batch")
+def test_flush_hands_off_and_resets(mock_process_batch):
+    sink = BatchSink(max_size=10, linger_ms=50)
+    sink.add({"n": 1})
+    sink.add({"n": 2})
+
+    assert sink.flush() == 2
+    mock_process_batch.assert_called_once_with([{"n": 1}, {"n": 2}])
+    assert len(sink) == 0
+    assert sink.time_until_due() is None
+    assert sink.flush() == 0
+
+
+@patch("src.processors.batch_sink.process_event")
+@patch("src.processors.batch_sink.process_batch", side_effect=RuntimeError("constraint violation"))
+def test_flush_falls_back_to_single_events(mock_process_batch, mock_process_event):
+    sink = BatchSink(max_size=10, linger_ms=50)
+    sink.add({"event_type": "a", "payload": {}})
+    sink.add({"event_type": "b", "payload": {}})
+    mock_process_event.side_effect = [RuntimeError("bad row"), None]
+
+    assert sink.flush() == 2
+    assert mock_process_event.call_count == 2
+
+
+@patch("src.processors.batch_sink.process_event")
+@patch("src.processors.batch_sink.process_batch", side_effect=RuntimeError("deadlock"))
+def test_write_leaves_events_waiting_for_retry_unsettled(mock_process_batch, mock_process_event):
+    retried = []
+
+    def on_failure(event, exc):
+        retried.append(event)
+        return False  # a retry is pending
+
+    sink = BatchSink(max_size=10, linger_ms=50, on_failure=on_failure)
+    events = [{"event_type": "a", "payload": {}}, {"event_type": "b", "payload": {}}]
+    mock_process_event.side_effect = [RuntimeError("timeout"), None]
+
+    assert sink.write(events) == [events[1]]
+    assert retried == [events[0]]
+
+
+def test_run_batched_flushes_queued_events_on_shutdown(monkeypatch):
+    from src import main as worker
+    from src.consumers.queue import QueueConsumer
+    from src.processors.executor import BoundedExecutor
+
+    events = queue.Queue()
+    for i in range(5):
+        events.put({"id": f"evt-{i}", "event_type": "lesson_view", "payload": {}})
+    events.put(None)
+    sink = BatchSink(max_size=100, linger_ms=60000)
+    written = []
+    monkeypatch.setattr(sink, "write", lambda batch: written.extend(batch) or batch)
+    add = sink.add
+
+    def add_then_stop(event):
+        # Shutdown arrives with the rest of the events still in run_batched's queue
+        monkeypatch.setattr(worker, "shutdown", True)
+        return add(event)
+
+    monkeypatch.setattr(sink, "add", add_then_stop)
+    monkeypatch.setattr(worker, "shutdown", False)
+    asyncio.run(worker.run_batched(QueueConsumer(events, queue.Queue()), sink, BoundedExecutor(1)))
+
+    assert [event["id"] for event in written] == [f"evt-{i}" for i in range(5)]
@@ -0,0 +1,97 @@
+from unittest.mock import patch
+from uuid import UUID, uuid4
+
+import pytest
+
+from src.metrics import ANSWERS_CORRECTED, ANSWERS_UNKNOWN
+from src.processors.catalog import ContentCatalog
+from src.processors.handlers import quiz_answer_row
+
+QUIZ_ID = "5b0e4c1e-9c55-4a51-8a4c-2f1d3c6b7a01"
+
+
+@pytest.fixture
+def loaded_catalog():
+    """A catalog holding one quiz with three questions, as after a bulk load."""
+    content = ContentCatalog()
+    content._tables.put_quiz(QUIZ_ID, 2, "medium")
+    question_ids = sorted((uuid4() for _ in range(3)), key=lambda u: u.int)
+    for sort_order, question_id in enumerate(question_ids):
+        content._tables.append_question(question_id, QUIZ_ID, "True" if sort_order % 2 else "False", sort_order)
+    content.loaded = True
+    return content, [str(q) for q in question_ids]
+
+
+def test_get_reads_sorted_arrays_and_overlay(loaded_catalog):
+    content, question_ids = loaded_catalog
+
+    info = content.get(question_ids[1].upper())
+    assert info.quiz_id == UUID(QUIZ_ID)
+    assert (info.correct_answer, info.sort_order, info.subject_id, info.difficulty) == ("True", 1, 2, "medium")
+    assert content.get(str(uuid4())) is None
+    assert content.get("not-a-uuid") is None
+
+    added = uuid4()
+    content._tables.put_question(added, QUIZ_ID, "False", 7)
+    content._tables.put_question(question_ids[0], QUIZ_ID, "B", 0)
+    assert content.get(added).sort_order == 7
+    assert content.get(question_ids[0]).correct_answer == "B"
+    # Updating a bulk-loaded question rewrites it in place rather than growing the overlay
+    assert len(content._tables.overlay) == 1
+    assert len(content) == 4
+
+
+def test_resolve_fetches_misses_once(loaded_catalog):
+    content, _ = loaded_catalog
+    unknown = str(uuid4())
+
+    with patch.object(content, "_fetch_question") as fetch:
+        assert content.resolve(unknown) is None
+        assert content.resolve(unknown) is None
+    fetch.assert_called_once()
+
+    content.loaded = False
+    with patch.object(content, "_fetch_question") as fetch:
+        assert content.resolve(str(uuid4())) is None
+    fetch.assert_not_called()
+
+
+def _answer(question_id, selected, is_correct, quiz_id=QUIZ_ID):
+    return {
+        "user_id": "u1",
+        "event_type": "quiz_answer",
+        "payload": {"quiz_id": quiz_id, "question_id": question_id, "selected_answer": selected, "is_correct": is_correct},
+    }
+
+
+def test_quiz_answer_row_stamps_and_checks_answers(loaded_catalog):
+    content, question_ids = loaded_catalog
+
+    with patch("src.processors.handlers.catalog", content):
+        row = quiz_answer_row(_answer(question_ids[1], "True", True), "evt-1")
+        assert row[-2:] == (2, "medium")
+        assert row[4] is True
+
+        corrected = ANSWERS_CORRECTED.value
+        row = quiz_answer_row(_answer(question_ids[1], "False", True), "evt-2")
+        assert row[4] is False
+        assert ANSWERS_CORRECTED.value == corrected + 1
+
+
+def test_quiz_answer_row_keeps_unknown_and_drops_mismatched_questions(loaded_catalog):
+    content, question_ids = loaded_catalog
+    unknown = ANSWERS_UNKNOWN.value
+
+    with patch("src.processors.handlers.catalog", content), patch.object(content, "_fetch_question"):
+        # A question the catalog has not seen is stored as the client sent it
+        row = quiz_answer_row(_answer(str(uuid4()), "True", False), "evt-1")
+        assert row[4] is False
+        assert row[-2:] == (None, None)
+        assert quiz_answer_row(_answer(question_ids[0], "False", True, quiz_id=str(uuid4())), "evt-2") is None
+        assert ANSWERS_UNKNOWN.value == unknown + 2
+
+        # Before the catalog has loaded, answers pass through without enrichment
+        content.loaded = False
+        row = quiz_answer_row(_answer(str(uuid4()), "True", True), "evt-3")
+        assert row[4] is True
+        assert row[-2:] == (None, None)
@@ -0,0 +1,31 @@
+import json
+
+import msgpack
+
+from src.codec import RAW_KEY, JsonCodec, MsgpackCodec, OrjsonCodec, decode_event, to_json_text
+
+
+def test_decode_event_keeps_json_text():
+    data = b'{"event_type": "quiz_answer", "payload": {"quiz_id": "q1"}}'
+    event = decode_event(OrjsonCodec(), data)
+
+    assert event["payload"] == {"quiz_id": "q1"}
+    assert event[RAW_KEY] == data.decode()
+
+
+def test_decode_event_binary_has_no_raw_text():
+    data = msgpack.packb({"event_type": "lesson_view", "payload": {}})
+    event = decode_event(MsgpackCodec(), data)
+
+    assert event["event_type"] == "lesson_view"
+    assert RAW_KEY not in event
+
+
+def test_json_codecs_share_wire_format():
+    message = {"event_type": "hint_request", "payload": {"hints": 2}}
+    assert OrjsonCodec().decode(JsonCodec().encode(message)) == message
+    assert JsonCodec().decode(OrjsonCodec().encode(message)) == message
+
+
+def test_to_json_text():
+    assert json.loads(to_json_text({"a": [1, 2], "b": None})) == {"a": [1, 2], "b": None}
@@ -0,0 +1,106 @@
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+import pytest
+from psycopg2.pool import PoolError
+
+from src.db import prepared
+from src.db.connection import ConnectionPool
+from src.metrics import POOL_IN_USE, POOL_RECONNECTS
+
+
+def _fake_conn(prepared_names=()):
+    conn = MagicMock()
+    conn.closed = 0
+    conn.prepared = set(prepared_names)
+    return conn
+
+
+@pytest.fixture
+def statements():
+    saved = dict(prepared.STATEMENTS)
+    prepared.STATEMENTS.clear()
+    yield prepared.STATEMENTS
+    prepared.STATEMENTS.clear()
+    prepared.STATEMENTS.update(saved)
+
+
+def test_statement_renders_prepare_and_execute(statements):
+    statement = prepared.register("find_user", "SELECT * FROM users WHERE id = %s::uuid AND email LIKE %s", ("uuid", "text"))
+
+    assert statement.prepare_sql == "PREPARE find_user (uuid, text) AS SELECT * FROM users WHERE id = $1::uuid AND email LIKE $2"
+    assert statement.execute_sql == "EXECUTE find_user (%s::uuid, %s::text)"
+
+    cur = MagicMock()
+    cur.connection = _fake_conn()
+    prepared.execute(cur, statement, ("u1", "%a"))
+    cur.execute.assert_called_with(statement.sql, ("u1", "%a"))
+
+    cur.connection.prepared.add("find_user")
+    prepared.execute(cur, statement, ("u1", "%a"))
+    cur.execute.assert_called_with(statement.execute_sql, ("u1", "%a"))
+
+
+def test_prepare_all_skips_failures_and_prepared_statements(statements):
+    prepared.register("ok", "SELECT %s::int", ("int",))
+    prepared.register("broken", "SELECT * FROM missing WHERE id = %s", ("int",))
+    prepared.register("done", "SELECT 1", ())
+    conn = _fake_conn({"done"})
+    cur = conn.cursor.return_value.__enter__.return_value
+
+    def execute(sql, params=None):
+        if "missing" in sql:
+            raise psycopg2.ProgrammingError("relation does not exist")
+
+    cur.execute.side_effect = execute
+
+    assert prepared.prepare_all(conn) == 1
+    assert conn.prepared == {"ok", "done"}
+    conn.rollback.assert_called_once()
+    executed = [c.args[0] for c in cur.execute.call_args_list]
+    assert not any(sql.startswith("PREPARE done") for sql in executed)
+
+
+def _pool(conns, **kwargs):
+    backing = MagicMock()
+    backing.getconn.side_effect = conns
+    with patch("src.db.connection.ThreadedConnectionPool", return_value=backing):
+        options = {"minconn": 1, "maxconn": 2, "timeout": 0.05, "check_idle_s": 30.0, **kwargs}
+        pool = ConnectionPool("postgresql://test", **options)
+    return pool, backing
+
+
+@patch("src.db.connection.prepare_all")
+def test_pool_times_out_when_exhausted(_prepare):
+    pool, _ = _pool([_fake_conn(), _fake_conn()])
+    in_use = POOL_IN_USE.value
+
+    first, second = pool.getconn(), pool.getconn()
+    assert POOL_IN_USE.value == in_use + 2
+    with pytest.raises(PoolError):
+        pool.getconn()
+
+    pool.putconn(first)
+    pool.putconn(second)
+    assert POOL_IN_USE.value == in_use
+
+
+@patch("src.db.connection._ping")
+@patch("src.db.connection.prepare_all")
+def test_pool_replaces_dead_idle_connections(prepare, ping):
+    stale, fresh = _fake_conn(), _fake_conn()
+    pool, backing = _pool([stale, stale, fresh], check_idle_s=0)
+    ping.side_effect = [False, True]
+    reconnects = POOL_RECONNECTS.value
+
+    # Just opened: handed out without a ping
+    conn = pool.getconn()
+    assert conn is stale
+    ping.assert_not_called()
+    pool.putconn(conn)
+
+    # Idle past check_idle_s: pinged, found dead, closed and replaced
+    assert pool.getconn() is fresh
+    backing.putconn.assert_called_with(stale, close=True)
+    assert POOL_RECONNECTS.value == reconnects + 1
+    prepare.assert_called_with(fresh)
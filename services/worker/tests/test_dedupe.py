@@ -0,0 +1,28 @@
+from src.processors.dedupe import SeenCache
+
+
+def test_add_then_contains():
+    cache = SeenCache(max_size=10)
+    assert "a" not in cache
+    cache.add("a")
+    assert "a" in cache
+
+
+def test_evicts_least_recently_used():
+    cache = SeenCache(max_size=2)
+    cache.add("a")
+    cache.add("b")
+    assert "a" in cache  # touch a, so b is now oldest
+    cache.add("c")
+
+    assert len(cache) == 2
+    assert "b" not in cache
+    assert "a" in cache
+    assert "c" in cache
+
+
+def test_zero_size_disables_cache():
+    cache = SeenCache(max_size=0)
+    cache.add("a")
+    assert "a" not in cache
+    assert len(cache) == 0
@@ -0,0 +1,51 @@
+from unittest.mock import MagicMock, patch
+
+from src.db import embedding_cache
+from src.db.embedding_cache import lookup, normalize, prune, store, text_hash
+
+
+def test_normalize_collapses_whitespace_and_unicode_forms():
+    assert normalize("  What is 2 +\n 2?\t") == "What is 2 + 2?"
+    assert normalize("ﬁsh") == "fish"
+    assert normalize("Paris") != normalize("paris")
+
+
+def test_text_hash_matches_for_equivalent_text():
+    assert text_hash("What is 2 + 2?") == text_hash("What is  2 + 2? ")
+    assert text_hash("What is 2 + 2?") != text_hash("What is 2 + 3?")
+    assert len(text_hash("anything")) == 32
+
+
+def test_lookup_returns_cached_embeddings_by_hash():
+    cur = MagicMock()
+    key = text_hash("a")
+    cur.fetchall.return_value = [(memoryview(key), "[0.5,0.25]")]
+
+    assert lookup(cur, "model", [key, text_hash("b")]) == {key: [0.5, 0.25]}
+    sql, params = cur.execute.call_args.args
+    assert "UPDATE embedding_cache SET last_used_at" in sql
+    assert params == ("model", [key, text_hash("b")])
+
+
+def test_lookup_and_store_skip_empty_input():
+    cur = MagicMock()
+    assert lookup(cur, "model", []) == {}
+    store(cur, "model", {})
+    cur.execute.assert_not_called()
+
+
+@patch("src.db.embedding_cache.execute_values")
+def test_store_inserts_new_entries(mock_execute_values):
+    cur = MagicMock()
+    store(cur, "model", {b"k1": [1.0], b"k2": [2.0]})
+
+    sql, rows = mock_execute_values.call_args.args[1:3]
+    assert "ON CONFLICT (model, text_hash) DO NOTHING" in sql
+    assert rows == [("model", b"k1", "[1.0]"), ("model", b"k2", "[2.0]")]
+
+
+def test_prune_keeps_most_recently_used():
+    cur = MagicMock(rowcount=3)
+    assert prune(cur, 1000) == 3
+    sql, params = cur.execute.call_args.args
+    assert sql == embedding_cache.PRUNE_SQL and params == (1000,)
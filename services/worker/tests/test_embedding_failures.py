@@ -0,0 +1,24 @@
+from unittest.mock import MagicMock
+
+from src.db.embedding_failures import clear, record, skip_clause
+
+
+def test_record_backs_off_from_the_base_delay_up_to_the_cap():
+    cur = MagicMock()
+    record(cur, "lessons", 7, "input too long" * 200, 3600, 604800)
+
+    sql, params = cur.execute.call_args.args
+    assert "ON CONFLICT (table_name, row_id) DO UPDATE" in sql
+    assert "LEAST(%(max)s, %(base)s * 2 ^ f.attempts)" in sql
+    assert params["row_id"] == "7" and (params["base"], params["max"]) == (3600, 604800)
+    assert len(params["error"]) == 1000
+
+
+def test_clear_and_skip_clause_match_rows_of_one_table():
+    cur = MagicMock()
+    clear(cur, "quiz_questions", ["a", "b"])
+    assert cur.execute.call_args.args[1] == ("quiz_questions", ["a", "b"])
+
+    clause = skip_clause("quiz_questions")
+    assert "f.table_name = 'quiz_questions' AND f.row_id = quiz_questions.id" in clause
+    assert "f.retry_at > NOW()" in clause
@@ -1,6 +1,151 @@
-from unittest.mock import MagicMock, patch
+import asyncio
+import base64
+import json
+import socket
+import struct
+import threading
+import uuid
+from array import array
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
 
-from src.processors.embedding_processor import generate_embedding, get_client, process_lessons
+import httpx
+import psycopg2
+import pytest
+from openai import AsyncOpenAI, RateLimitError
+
+from src.db.embedding_cache import text_hash
+from src.processors.embedding_processor import (
+    ContentListener,
+    EmbeddingPipeline,
+    Progress,
+    RateLimiter,
+    TokenBucket,
+    embed_all,
+    get_client,
+    locked_backfill,
+    maintain_embeddings,
+    pack_batches,
+    process_lessons,
+    retry_after,
+)
+
+
+class StubEmbeddingsServer(ThreadingHTTPServer):
+    """Local stand-in for the embeddings API.
+
+    Embeds each text as [len(text), position]. The first `rate_limited`
+    requests get a 429 with Retry-After, and any request containing a text
+    in `bad` gets a 400.
+    """
+
+    def __init__(self, rate_limited=0, retry_after="0.05", bad=()):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.rate_limited = rate_limited
+        self.retry_after = retry_after
+        self.bad = set(bad)
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        texts = body["input"]
+        with server.lock:
+            server.requests.append(texts)
+            limited = len(server.requests) <= server.rate_limited
+        if limited:
+            self._reply(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                        {"Retry-After": server.retry_after})
+        elif server.bad.intersection(texts):
+            self._reply(400, {"error": {"message": "Invalid input", "type": "invalid_request_error"}})
+        else:
+            # Returned out of order, as the API is allowed to
+            data = [{"object": "embedding", "index": i, "embedding": [float(len(text)), float(i)]}
+                    for i, text in enumerate(texts)]
+            if body.get("encoding_format") == "base64":
+                for item in data:
+                    item["embedding"] = base64.b64encode(struct.pack("<2f", *item["embedding"])).decode()
+            self._reply(200, {"object": "list", "data": data[::-1], "model": "text-embedding-3-small",
+                              "usage": {"prompt_tokens": 1, "total_tokens": 1}})
+
+    def _reply(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(**kwargs):
+        server = StubEmbeddingsServer(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+
+
+def _pipeline(server, concurrency=2, max_attempts=4, rpm=60000, tpm=10_000_000):
+    client = AsyncOpenAI(api_key="sk-test", base_url=server.url, max_retries=0)
+    return EmbeddingPipeline(client, RateLimiter(rpm, tpm), concurrency, max_attempts)
+
+
+def _run_pipeline(server, rows, stored, cached=None, failed=None, **kwargs):
+    async def main():
+        pipeline = _pipeline(server, **kwargs)
+        try:
+            return await pipeline.run("lessons", rows, lambda row: row[1])
+        finally:
+            await pipeline.client.close()
+
+    def store(table, ids, embeddings, new):
+        stored.extend((row_id, list(embedding)) for row_id, embedding in zip(ids, embeddings))
+        cache.update(new)
+
+    def record_failure(table, row_id, error):
+        if failed is not None:
+            failed.append(row_id)
+
+    cache = dict(cached or {})
+    with patch("src.processors.embedding_processor._store", side_effect=store), \
+            patch("src.processors.embedding_processor._record_failure", side_effect=record_failure), \
+            patch("src.processors.embedding_processor._cached",
+                  side_effect=lambda keys: {key: cache[key] for key in keys if key in cache}):
+        return asyncio.run(main())
 
 
 @patch("src.processors.embedding_processor.settings")
@@ -10,57 +155,313 @@ def test_get_client_no_key_returns_none(mock_settings):
 
 
 @patch("src.processors.embedding_processor.settings")
-@patch("src.processors.embedding_processor.OpenAI")
+@patch("src.processors.embedding_processor.AsyncOpenAI")
 def test_get_client_with_key(mock_openai_cls, mock_settings):
     mock_settings.openai_api_key = "sk-test"
+    mock_settings.openai_base_url = ""
     client = get_client()
-    mock_openai_cls.assert_called_once_with(api_key="sk-test")
+    mock_openai_cls.assert_called_once_with(api_key="sk-test", base_url=None, max_retries=0)
     assert client is not None
 
 
-def test_generate_embedding():
-    mock_client = MagicMock()
-    mock_response = MagicMock()
-    mock_response.data = [MagicMock(embedding=[0.1, 0.2, 0.3])]
-    mock_client.embeddings.create.return_value = mock_response
+@patch("src.processors.embedding_processor.get_client", return_value=None)
+def test_embed_all_skips_without_key(mock_get_client):
+    # Should return early without touching DB
+    assert asyncio.run(embed_all()) == []
+    mock_get_client.assert_called_once()
 
-    result = generate_embedding(mock_client, "test text")
 
-    assert result == [0.1, 0.2, 0.3]
-    mock_client.embeddings.create.assert_called_once_with(
-        input="test text", model="text-embedding-3-small"
-    )
+def test_pack_batches_respects_item_and_token_limits():
+    rows = [(i, "x" * 30) for i in range(10)]  # 11 estimated tokens each
+    batches = list(pack_batches(rows, lambda row: row[1], max_items=4, max_tokens=25))
+    assert [len(b) for b in batches] == [2, 2, 2, 2, 2]
+    batches = list(pack_batches(rows, lambda row: row[1], max_items=4, max_tokens=1000))
+    assert [len(b) for b in batches] == [4, 4, 2]
+    assert [row for batch in batches for row, _ in batch] == rows
 
 
-@patch("src.processors.embedding_processor.get_client", return_value=None)
-def test_process_lessons_skips_without_key(mock_get_client):
-    # Should return early without touching DB
-    process_lessons()
-    mock_get_client.assert_called_once()
+def test_token_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)  # one per second
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now = 30
+    assert bucket.wait_time(30) == 0
+    # More than the bucket holds waits for a full bucket rather than forever
+    assert bucket.wait_time(600) == pytest.approx(30.0)
+
+
+def test_rate_limiter_paces_requests_and_tokens():
+    clock = FakeClock()
+    limiter = RateLimiter(rpm=120, tpm=1200, clock=clock, sleep=clock.sleep)
+
+    async def main():
+        for _ in range(120):
+            await limiter.acquire(10)
+        assert clock.now == 0  # a minute's allowance is available up front
+        await limiter.acquire(10)
+        assert clock.now == pytest.approx(0.5)  # then one request every half second
+        await limiter.acquire(600)
+        assert clock.now == pytest.approx(30.5)  # tokens are the tighter limit here
+        limiter.pause(5)
+        await limiter.acquire(1)
+        assert clock.now == pytest.approx(35.5)
+
+    asyncio.run(main())
+
+
+def _rate_limit_error(headers):
+    request = httpx.Request("POST", "http://stub/v1/embeddings")
+    return RateLimitError("slow down", response=httpx.Response(429, headers=headers, request=request), body=None)
+
+
+def test_retry_after_reads_seconds_milliseconds_and_dates():
+    assert retry_after(_rate_limit_error({"retry-after": "2"})) == 2.0
+    assert retry_after(_rate_limit_error({"retry-after-ms": "250", "retry-after": "2"})) == 0.25
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 28 <= retry_after(_rate_limit_error({"retry-after": later})) <= 30
+    assert retry_after(_rate_limit_error({})) is None
+    assert retry_after(ValueError("no response")) is None
+
+
+def test_pipeline_embeds_every_row_concurrently(stub_server):
+    server = stub_server()
+    rows = [(f"id-{i}", f"text {i}") for i in range(10)]
+    stored = []
+
+    with patch("src.processors.embedding_processor.settings",
+               SimpleNamespace(embedding_batch_size=3, embedding_batch_tokens=100000, embedding_progress_s=60)):
+        progress = _run_pipeline(server, rows, stored, concurrency=3)
+
+    assert progress.stored == 10 and progress.failed == 0
+    assert progress.requests == 4
+    assert sorted(len(texts) for texts in server.requests) == [1, 3, 3, 3]
+    assert dict(stored)["id-7"] == [6.0, 1.0]  # "text 7" at position 1 of [6, 7, 8]
 
 
-@patch("src.processors.embedding_processor.release_connection")
-@patch("src.processors.embedding_processor.get_connection")
-@patch("src.processors.embedding_processor.generate_embedding", return_value=[0.1, 0.2])
-@patch("src.processors.embedding_processor.get_client")
-def test_process_lessons_updates_db(mock_get_client, mock_gen_embed, mock_get_conn, mock_release):
-    mock_client = MagicMock()
-    mock_get_client.return_value = mock_client
+def test_pipeline_waits_out_rate_limits(stub_server):
+    server = stub_server(rate_limited=2, retry_after="0.05")
+    rows = [(f"id-{i}", f"text {i}") for i in range(4)]
+    stored = []
 
+    with patch("src.processors.embedding_processor.settings",
+               SimpleNamespace(embedding_batch_size=2, embedding_batch_tokens=100000, embedding_progress_s=60)):
+        progress = _run_pipeline(server, rows, stored)
+
+    assert progress.stored == 4
+    assert progress.rate_limited == 2
+    assert len(server.requests) == 4
+    assert sorted(row_id for row_id, _ in stored) == [f"id-{i}" for i in range(4)]
+
+
+def test_pipeline_gives_up_after_max_attempts(stub_server):
+    server = stub_server(rate_limited=100, retry_after="0")
+    stored = []
+
+    with patch("src.processors.embedding_processor.settings",
+               SimpleNamespace(embedding_batch_size=10, embedding_batch_tokens=100000, embedding_progress_s=60)):
+        progress = _run_pipeline(server, [("id-0", "text 0"), ("id-1", "text 1")], stored, max_attempts=3)
+
+    assert progress.failed == 2 and progress.stored == 0
+    # Rate limits are not a reason to split the batch
+    assert server.requests == [["text 0", "text 1"]] * 3
+    assert stored == []
+
+
+def test_pipeline_splits_around_rejected_rows(stub_server):
+    server = stub_server(bad={"text 2"})
+    rows = [(f"id-{i}", f"text {i}") for i in range(4)]
+    stored, failed = [], []
+
+    with patch("src.processors.embedding_processor.settings",
+               SimpleNamespace(embedding_batch_size=4, embedding_batch_tokens=100000, embedding_progress_s=60)):
+        progress = _run_pipeline(server, rows, stored, failed=failed, concurrency=1)
+
+    assert progress.stored == 3 and progress.failed == 1
+    # Only the row rejected on its own is backed off
+    assert failed == ["id-2"]
+    assert [row_id for row_id, _ in stored] == ["id-0", "id-1", "id-3"]
+    # Whole batch, then [0, 1] and [2, 3], then [2] and [3]
+    assert server.requests == [["text 0", "text 1", "text 2", "text 3"], ["text 0", "text 1"],
+                               ["text 2", "text 3"], ["text 2"], ["text 3"]]
+
+
+def test_pipeline_embeds_duplicate_text_once(stub_server):
+    server = stub_server()
+    rows = [("id-0", "What is 2 + 2?"), ("id-1", "What is  2 + 2? "), ("id-2", "Name a planet"),
+            ("id-3", "Capital of France?")]
+    stored = []
+
+    with patch("src.processors.embedding_processor.settings",
+               SimpleNamespace(embedding_batch_size=10, embedding_batch_tokens=100000, embedding_progress_s=60)):
+        progress = _run_pipeline(server, rows, stored, cached={text_hash("Capital of France?"): [9.0, 9.0]})
+
+    assert server.requests == [["What is 2 + 2?", "Name a planet"]]
+    assert dict(stored) == {"id-0": [14.0, 0.0], "id-1": [14.0, 0.0], "id-2": [13.0, 1.0], "id-3": [9.0, 9.0]}
+    assert (progress.cache_hits, progress.cache_misses) == (2, 2)
+    assert "cache 2 hits / 2 misses" in progress.summary()
+
+
+@patch("src.processors.embedding_processor._cached", return_value={})
+@patch("src.processors.embedding_processor._release")
+@patch("src.processors.embedding_processor._connect")
+@patch("src.processors.embedding_processor.embedding_cache.store")
+@patch("src.processors.embedding_processor.vectors.copy_embeddings")
+def test_process_lessons_batches_rows(mock_copy_embeddings, mock_cache_store, mock_get_conn, mock_release,
+                                      mock_cached, stub_server):
+    server = stub_server()
     mock_cursor = MagicMock()
-    mock_cursor.fetchall.return_value = [
+    rows = [
         (1, "Intro to Math", "Numbers are fun"),
         (2, "Intro to Science", "Atoms are small"),
     ]
+    mock_cursor.fetchall.side_effect = [rows, []]
     mock_conn = MagicMock()
     mock_conn.cursor.return_value.__enter__ = MagicMock(return_value=mock_cursor)
     mock_conn.cursor.return_value.__exit__ = MagicMock(return_value=False)
     mock_get_conn.return_value = mock_conn
 
-    process_lessons()
+    async def main():
+        pipeline = _pipeline(server)
+        try:
+            return await process_lessons(pipeline)
+        finally:
+            await pipeline.client.close()
+
+    progress = asyncio.run(main())
+
+    assert isinstance(progress, Progress) and progress.stored == 2
+    # One embeddings request and one UPDATE for both lessons
+    assert server.requests == [["Intro to Math\n\nNumbers are fun", "Intro to Science\n\nAtoms are small"]]
+    mock_copy_embeddings.assert_called_once()
+    table, ids, embeddings = mock_copy_embeddings.call_args.args[1:]
+    assert (table, ids) == ("lessons", [1, 2])
+    assert embeddings[0] == array("f", [30.0, 0.0])
+    assert mock_release.call_count == 3  # two pages and the UPDATE
+    # The second page starts after the last id of the first
+    assert mock_cursor.execute.call_args.args[1] == ("2", 2000)
+    # Both texts are cached in the UPDATE's transaction
+    assert set(mock_cache_store.call_args.args[2]) == {text_hash("Intro to Math\n\nNumbers are fun"),
+                                                       text_hash("Intro to Science\n\nAtoms are small")}
+
+
+def test_process_pages_through_rows_by_id():
+    pages = [[("a", "one"), ("b", "two")], [("c", "three")], []]
+    fetched = []
+
+    def fetch_page(select_sql, after):
+        fetched.append(after)
+        return pages[len(fetched) - 1]
+
+    pipeline = MagicMock()
+    pipeline.run = AsyncMock()
+    with patch("src.processors.embedding_processor._fetch_page", side_effect=fetch_page) as mock_fetch:
+        progress = asyncio.run(process_lessons(pipeline))
+
+    select_sql = mock_fetch.call_args.args[0]
+    assert "WHERE embedding IS NULL AND id > %s " in select_sql and select_sql.endswith("ORDER BY id LIMIT %s")
+    # Rows still backing off after failing on their own are left out
+    assert "embedding_failures" in select_sql
+    assert fetched == [uuid.UUID(int=0), "b", "c"]
+    assert progress.total == 3
+    assert [call.args[1] for call in pipeline.run.call_args_list] == pages[:2]
+
+
+@patch("src.processors.embedding_processor.vector_index.maintain_indexes", return_value={"lessons": "up to date"})
+@patch("src.processors.embedding_processor.backfill", new_callable=AsyncMock)
+@patch("src.processors.embedding_processor._unlock")
+@patch("src.processors.embedding_processor._try_lock")
+def test_locked_backfill_runs_only_with_the_lock(mock_try_lock, mock_unlock, mock_backfill, mock_maintain_indexes):
+    mock_try_lock.return_value = None
+    assert asyncio.run(locked_backfill(MagicMock())) is None
+    mock_backfill.assert_not_called()
+
+    conn = MagicMock()
+    mock_try_lock.return_value = conn
+    done = [Progress("lessons", 0), Progress("quiz_questions", 0)]
+    mock_backfill.return_value = done
+    assert asyncio.run(locked_backfill(MagicMock())) == done
+    mock_unlock.assert_called_once_with(conn)
+    # Nothing was stored, so the indexes can't have changed
+    mock_maintain_indexes.assert_not_called()
+
+    done[1].stored = 5
+    asyncio.run(locked_backfill(MagicMock()))
+    mock_maintain_indexes.assert_called_once_with()
+
+
+class FakeListenConnection:
+    """psycopg2 connection stand-in: each byte written to `peer` is one NOTIFY; closing `peer` drops it."""
+
+    def __init__(self):
+        self.sock, self.peer = socket.socketpair()
+        self.notifies = []
+        self.closed = 0
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def set_isolation_level(self, level):
+        pass
+
+    def cursor(self):
+        return MagicMock()
+
+    def poll(self):
+        data = self.sock.recv(64)
+        if not data:
+            self.closed = 2
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        self.notifies.extend(data)
+
+    def close(self):
+        if not self.closed:
+            self.closed = 1
+            self.sock.close()
+
+
+def test_content_listener_wakes_on_notify_and_survives_a_dropped_connection():
+    conn = FakeListenConnection()
+
+    async def main():
+        listener = ContentListener()
+        with patch("src.processors.embedding_processor.psycopg2.connect", return_value=conn):
+            await listener.connect()
+        assert listener.connected
+        assert await listener.wait(0.01) is False
+
+        conn.peer.send(b"x")
+        assert await listener.wait(1) is True
+        assert conn.notifies == []
+        listener.clear()
+
+        conn.peer.close()
+        assert await listener.wait(0.05) is False
+        assert not listener.connected
+        # The dead descriptor is no longer watched
+        assert not asyncio.get_running_loop().remove_reader(conn.fileno())
+        conn.sock.close()
+
+    asyncio.run(main())
+
+
+def test_maintain_embeddings_backfills_on_each_wake_until_cancelled():
+    listener = MagicMock()
+    listener.connect = AsyncMock()
+    listener.wait = AsyncMock(side_effect=[True, False, asyncio.CancelledError()])
+    client = MagicMock()
+    client.close = AsyncMock()
+    passes = AsyncMock(side_effect=[RuntimeError("database down"), [], []])
+
+    with patch("src.processors.embedding_processor.get_client", return_value=client), \
+            patch("src.processors.embedding_processor.build_pipeline"), \
+            patch("src.processors.embedding_processor.locked_backfill", passes):
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(maintain_embeddings(60, listener))
 
-    # Should have called generate_embedding for each row
-    assert mock_gen_embed.call_count == 2
-    # Should have called UPDATE for each row
-    assert mock_cursor.execute.call_count == 3  # 1 SELECT + 2 UPDATEs
-    mock_release.assert_called_once_with(mock_conn)
+    # A failed pass doesn't end the loop
+    assert passes.await_count == 3
+    assert listener.connect.await_count == 3 and listener.clear.call_count == 3
+    listener.wait.assert_awaited_with(60)
+    listener.close.assert_called_once()
+    client.close.assert_awaited_once()
@@ -1,10 +1,26 @@
+import asyncio
+import queue
 from unittest.mock import patch
 
-from src.processors.event_processor import validate_event, enrich_event, process_event
+import pytest
+
+from src.db.repository import ANSWER_COLUMNS
+from src.processors.dedupe import seen_events
+from src.processors.event_processor import validate_event, enrich_event, process_batch, process_event
+
+QUIZ_ID = "5b0e4c1e-9c55-4a51-8a4c-2f1d3c6b7a01"
+QUESTION_ID = "8f2d6a3b-1e4f-4c7d-9a2b-6c5d4e3f2a10"
+
+
+@pytest.fixture(autouse=True)
+def clear_seen_events():
+    seen_events.clear()
+    yield
+    seen_events.clear()
 
 
 def test_validate_event_valid():
-    event = {"event_type": "quiz_answer", "payload": {"quiz_id": "abc"}}
+    event = {"event_type": "lesson_view", "payload": {"lesson_id": "abc"}}
     assert validate_event(event) is True
 
 
@@ -18,6 +34,21 @@ def test_validate_event_bad_payload():
     assert validate_event(event) is False
 
 
+def test_validate_event_rejects_malformed_quiz_answer():
+    payload = {"quiz_id": QUIZ_ID, "question_id": QUESTION_ID, "selected_answer": "A", "is_correct": True}
+    assert validate_event({"event_type": "quiz_answer", "payload": payload}) is True
+    assert validate_event({"event_type": "quiz_answer", "payload": {**payload, "is_correct": "yes"}}) is False
+    assert validate_event({"event_type": "quiz_answer", "payload": {**payload, "quiz_id": "q1"}}) is False
+    assert validate_event({"event_type": "quiz_answer", "payload": {**payload, "time_spent_ms": True}}) is False
+    del payload["selected_answer"]
+    assert validate_event({"event_type": "quiz_answer", "payload": payload}) is False
+
+
+def test_validate_event_unregistered_type_only_needs_dict_payload():
+    assert validate_event({"event_type": "badge_earned", "payload": {"anything": [1, 2]}}) is True
+    assert validate_event({"event_type": ["lesson_view"], "payload": {}}) is False
+
+
 def test_enrich_event_adds_processed_at():
     event = {"event_type": "test", "payload": {}}
     enriched = enrich_event(event)
@@ -41,14 +72,14 @@ def test_process_event_stores_raw(mock_insert):
     assert call_kwargs["user_id"] == "u1"
 
 
-@patch("src.processors.event_processor.insert_quiz_answer", return_value="ans-1")
 @patch("src.processors.event_processor.insert_learning_event", return_value="evt-456")
-def test_process_event_quiz_answer_denormalizes(mock_insert_event, mock_insert_answer):
+def test_process_event_quiz_answer_denormalizes(mock_insert_event):
     event = {
+        "id": "evt-456",
         "event_type": "quiz_answer",
         "payload": {
-            "quiz_id": "q1",
-            "question_id": "qq1",
+            "quiz_id": QUIZ_ID,
+            "question_id": QUESTION_ID,
             "selected_answer": "Water",
             "is_correct": True,
             "time_spent_ms": 1500,
@@ -57,23 +88,24 @@ def test_process_event_quiz_answer_denormalizes(mock_insert_event, mock_insert_a
     }
     process_event(event)
     mock_insert_event.assert_called_once()
-    mock_insert_answer.assert_called_once()
-    ans_kwargs = mock_insert_answer.call_args[1]
-    assert ans_kwargs["quiz_id"] == "q1"
-    assert ans_kwargs["is_correct"] is True
-    assert ans_kwargs["event_id"] == "evt-456"
+    # The answer goes in with its event, in one transaction
+    answer = dict(zip(ANSWER_COLUMNS, mock_insert_event.call_args[1]["answer"]))
+    assert answer["quiz_id"] == QUIZ_ID
+    assert answer["is_correct"] is True
+    assert answer["event_id"] == "evt-456"
 
 
-@patch("src.processors.event_processor.insert_quiz_answer")
 @patch("src.processors.event_processor.insert_learning_event", return_value="evt-789")
-def test_process_event_non_quiz_no_denormalize(mock_insert_event, mock_insert_answer):
+def test_process_event_non_quiz_no_denormalize(mock_insert_event):
     event = {
         "event_type": "lesson_view",
         "payload": {"lesson_id": "L2"},
     }
     process_event(event)
-    mock_insert_event.assert_called_once()
-    mock_insert_answer.assert_not_called()
+    kwargs = mock_insert_event.call_args[1]
+    assert kwargs["answer"] is None
+    # Events without an id get one assigned client-side
+    assert kwargs["event_id"]
 
 
 def test_process_event_invalid_skips():
@@ -81,3 +113,116 @@ def test_process_event_invalid_skips():
     event = {"payload": {"x": 1}}
     # Should not raise
     process_event(event)
+
+
+# --- process_batch tests ---
+
+
+@patch("src.processors.event_processor.insert_event_batch")
+def test_process_batch_links_answers_to_events(mock_insert_batch):
+    mock_insert_batch.side_effect = lambda events, answers: {row[0] for row in events}
+    events = [
+        {
+            "id": "evt-1",
+            "event_type": "quiz_answer",
+            "payload": {
+                "quiz_id": QUIZ_ID,
+                "question_id": QUESTION_ID,
+                "selected_answer": "Water",
+                "is_correct": True,
+            },
+            "user_id": "u1",
+        },
+        {"event_type": "lesson_view", "payload": {"lesson_id": "L1"}, "user_id": "u1"},
+        {"payload": {"x": 1}},  # invalid, dropped
+    ]
+    stored = process_batch(events)
+
+    assert stored == 2
+    mock_insert_batch.assert_called_once()
+    event_rows, answer_rows = mock_insert_batch.call_args[0]
+    assert [row[0] for row in event_rows][0] == "evt-1"
+    # Events without an id get one assigned client-side
+    assert event_rows[1][0]
+    assert len(answer_rows) == 1
+    assert answer_rows[0][ANSWER_COLUMNS.index("event_id")] == "evt-1"
+
+
+@patch("src.processors.event_processor.insert_event_batch")
+def test_process_batch_all_invalid_skips_db(mock_insert_batch):
+    assert process_batch([{"payload": {}}]) == 0
+    mock_insert_batch.assert_not_called()
+
+
+@patch("src.processors.event_processor.insert_event_batch")
+def test_process_batch_passes_raw_json_through(mock_insert_batch):
+    raw = '{"event_type": "lesson_view", "payload": {"lesson_id": "L1"}}'
+    process_batch([{"event_type": "lesson_view", "payload": {"lesson_id": "L1"}, "_raw": raw}])
+
+    event_rows, _ = mock_insert_batch.call_args[0]
+    assert event_rows[0][-1] == raw
+
+
+# --- dedupe tests ---
+
+
+@patch("src.processors.event_processor.insert_learning_event", return_value="evt-dup")
+def test_process_event_skips_recently_stored_id(mock_insert):
+    event = {"id": "evt-dup", "event_type": "lesson_view", "payload": {}}
+    process_event(dict(event))
+    process_event(dict(event))
+    mock_insert.assert_called_once()
+
+
+@patch("src.processors.event_processor.insert_learning_event", return_value=None)
+def test_process_event_conflict_marks_seen(mock_insert_event):
+    event = {
+        "id": "evt-old",
+        "event_type": "quiz_answer",
+        "payload": {"quiz_id": QUIZ_ID, "question_id": QUESTION_ID, "selected_answer": "A", "is_correct": False},
+        "user_id": "u1",
+    }
+    process_event(event)
+    mock_insert_event.assert_called_once()
+    assert "evt-old" in seen_events
+
+
+@patch("src.processors.event_processor.insert_event_batch")
+def test_process_batch_drops_in_batch_and_cached_duplicates(mock_insert_batch):
+    mock_insert_batch.side_effect = lambda events, answers: {row[0] for row in events}
+    seen_events.add("evt-cached")
+    events = [
+        {"id": "evt-a", "event_type": "lesson_view", "payload": {}},
+        {"id": "evt-a", "event_type": "lesson_view", "payload": {}},
+        {"id": "evt-cached", "event_type": "lesson_view", "payload": {}},
+    ]
+
+    assert process_batch(events) == 1
+    event_rows, _ = mock_insert_batch.call_args[0]
+    assert [row[0] for row in event_rows] == ["evt-a"]
+
+
+@patch("src.processors.event_processor.insert_learning_event", return_value="evt-1")
+@patch("src.processors.event_processor.insert_event_batch", side_effect=RuntimeError("deadlock"))
+def test_received_counted_once_at_intake_not_per_replay(mock_insert_batch, mock_insert_event):
+    from src import main as worker
+    from src.consumers.queue import QueueConsumer
+    from src.metrics import EVENTS_RECEIVED
+    from src.processors.batch_sink import BatchSink
+
+    events = queue.Queue()
+    for _ in range(3):
+        events.put({"event_type": "counted_once", "payload": {}})
+    events.put(None)
+    received = EVENTS_RECEIVED.labels("counted_once")
+    before = received.value
+
+    async def main():
+        return [event async for event in worker.receive(QueueConsumer(events, queue.Queue()))]
+
+    batch = asyncio.run(main())
+    # The failed batch is replayed event by event, validating each one again
+    BatchSink().write(batch)
+
+    assert mock_insert_event.call_count == 3
+    assert received.value - before == 3
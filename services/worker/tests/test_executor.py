@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+
+from src.processors.executor import BoundedExecutor
+
+
+def test_submit_bounds_in_flight_calls():
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def work():
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.02)
+        with lock:
+            active -= 1
+
+    async def main():
+        executor = BoundedExecutor(limit=3)
+        for _ in range(10):
+            await executor.submit(work)
+            assert executor.in_flight <= 3
+        await executor.drain()
+        assert executor.in_flight == 0
+        executor.shutdown()
+
+    asyncio.run(main())
+    assert peak == 3
+
+
+def test_submit_does_not_block_event_loop():
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(1)
+
+    async def main():
+        executor = BoundedExecutor(limit=2)
+        await executor.submit(blocking)
+        # The loop stays responsive while the call waits on its thread
+        await asyncio.sleep(0.01)
+        assert started.is_set()
+        assert executor.in_flight == 1
+        release.set()
+        await executor.drain()
+        executor.shutdown()
+
+    asyncio.run(main())
+
+
+def test_failed_call_releases_slot():
+    def boom():
+        raise RuntimeError("db down")
+
+    async def main():
+        executor = BoundedExecutor(limit=1)
+        await executor.submit(boom)
+        await executor.drain()
+        # A second submit would hang if the failed call leaked its slot
+        await asyncio.wait_for(executor.submit(lambda: None), timeout=1)
+        await executor.drain()
+        executor.shutdown()
+
+    asyncio.run(main())
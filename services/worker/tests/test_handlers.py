@@ -0,0 +1,47 @@
+from uuid import UUID, uuid4
+
+from src.metrics import EVENTS_REJECTED
+from src.processors.event_processor import build_batch_rows
+from src.processors.handlers import FALLBACK, HANDLERS, compile_validator, get_handler, register
+
+
+def test_compiled_validator_checks_types_and_presence():
+    validate = compile_validator(required={"id": UUID, "n": int}, optional={"note": str})
+
+    assert validate({"id": str(uuid4()), "n": 3}) is None
+    assert validate({"id": uuid4(), "n": 3, "note": None, "extra": object()}) is None
+    assert validate({"n": 3}) == "missing id"
+    assert validate({"id": "nope", "n": 3}).startswith("id must be UUID")
+    assert validate({"id": str(uuid4()), "n": False}).startswith("n must be int")
+    assert validate({"id": str(uuid4()), "n": 1, "note": 5}).startswith("note must be str")
+
+
+def test_get_handler_falls_back_for_unknown_types():
+    assert get_handler("quiz_answer") is HANDLERS["quiz_answer"]
+    assert get_handler("never_registered") is FALLBACK
+    assert get_handler(None) is FALLBACK
+
+
+def test_registered_type_plugs_into_batch_rows():
+    register(
+        "practice_answer",
+        required={"quiz_id": UUID, "question_id": UUID, "selected_answer": str, "is_correct": bool},
+        answer_row=lambda event, event_id: (
+            event.get("user_id"), event["payload"]["quiz_id"], event["payload"]["question_id"],
+            event["payload"]["selected_answer"], event["payload"]["is_correct"], None, 0, event_id, None, None,
+        ),
+    )
+    try:
+        payload = {"quiz_id": str(uuid4()), "question_id": str(uuid4()), "selected_answer": "B", "is_correct": False}
+        before = EVENTS_REJECTED.labels("practice_answer").value
+        event_rows, answer_rows, _ = build_batch_rows(
+            [
+                {"id": str(uuid4()), "event_type": "practice_answer", "payload": payload},
+                {"id": str(uuid4()), "event_type": "practice_answer", "payload": {"is_correct": True}},
+            ]
+        )
+        assert len(event_rows) == 1
+        assert answer_rows[0][7] == event_rows[0][0]
+        assert EVENTS_REJECTED.labels("practice_answer").value == before + 1
+    finally:
+        del HANDLERS["practice_answer"]
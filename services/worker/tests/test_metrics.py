@@ -0,0 +1,66 @@
+import urllib.request
+
+from src.metrics import MAX_LABEL_VALUES, Counter, Histogram, Registry, event_type_label, start_http_server
+
+
+def test_counter_renders_per_label():
+    registry = Registry()
+    events = registry.register(Counter("events_total", "Events", ["event_type"]))
+    events.labels("quiz_answer").inc()
+    events.labels("quiz_answer").inc(2)
+    events.labels("lesson_view").inc()
+
+    text = registry.render()
+
+    assert "# TYPE events_total counter" in text
+    assert 'events_total{event_type="quiz_answer"} 3.0' in text
+    assert 'events_total{event_type="lesson_view"} 1.0' in text
+
+
+def test_label_children_are_reused():
+    events = Counter("events_total", "Events", ["event_type"])
+    assert events.labels("a") is events.labels("a")
+
+
+def test_label_overflow_folds_into_other():
+    events = Counter("events_total", "Events", ["event_type"])
+    for i in range(MAX_LABEL_VALUES + 10):
+        events.labels(f"type-{i}").inc()
+
+    assert len(events._children) == MAX_LABEL_VALUES + 1
+    assert events.labels("other").value == 10
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.register(Histogram("latency_seconds", "Latency", buckets=(0.01, 0.1)))
+    for value in (0.005, 0.05, 0.05, 5.0):
+        latency.observe(value)
+
+    text = registry.render()
+
+    assert 'latency_seconds_bucket{le="0.01"} 1' in text
+    assert 'latency_seconds_bucket{le="0.1"} 3' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+    assert "latency_seconds_count 4" in text
+
+
+def test_event_type_label_tolerates_malformed_events():
+    assert event_type_label({"event_type": "quiz_answer"}) == "quiz_answer"
+    assert event_type_label({"event_type": ["x"]}) == "unknown"
+    assert event_type_label({}) == "unknown"
+
+
+def test_http_server_serves_metrics():
+    registry = Registry()
+    registry.register(Counter("up_total", "Up")).inc()
+    server = start_http_server(0, registry)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as resp:
+            body = resp.read().decode()
+        assert resp.status == 200
+        assert "up_total 1.0" in body
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,136 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.db.partitions import (
+    add_periods,
+    ensure_partitions,
+    expired_partitions,
+    partition_default_rows,
+    partition_name,
+    period_start,
+    roll_up,
+    run_maintenance,
+)
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def _sql_text(cur) -> list[str]:
+    """Executed statements with composed SQL rendered to plain text."""
+    texts = []
+    for call in cur.execute.call_args_list:
+        statement = call.args[0]
+        texts.append(statement if isinstance(statement, str) else repr(statement))
+    return texts
+
+
+def test_period_start_per_interval():
+    when = utc(2026, 10, 18, 15, 30)  # a Sunday
+    assert period_start(when, "day") == utc(2026, 10, 18)
+    assert period_start(when, "week") == utc(2026, 10, 12)
+    assert period_start(when, "month") == utc(2026, 10, 1)
+    with pytest.raises(ValueError):
+        period_start(when, "year")
+
+
+def test_add_periods_crosses_year_boundaries():
+    assert add_periods(utc(2026, 11, 1), "month", 2) == utc(2027, 1, 1)
+    assert add_periods(utc(2026, 1, 1), "month", -12) == utc(2025, 1, 1)
+    assert add_periods(utc(2026, 10, 12), "week", -1) == utc(2026, 10, 5)
+    assert partition_name(utc(2026, 10, 1)) == "learning_events_p20261001"
+
+
+def test_ensure_partitions_creates_only_missing_ones():
+    cur = MagicMock()
+    # Current month exists, the next two do not
+    cur.fetchone.side_effect = [("learning_events_p20261001",), (None,), (None,)]
+
+    created = ensure_partitions(cur, utc(2026, 10, 18), "month", ahead=2)
+
+    assert created == ["learning_events_p20261101", "learning_events_p20261201"]
+    statements = _sql_text(cur)
+    assert sum("ATTACH PARTITION" in s for s in statements) == 2
+    # Rows already in the default partition are moved before attaching
+    attaches = [c.args[1] for c in cur.execute.call_args_list if "ATTACH PARTITION" in repr(c.args[0])]
+    assert attaches == [(utc(2026, 11, 1), utc(2026, 12, 1)), (utc(2026, 12, 1), utc(2027, 1, 1))]
+
+
+def test_partition_default_rows_creates_past_periods_to_be_rolled_up():
+    cur = MagicMock()
+    # Replayed events from two old months; the second month's table is detached, awaiting rollup
+    cur.fetchall.return_value = [(datetime(2024, 3, 1),), (datetime(2024, 5, 1),)]
+    cur.fetchone.side_effect = [(None,), ("learning_events_p20240501",)]
+
+    assert partition_default_rows(cur, "month") == ["learning_events_p20240301"]
+    assert cur.execute.call_args_list[0].args[1] == ("month",)
+    attaches = [c.args[1] for c in cur.execute.call_args_list if "ATTACH PARTITION" in repr(c.args[0])]
+    assert attaches == [(utc(2024, 3, 1), utc(2024, 4, 1))]
+
+
+def test_expired_partitions_filters_by_upper_bound():
+    cur = MagicMock()
+    cur.fetchall.return_value = [
+        ("learning_events_p20250901", utc(2025, 9, 1), utc(2025, 10, 1)),
+        ("learning_events_p20251001", utc(2025, 10, 1), utc(2025, 11, 1)),
+    ]
+    assert [name for name, _, _ in expired_partitions(cur, utc(2025, 10, 1))] == ["learning_events_p20250901"]
+
+
+def test_roll_up_drops_or_archives():
+    cur = MagicMock()
+    roll_up(cur, "learning_events_p20250901", drop=True)
+    statements = _sql_text(cur)
+    assert "learning_event_rollups" in statements[0]
+    assert "DROP TABLE" in statements[1]
+
+    cur = MagicMock()
+    roll_up(cur, "learning_events_p20250901", drop=False)
+    assert "learning_events_p20250901_archived" in _sql_text(cur)[1]
+
+
+@patch("src.db.partitions.release_connection")
+@patch("src.db.partitions.get_connection")
+def test_run_maintenance_skips_when_lock_is_held(mock_get_conn, _release):
+    cur = MagicMock()
+    cur.fetchone.return_value = (False,)
+    conn = MagicMock()
+    conn.cursor.return_value.__enter__.return_value = cur
+    mock_get_conn.return_value = conn
+
+    assert run_maintenance(utc(2026, 10, 18)) == {"created": [], "retired": []}
+    cur.execute.assert_called_once()
+    conn.commit.assert_not_called()
+
+
+@patch("src.db.partitions.roll_up")
+@patch("src.db.partitions.detached_partitions", return_value=["learning_events_p20250901"])
+@patch("src.db.partitions.detach_partition")
+@patch("src.db.partitions.expired_partitions")
+@patch("src.db.partitions.ensure_partitions", return_value=[])
+@patch("src.db.partitions.try_lock", return_value=True)
+@patch("src.db.partitions.release_connection")
+@patch("src.db.partitions.get_connection")
+def test_run_maintenance_detaches_then_rolls_up(
+    mock_get_conn, _release, _lock, _ensure, mock_expired, mock_detach, _detached, mock_roll_up
+):
+    conn = MagicMock()
+    mock_get_conn.return_value = conn
+    mock_expired.return_value = [("learning_events_p20250901", utc(2025, 9, 1), utc(2025, 10, 1))]
+
+    with patch("src.db.partitions.settings") as settings:
+        settings.partition_interval = "month"
+        settings.partition_retention = 12
+        settings.partitions_ahead = 2
+        settings.partition_drop = True
+        result = run_maintenance(utc(2026, 10, 18))
+
+    assert mock_expired.call_args.args[1] == utc(2025, 10, 1)
+    assert mock_detach.call_args.args[1] == "learning_events_p20250901"
+    mock_roll_up.assert_called_once()
+    assert result["retired"] == ["learning_events_p20250901"]
+    # One commit for create+detach, one per rolled-up partition
+    assert conn.commit.call_count == 2
@@ -0,0 +1,73 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+from redis.exceptions import ResponseError
+
+from src.consumers.redis_stream import STREAM_ID_KEY, RedisStreamConsumer
+
+
+def _make_consumer(mock_aioredis):
+    mock_redis = AsyncMock()
+    mock_aioredis.from_url.return_value = mock_redis
+    return RedisStreamConsumer(group="workers", name="w1"), mock_redis
+
+
+async def _take(consumer, n):
+    events = []
+    async for event in consumer.listen():
+        events.append(event)
+        if len(events) == n:
+            break
+    return events
+
+
+@patch("src.consumers.redis_stream.aioredis")
+def test_subscribe_tolerates_existing_group(mock_aioredis):
+    consumer, mock_redis = _make_consumer(mock_aioredis)
+    mock_redis.xgroup_create.side_effect = ResponseError("BUSYGROUP Consumer Group name already exists")
+
+    asyncio.run(consumer.subscribe("learning-events"))
+
+    mock_redis.xgroup_create.assert_awaited_once_with(
+        "learning-events", "workers", id="0", mkstream=True
+    )
+
+
+@patch("src.consumers.redis_stream.aioredis")
+def test_listen_claims_then_reads_and_acks(mock_aioredis):
+    consumer, mock_redis = _make_consumer(mock_aioredis)
+    claimed = {b"data": json.dumps({"event_type": "lesson_view", "payload": {}}).encode()}
+    fresh = {b"data": json.dumps({"event_type": "quiz_answer", "payload": {}}).encode()}
+    mock_redis.xautoclaim.return_value = [b"0-0", [(b"1-0", claimed)], []]
+    mock_redis.xreadgroup.return_value = [[b"learning-events", [(b"2-0", fresh)]]]
+
+    async def main():
+        await consumer.subscribe("learning-events")
+        events = await _take(consumer, 2)
+        await consumer.ack(events)
+        return events
+
+    events = asyncio.run(main())
+
+    assert [e["event_type"] for e in events] == ["lesson_view", "quiz_answer"]
+    assert all(STREAM_ID_KEY not in e for e in events)
+    mock_redis.xack.assert_awaited_once_with("learning-events", "workers", b"1-0", b"2-0")
+    assert mock_redis.xreadgroup.call_args[0][2] == {"learning-events": ">"}
+
+
+@patch("src.consumers.redis_stream.aioredis")
+def test_invalid_entry_is_acked_and_skipped(mock_aioredis):
+    consumer, mock_redis = _make_consumer(mock_aioredis)
+    good = {b"data": json.dumps({"event_type": "x", "payload": {}}).encode()}
+    mock_redis.xautoclaim.return_value = [b"0-0", [], []]
+    mock_redis.xreadgroup.return_value = [[b"learning-events", [(b"1-0", {b"data": b"not json"}), (b"2-0", good)]]]
+
+    async def main():
+        await consumer.subscribe("learning-events")
+        return await _take(consumer, 1)
+
+    events = asyncio.run(main())
+
+    assert events[0][STREAM_ID_KEY] == b"2-0"
+    mock_redis.xack.assert_awaited_once_with("learning-events", "workers", b"1-0")
@@ -0,0 +1,58 @@
+import io
+import json
+from unittest.mock import patch
+
+from src.codec import RAW_KEY
+from src.db.repository import _copy_buffer
+from src.replay import read_chunks, replay
+
+
+def _ndjson(events) -> bytes:
+    return b"".join(json.dumps(e).encode() + b"\n" for e in events)
+
+
+EVENTS = [
+    {"id": f"00000000-0000-0000-0000-00000000000{i}", "event_type": "lesson_view", "payload": {"n": i}}
+    for i in range(5)
+]
+
+
+def test_read_chunks_tracks_offsets_and_resumes():
+    data = _ndjson(EVENTS)
+    chunks = list(read_chunks(io.BytesIO(data), chunk_size=2))
+
+    assert [len(events) for events, _, _ in chunks] == [2, 2, 1]
+    assert chunks[-1][2] == len(data)
+    assert chunks[0][0][0][RAW_KEY] == json.dumps(EVENTS[0])
+
+    # Resuming at the first chunk's end offset yields only the remaining events
+    resumed = list(read_chunks(io.BytesIO(data), chunk_size=10, offset=chunks[0][2]))
+    assert [e["payload"]["n"] for e in resumed[0][0]] == [2, 3, 4]
+
+
+def test_read_chunks_skips_blank_and_bad_lines():
+    data = b"\n" + b"not json\n" + _ndjson(EVENTS[:1])
+    ((events, lines, end),) = list(read_chunks(io.BytesIO(data), chunk_size=10))
+    assert lines == 3
+    assert len(events) == 1
+    assert end == len(data)
+
+
+@patch("src.replay.copy_event_batch", side_effect=lambda events, answers: len(events))
+def test_replay_loads_chunks_and_writes_checkpoint(mock_copy, tmp_path):
+    path = tmp_path / "events.ndjson"
+    path.write_bytes(_ndjson(EVENTS + [{"payload": {}}]))  # last one is invalid
+    checkpoint = tmp_path / "offset"
+
+    stats = replay(path, chunk_size=4, checkpoint=checkpoint)
+
+    assert mock_copy.call_count == 2
+    assert stats.lines == 6
+    assert stats.loaded == 5
+    assert stats.skipped == 1
+    assert int(checkpoint.read_text()) == path.stat().st_size
+
+
+def test_copy_buffer_escapes_text_format():
+    buffer = _copy_buffer([("a\tb", None, True, 'x\\y\nz')])
+    assert buffer.read() == "a\\tb\t\\N\tt\tx\\\\y\\nz\n"
@@ -0,0 +1,151 @@
+import asyncio
+import json
+from unittest.mock import MagicMock, patch
+
+from src.dead_letters import DeadLetterStore, main as dead_letters_main
+from src.processors.executor import BoundedExecutor
+from src.processors.retry import RetryScheduler
+
+
+class FakeDeadLetters:
+    def __init__(self):
+        self.entries = []
+
+    def push(self, event, error, attempts):
+        self.entries.append((event, error, attempts))
+
+
+def _scheduler(**kwargs):
+    dead_letters = FakeDeadLetters()
+    options = dict(max_attempts=3, base_delay_ms=1, max_delay_ms=4, max_pending=100)
+    options.update(kwargs)
+    return RetryScheduler(dead_letters=dead_letters, **options), dead_letters
+
+
+def test_backoff_grows_and_caps():
+    scheduler, _ = _scheduler(base_delay_ms=100, max_delay_ms=400)
+    assert 0.05 <= scheduler.backoff(1) <= 0.1
+    assert 0.1 <= scheduler.backoff(2) <= 0.2
+    assert 0.2 <= scheduler.backoff(10) <= 0.4
+
+
+@patch("src.processors.retry.process_event", side_effect=RuntimeError("db down"))
+def test_failure_schedules_retry_then_dead_letters(mock_process):
+    scheduler, dead_letters = _scheduler()
+    event = {"id": "e1", "event_type": "quiz_answer", "payload": {}}
+
+    scheduler.process(event)
+    assert len(scheduler) == 1
+
+    # Retries keep failing until max_attempts
+    for _ in range(2):
+        for attempt, due in scheduler.take_due(now=float("inf")):
+            scheduler.process(due, attempt)
+
+    assert len(scheduler) == 0
+    assert len(dead_letters.entries) == 1
+    assert dead_letters.entries[0][2] == 3
+    assert mock_process.call_count == 3
+
+
+def test_full_queue_dead_letters_immediately():
+    scheduler, dead_letters = _scheduler(max_pending=1)
+    scheduler.failed({"id": "a"}, RuntimeError("x"))
+    scheduler.failed({"id": "b"}, RuntimeError("x"))
+    assert len(scheduler) == 1
+    assert dead_letters.entries[0][0]["id"] == "b"
+
+
+def test_run_resubmits_due_retries():
+    acked = []
+
+    async def ack(events):
+        acked.extend(event["id"] for event in events)
+
+    scheduler, dead_letters = _scheduler(ack=ack)
+    calls = []
+
+    def flaky(event):
+        calls.append(event["id"])
+        if len(calls) == 1:
+            raise RuntimeError("transient")
+
+    async def main():
+        executor = BoundedExecutor(limit=2)
+        task = asyncio.create_task(scheduler.run(executor))
+        await asyncio.sleep(0)
+        await executor.submit(scheduler.process, {"id": "e1", "event_type": "x", "payload": {}})
+        for _ in range(100):
+            if acked:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await executor.drain()
+        executor.shutdown()
+
+    with patch("src.processors.retry.process_event", side_effect=flaky):
+        asyncio.run(main())
+
+    assert calls == ["e1", "e1"]
+    assert dead_letters.entries == []
+    # Acked once the retry stored it, not when the first try failed
+    assert acked == ["e1"]
+
+
+def test_process_reports_whether_the_event_is_settled():
+    scheduler, dead_letters = _scheduler(max_attempts=2)
+    with patch("src.processors.retry.process_event", side_effect=RuntimeError("db down")):
+        assert scheduler.process({"id": "e1"}) is False
+        assert scheduler.process({"id": "e1"}, attempt=1) is True
+    assert len(dead_letters.entries) == 1
+
+    dead_letters.push = MagicMock(side_effect=ConnectionError("redis down"))
+    assert scheduler.failed({"id": "e2"}, RuntimeError("x"), attempt=2) is False
+
+
+def test_dead_letter_pending_on_shutdown():
+    scheduler, dead_letters = _scheduler()
+    scheduler.failed({"id": "a"}, RuntimeError("x"))
+    assert [event["id"] for event in scheduler.dead_letter_pending()] == ["a"]
+    assert len(scheduler) == 0
+    assert dead_letters.entries[0][0]["id"] == "a"
+
+
+# --- dead-letter store ---
+
+
+def test_store_push_strips_transport_keys():
+    client = MagicMock()
+    store = DeadLetterStore(client=client, key="dead")
+    store.push({"id": "a", "payload": {}, "_raw": "{}", "_stream_id": b"1-0"}, "boom", 5)
+
+    key, data = client.rpush.call_args[0]
+    entry = json.loads(data)
+    assert key == "dead"
+    assert entry["event"] == {"id": "a", "payload": {}}
+    assert entry["attempts"] == 5
+
+
+@patch("src.dead_letters.settings")
+def test_store_requeue_republishes_in_chunks(mock_settings):
+    mock_settings.transport = "pubsub"
+    mock_settings.channel = "learning-events"
+    mock_settings.codec = "json"
+    client = MagicMock()
+    items = [json.dumps({"event": {"id": str(i)}}).encode() for i in range(3)]
+    client.lpop.side_effect = [items[:2], items[2:], None]
+    pipe = client.pipeline.return_value
+
+    with patch("src.codec.settings", mock_settings):
+        requeued = DeadLetterStore(client=client, key="dead").requeue(chunk=2)
+
+    assert requeued == 3
+    assert pipe.publish.call_count == 3
+    assert json.loads(pipe.publish.call_args_list[0][0][1]) == {"id": "0"}
+
+
+@patch("src.dead_letters.DeadLetterStore")
+def test_cli_count(mock_store_cls, capsys):
+    mock_store_cls.return_value.count.return_value = 7
+    dead_letters_main(["count"])
+    assert capsys.readouterr().out.strip() == "7"
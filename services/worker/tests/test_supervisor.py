@@ -0,0 +1,126 @@
+import asyncio
+import queue
+import signal
+from unittest.mock import MagicMock
+
+from src import main as worker
+from src.consumers.queue import QueueConsumer
+from src.consumers.redis_stream import STREAM_ID_KEY
+from src.supervisor import Supervisor, shard_for_user
+
+
+def _noop_target(index, events, acks):
+    pass
+
+
+def test_shard_for_user_is_stable():
+    shards = {shard_for_user("3f2a-user", 4) for _ in range(10)}
+    assert len(shards) == 1
+    assert 0 <= shards.pop() < 4
+
+
+def test_events_route_by_user_and_round_robin_without():
+    supervisor = Supervisor(3, target=_noop_target, queue_size=10)
+
+    user_shards = {supervisor.shard_for({"user_id": "u1", "n": n}) for n in range(5)}
+    assert len(user_shards) == 1
+
+    anonymous = [supervisor.shard_for({"event_type": "x"}) for _ in range(6)]
+    assert anonymous == [0, 1, 2, 0, 1, 2]
+
+
+def test_dispatch_puts_event_on_its_shard_queue():
+    supervisor = Supervisor(2, target=_noop_target, queue_size=10)
+    event = {"user_id": "u1", "event_type": "quiz_answer", "payload": {}}
+
+    asyncio.run(supervisor.dispatch(event))
+
+    shard = supervisor._queues[shard_for_user("u1", 2)]
+    assert shard.get(timeout=1) == event
+
+
+def test_restarted_shard_gets_fresh_queues_with_the_queued_events(monkeypatch):
+    supervisor = Supervisor(1, target=_noop_target, queue_size=10)
+    monkeypatch.setattr(supervisor._ctx, "Process", MagicMock())
+    supervisor._spawn(0)
+    old = supervisor._queues[0]
+    old.put({"n": 1})
+    old.put({"n": 2})
+
+    supervisor._spawn(0)  # as monitor() does when the child exits
+
+    assert supervisor._queues[0] is not old
+    assert [supervisor._queues[0].get(timeout=1)["n"] for _ in range(2)] == [1, 2]
+
+
+def test_restart_does_not_wait_on_a_queue_locked_by_the_dead_child(monkeypatch):
+    supervisor = Supervisor(1, target=_noop_target, queue_size=10)
+    monkeypatch.setattr(supervisor._ctx, "Process", MagicMock())
+    supervisor._spawn(0)
+    old = supervisor._queues[0]
+    old.put({"n": 1})
+    old._rlock.acquire()  # the child died mid-read
+
+    supervisor._spawn(0)
+
+    fresh = supervisor._queues[0]
+    asyncio.run(supervisor.dispatch({"user_id": "u1"}))
+    assert fresh.get(timeout=1) == {"user_id": "u1"}
+
+
+def test_queue_consumer_stops_at_sentinel_and_reports_acks():
+    events = queue.Queue()
+    acks = queue.Queue()
+    events.put({"event_type": "a", "payload": {}, STREAM_ID_KEY: b"1-0"})
+    events.put({"event_type": "b", "payload": {}})
+    events.put(None)
+    consumer = QueueConsumer(events, acks)
+
+    async def main():
+        received = [event async for event in consumer.listen()]
+        await consumer.ack(received)
+        return received
+
+    received = asyncio.run(main())
+
+    assert [e["event_type"] for e in received] == ["a", "b"]
+    assert acks.get_nowait() == [b"1-0"]
+    assert acks.empty()
+
+
+def test_queue_consumer_honors_should_stop():
+    consumer = QueueConsumer(queue.Queue(), queue.Queue(), should_stop=lambda: True)
+
+    async def main():
+        return [event async for event in consumer.listen()]
+
+    assert asyncio.run(main()) == []
+
+
+def test_queue_consumer_drains_up_to_the_sentinel_after_should_stop():
+    events = queue.Queue()
+    for item in ({"event_type": "a"}, {"event_type": "b"}, None, {"event_type": "after"}):
+        events.put(item)
+    consumer = QueueConsumer(events, queue.Queue(), should_stop=lambda: True)
+
+    async def main():
+        return [event["event_type"] async for event in consumer.listen()]
+
+    assert asyncio.run(main()) == ["a", "b"]
+
+
+def test_signalled_shard_processes_its_queued_events(monkeypatch):
+    monkeypatch.setattr(worker, "draining", False)
+    events, acks = queue.Queue(), queue.Queue()
+    for n in range(3):
+        events.put({"event_type": "quiz_answer", "payload": {"n": n}, STREAM_ID_KEY: f"{n}-0".encode()})
+    consumer = QueueConsumer(events, acks, should_stop=lambda: worker.draining)
+    retries = MagicMock()
+
+    # SIGTERM arrives before the shard has read anything
+    worker.handle_shard_signal(signal.SIGTERM, None)
+    asyncio.run(worker.run_single(consumer, retries))
+
+    assert [call.args[0]["payload"]["n"] for call in retries.process.call_args_list] == [0, 1, 2]
+    assert [acks.get_nowait() for _ in range(3)] == [[b"0-0"], [b"1-0"], [b"2-0"]]
+    assert worker.shutdown is False
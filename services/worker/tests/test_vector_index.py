@@ -0,0 +1,94 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.db.vector_index import (
+    ExistingIndex,
+    IndexPlan,
+    build,
+    existing_index,
+    maintain_indexes,
+    plan,
+    query_setting,
+    rebuild_reason,
+)
+
+
+def test_plan_sizes_parameters_by_row_count():
+    assert plan(50_000, "hnsw") == IndexPlan("hnsw", {"m": 16, "ef_construction": 64})
+    assert plan(5_000_000, "hnsw") == IndexPlan("hnsw", {"m": 24, "ef_construction": 128})
+    assert plan(50_000, "ivfflat") == IndexPlan("ivfflat", {"lists": 50})
+    assert plan(4_000_000, "ivfflat") == IndexPlan("ivfflat", {"lists": 2000})
+    assert plan(10, "ivfflat") == IndexPlan("ivfflat", {"lists": 1})
+    assert query_setting(plan(4_000_000, "ivfflat")) == ("ivfflat.probes", 45)
+    with pytest.raises(ValueError):
+        plan(10, "annoy")
+
+
+def test_rebuild_reason():
+    hnsw = plan(50_000, "hnsw")
+    assert rebuild_reason(None, hnsw, 50_000) == "missing"
+    assert rebuild_reason(ExistingIndex("hnsw", hnsw.params, False, None), hnsw, 50_000) == "invalid"
+    assert rebuild_reason(ExistingIndex("hnsw", hnsw.params, True, None), hnsw, 50_000) is None
+    assert rebuild_reason(ExistingIndex("hnsw", hnsw.params, True, None), plan(5_000_000, "hnsw"), 5_000_000)
+    assert rebuild_reason(ExistingIndex("ivfflat", {"lists": 50}, True, 50_000), hnsw, 50_000).startswith("method")
+
+    # ivfflat: the same lists, but the table has grown past the drift allowance since the build
+    ivfflat = IndexPlan("ivfflat", {"lists": 100})
+    assert rebuild_reason(ExistingIndex("ivfflat", {"lists": 100}, True, 100_000), ivfflat, 140_000) is None
+    assert rebuild_reason(ExistingIndex("ivfflat", {"lists": 100}, True, 100_000), ivfflat, 160_000) == \
+        "row count drifted 100000 -> 160000"
+
+
+def test_existing_index_reads_options_and_build_rows():
+    cur = MagicMock()
+    cur.fetchone.return_value = ("ivfflat", ["lists=250"], True, "rows=250000")
+    assert existing_index(cur, "idx_lessons_embedding_ann") == ExistingIndex("ivfflat", {"lists": 250}, True, 250000)
+
+    # Built by init-db.sql with defaults spelled out, no comment
+    cur.fetchone.return_value = ("hnsw", None, True, None)
+    assert existing_index(cur, "idx").params == {"m": 16, "ef_construction": 64}
+
+    cur.fetchone.return_value = None
+    assert existing_index(cur, "idx") is None
+
+
+def test_build_creates_concurrently_then_swaps():
+    cur = MagicMock()
+    build(cur, "lessons", "idx_lessons_embedding_ann", IndexPlan("ivfflat", {"lists": 50}), 50_000)
+
+    statements = [call.args[0] for call in cur.execute.call_args_list]
+    rendered = [s if isinstance(s, str) else repr(s) for s in statements]
+    create = next(s for s in rendered if "CREATE INDEX CONCURRENTLY" in s)
+    assert "idx_lessons_embedding_ann_new" in create and "lists = 50" in create
+    # The old index is only dropped inside the swap transaction
+    begin = rendered.index("BEGIN")
+    assert "DROP INDEX" in rendered[begin + 1] and "RENAME TO" in rendered[begin + 2]
+    assert rendered[-1] == "COMMIT"
+
+
+@patch("src.db.vector_index.build")
+@patch("src.db.vector_index.existing_index")
+@patch("src.db.vector_index.embedded_rows")
+@patch("src.db.vector_index.psycopg2.connect")
+def test_maintain_indexes_builds_only_what_needs_it(mock_connect, mock_rows, mock_existing, mock_build):
+    cur = mock_connect.return_value.cursor.return_value.__enter__.return_value
+    cur.fetchone.return_value = (True,)  # the advisory lock
+    mock_rows.side_effect = lambda cur, table: {"lessons": 500, "quiz_questions": 80_000}[table]
+    mock_existing.return_value = None
+
+    result = maintain_indexes("hnsw")
+
+    assert result["lessons"].startswith("skipped")
+    assert result["quiz_questions"] == "built hnsw (ef_construction = 64, m = 16): missing"
+    mock_build.assert_called_once_with(cur, "quiz_questions", "idx_questions_embedding_ann", plan(80_000, "hnsw"), 80_000)
+    mock_connect.return_value.close.assert_called_once()
+
+
+@patch("src.db.vector_index.embedded_rows")
+@patch("src.db.vector_index.psycopg2.connect")
+def test_maintain_indexes_skips_when_another_process_holds_the_lock(mock_connect, mock_rows):
+    cur = mock_connect.return_value.cursor.return_value.__enter__.return_value
+    cur.fetchone.return_value = (False,)
+    assert maintain_indexes() == {}
+    mock_rows.assert_not_called()
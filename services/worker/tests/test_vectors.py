@@ -0,0 +1,72 @@
+import base64
+import json
+import struct
+from array import array
+from unittest.mock import MagicMock, patch
+from uuid import UUID, uuid4
+
+from src.db.vectors import copy_embeddings, copy_rows, text_rows, to_float32, update_embeddings_text
+
+
+def _read_copy(buffer: bytes) -> list[tuple[UUID, list[float]]]:
+    """Parse a binary COPY stream of (uuid, vector) rows the way Postgres and pgvector would."""
+    assert buffer[:11] == b"PGCOPY\n\xff\r\n\x00"
+    assert struct.unpack("!ii", buffer[11:19]) == (0, 0)
+    pos, rows = 19, []
+    while True:
+        (fields,) = struct.unpack_from("!h", buffer, pos)
+        pos += 2
+        if fields == -1:
+            break
+        assert fields == 2
+        (length,) = struct.unpack_from("!i", buffer, pos)
+        row_id = UUID(bytes=buffer[pos + 4:pos + 4 + length])
+        pos += 4 + length
+        length, dim, unused = struct.unpack_from("!ihh", buffer, pos)
+        assert length == 4 + 4 * dim and unused == 0
+        values = list(struct.unpack_from(f"!{dim}f", buffer, pos + 8))
+        pos += 4 + length
+        rows.append((row_id, values))
+    assert pos == len(buffer)
+    return rows
+
+
+def test_to_float32_accepts_lists_arrays_and_base64():
+    vector = array("f", [0.5, -1.25, 3.0])
+    assert to_float32([0.5, -1.25, 3.0]) == vector
+    assert to_float32(vector) is vector
+    assert to_float32(base64.b64encode(struct.pack("<3f", 0.5, -1.25, 3.0)).decode()) == vector
+
+
+def test_copy_rows_writes_binary_copy_format():
+    ids = [uuid4(), str(uuid4())]
+    vectors = [[0.5, -1.25, 3.0], array("f", [1.0, 2.0, 4.0])]
+
+    rows = _read_copy(copy_rows(ids, vectors).getvalue())
+
+    assert rows == [(ids[0], [0.5, -1.25, 3.0]), (UUID(ids[1]), [1.0, 2.0, 4.0])]
+    # The caller's array is left in native byte order
+    assert vectors[1] == array("f", [1.0, 2.0, 4.0])
+
+
+def test_copy_embeddings_stages_then_updates_once():
+    cur = MagicMock()
+    copy_embeddings(cur, "quiz_questions", [uuid4()], [[0.1, 0.2]])
+
+    statements = [call.args[0] for call in cur.execute.call_args_list]
+    assert "CREATE TEMP TABLE IF NOT EXISTS staging_embeddings" in statements[0]
+    assert cur.copy_expert.call_args.args[0] == "COPY staging_embeddings (id, embedding) FROM STDIN (FORMAT binary)"
+    assert statements[1].startswith("UPDATE quiz_questions AS t SET embedding = s.embedding FROM staging_embeddings")
+    assert statements[2] == "TRUNCATE staging_embeddings"
+
+
+@patch("src.db.vectors.execute_values")
+def test_update_embeddings_text_sends_json(mock_execute_values):
+    row_id = uuid4()
+    update_embeddings_text(MagicMock(), "lessons", [row_id], [array("f", [0.5, 2.0])])
+
+    sql, rows = mock_execute_values.call_args.args[1:3]
+    assert sql.startswith("UPDATE lessons AS t SET embedding = v.embedding::vector")
+    assert rows == [(str(row_id), "[0.5, 2.0]")]
+    # Lists from the API are sent as they came
+    assert json.loads(text_rows([row_id], [[0.1]])[0][1]) == [0.1]